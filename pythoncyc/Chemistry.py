@@ -0,0 +1,448 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class FormulaIndex, a local index of the chemical
+formulas, charges and Gibbs free energies of formation of the compounds
+of a PGDB, the elemental and charge balance of all the reactions of a
+PGDB, their standard Gibbs free energy changes, and class MassIndex, a
+local index of the monoisotopic masses and formulas of the compounds.
+
+Use method formula_index of class PGDB to create a FormulaIndex and method
+reaction_balances to check the balance of all reactions. For example,
+
+    >>> rb = ecoli.reaction_balances()
+    >>> rb.unbalanced_reactions()
+    >>> rb.imbalance('RXN0-5114')
+    >>> gt = ecoli.reaction_gibbs_table()
+    >>> gt.delta_g('RXN0-5114')
+    >>> mi = ecoli.mass_index()
+    >>> mi.search([204.0899, 180.0634], ppm=5)
+    >>> mi.compounds_of_formula('C11H12N2O2')
+
+The formulas are kept as a dense matrix of element counts, with one row per
+compound and one column per element, plus the net charge of each compound.
+The imbalance of all reactions is then the product of the transposed
+stoichiometric matrix of the reaction network (see ReactionNetwork.py)
+with that matrix. Likewise, the standard Gibbs free energy changes of all
+reactions are the product of the same matrix with the vector of the
+Gibbs free energies of formation (slot GIBBS-0) of the compounds.
+
+The monoisotopic masses of the compounds are the product of the same element
+counts with the masses of the most abundant isotope of each element. They are
+kept sorted, so that a batch of measured masses is searched with one call to
+NumPy searchsorted.
+"""
+
+import re
+from PToolsIndex import np, require_numpy, frameid_key, as_list
+
+# The masses of the most abundant isotope of the elements, in daltons.
+MONOISOTOPIC_MASSES = {
+    'H': 1.00782503207, 'C': 12.0, 'N': 14.0030740048, 'O': 15.99491461956,
+    'P': 30.97376163, 'S': 31.97207100, 'Se': 79.9165213, 'F': 18.99840322,
+    'Cl': 34.96885268, 'Br': 78.9183371, 'I': 126.904473, 'Na': 22.9897692809,
+    'K': 38.96370668, 'Li': 7.01600455, 'Mg': 23.985041700, 'Ca': 39.96259098,
+    'Fe': 55.9349375, 'Zn': 63.9291422, 'Cu': 62.9295975, 'Mn': 54.9380451,
+    'Co': 58.9331950, 'Ni': 57.9353429, 'Mo': 97.9054082, 'W': 183.9509312,
+    'V': 50.9439595, 'Cr': 51.9405075, 'B': 11.0093054, 'Si': 27.9769265325,
+    'As': 74.9215965, 'Hg': 201.970643, 'Cd': 113.9033585, 'Al': 26.98153863,
+    'Ba': 137.9052472, 'Sr': 87.9056121, 'Sn': 119.9021947, 'Pb': 207.9766521,
+    'Ag': 106.905097, 'Au': 196.9665687, 'Pt': 194.9647911, 'Te': 129.9062244,
+    'Rb': 84.911789738, 'Cs': 132.905451933, 'Be': 9.0121822, 'Ti': 47.9479463,
+    'Ga': 68.9255736, 'Ge': 73.9211778, 'Sb': 120.9038157, 'Bi': 208.9803987,
+    'Tl': 204.9744275, 'Gd': 157.9241039, 'U': 238.0507882}
+
+# The regular expression of an element and its count in a formula string such as 'C11H12N2O2'.
+_element_count = re.compile(r'([A-Z][a-z]*)(\d*)')
+
+def parse_formula(formula):
+    """
+    Convert a value of slot CHEMICAL-FORMULA to a dictionary of element symbols
+    (e.g., 'C') to their counts.
+
+    Parm
+       formula, the formula as received from Pathway Tools, that is, a dictionary
+                such as {'|C|': [11], '|H|': [12]} or a list of pairs such as
+                [['C', 11], ['H', 12]], or a string such as 'C11H12'.
+    Return
+       a dictionary of strings to integers, empty for an unknown formula.
+    """
+    counts = {}
+    if isinstance(formula, dict):
+        pairs = formula.items()
+    elif isinstance(formula, basestring):
+        pairs = [(e, int(n) if n else 1) for (e, n) in _element_count.findall(formula)]
+    else:
+        pairs = [pair for pair in as_list(formula) if isinstance(pair, list) and len(pair) == 2]
+    for (element, count) in pairs:
+        count = as_list(count)
+        if isinstance(element, basestring) and count and isinstance(count[0], (int, long)):
+            element = element.strip('|').capitalize()
+            counts[element] = counts.get(element, 0) + count[0]
+    return counts
+
+def number_value(value):
+    """
+    Return the first value of a numerical slot as a float, or NaN if there is none.
+    """
+    value = as_list(value)
+    if value and isinstance(value[0], (int, long, float)) and not isinstance(value[0], bool):
+        return float(value[0])
+    return np.nan
+
+def hill_formula(counts):
+    """
+    Return a formula, a dictionary of element symbols to counts, as a string
+    in the Hill order: C, then H, then the other elements in alphabetical
+    order, or all the elements in alphabetical order if there is no carbon.
+    """
+    elements = sorted(e for e in counts if counts[e])
+    if 'C' in elements:
+        elements = ['C'] + [e for e in ['H'] if e in elements] + [e for e in elements if not (e in ('C', 'H'))]
+    return ''.join(e + (str(counts[e]) if counts[e] != 1 else '') for e in elements)
+
+def net_charge(atomCharges):
+    """
+    Return the net charge of a compound from the value of its slot ATOM-CHARGES,
+    a list of pairs (atom index, charge), possibly received as a dictionary.
+    """
+    if isinstance(atomCharges, dict):
+        charges = atomCharges.values()
+    else:
+        charges = [pair[1] for pair in as_list(atomCharges) if isinstance(pair, list) and len(pair) == 2]
+    return sum(as_list(c)[0] for c in charges if as_list(c) and isinstance(as_list(c)[0], (int, long)))
+
+class FormulaIndex():
+    """
+    A local index of the formulas, charges and Gibbs free energies of formation
+    of all the compounds of a PGDB, built with one bulk request per chunk of compounds.
+    """
+
+    def __init__(self, pgdb):
+        require_numpy('the formula index')
+        self._orgid = pgdb._orgid
+        compounds = sorted(frameid_key(c) for c in pgdb.get_class_all_instances('|Compounds|'))
+        data = pgdb.get_frames_slot_values(compounds, ['CHEMICAL-FORMULA', 'ATOM-CHARGES', 'GIBBS-0'])
+        formulas = [parse_formula(data.get(c, {}).get('chemical_formula')) for c in compounds]
+        self._compounds = np.array(compounds, dtype=object)
+        self._cpd_code = dict((c, i) for i, c in enumerate(compounds))
+        self._elements = sorted(set(e for f in formulas for e in f))
+        code = dict((e, j) for j, e in enumerate(self._elements))
+        self._counts = np.zeros((len(compounds), len(self._elements)), dtype=np.int32)
+        for i, f in enumerate(formulas):
+            for e, n in f.iteritems():
+                self._counts[i, code[e]] = n
+        self._known = np.array([bool(f) for f in formulas], dtype=bool)
+        self._charges = np.array([net_charge(data.get(c, {}).get('atom_charges')) for c in compounds], dtype=np.int32)
+        # NaN for the compounds without GIBBS-0.
+        self._gibbs = np.array([number_value(data.get(c, {}).get('gibbs_0')) for c in compounds], dtype=float)
+
+    def __repr__(self):
+        return '<FormulaIndex '+self._orgid+', '+str(int(self._known.sum()))+' formulas, '+ \
+               str(len(self._elements))+' elements>'
+
+    def compounds(self):
+        """ Return the frame ids of the compounds of the index. """
+        return list(self._compounds)
+
+    def elements(self):
+        """ Return the element symbols, in the order of the columns of the element matrix. """
+        return list(self._elements)
+
+    def formula(self, cpd):
+        """
+        Return the formula of a compound as a dictionary of element symbols to counts,
+        or None if the compound has no formula.
+        """
+        i = self._cpd_code.get(frameid_key(cpd))
+        if i is None or not self._known[i]:
+            return None
+        return dict((self._elements[j], int(self._counts[i, j])) for j in np.nonzero(self._counts[i])[0])
+
+    def charge(self, cpd):
+        """ Return the net charge of a compound, or None if the compound is unknown. """
+        i = self._cpd_code.get(frameid_key(cpd))
+        return None if i is None else int(self._charges[i])
+
+    def element_matrix(self, compounds):
+        """
+        Return the element counts and charges of a list of compounds.
+
+        Parm
+           compounds, a list of frame ids or PFrames.
+        Return
+           three NumPy arrays: the element counts (one row per compound, one
+           column per element, see method elements), the charges, and a boolean
+           array which is False for the compounds without formula.
+        """
+        codes = np.array([self._cpd_code.get(frameid_key(c), -1) for c in compounds], dtype=np.int64)
+        found = codes >= 0
+        codes = np.maximum(codes, 0)
+        if len(self._compounds) == 0:
+            return (np.zeros((len(codes), 0), dtype=np.int32), np.zeros(len(codes), dtype=np.int32), found)
+        counts = np.where(found[:, None], self._counts[codes], 0)
+        charges = np.where(found, self._charges[codes], 0)
+        return (counts, charges, found & self._known[codes])
+
+    def gibbs(self, cpd):
+        """ Return the Gibbs free energy of formation (GIBBS-0) of a compound, or None. """
+        i = self._cpd_code.get(frameid_key(cpd))
+        if i is None or np.isnan(self._gibbs[i]):
+            return None
+        return float(self._gibbs[i])
+
+    def gibbs_vector(self, compounds):
+        """
+        Return the Gibbs free energies of formation of a list of compounds as a
+        NumPy array, NaN for the compounds without GIBBS-0.
+        """
+        codes = np.array([self._cpd_code.get(frameid_key(c), -1) for c in compounds], dtype=np.int64)
+        if len(self._compounds) == 0:
+            return np.nan * np.ones(len(codes))
+        return np.where(codes >= 0, self._gibbs[np.maximum(codes, 0)], np.nan)
+
+class ReactionBalances():
+    """
+    The elemental and charge imbalance of all the reactions of a reaction network.
+
+    The imbalance of a reaction is the sum over its right side minus the sum
+    over its left side of the coefficients times the element counts (or the
+    charges) of its substrates. A reaction is balanced when its imbalance is zero.
+    The imbalance is not known for the reactions with a substrate without formula,
+    such as a generic compound, with a variable coefficient such as n, or with
+    missing substrates (see method incomplete_substrates_p of class ReactionNetwork).
+    """
+
+    def __init__(self, network, formulaIndex):
+        self._reactions = np.array(network.reactions(), dtype=object)
+        self._rxn_code = dict((r, j) for j, r in enumerate(self._reactions))
+        self._elements = formulaIndex.elements()
+        (counts, charges, known) = formulaIndex.element_matrix([cpd for (cpd, compartment) in network.metabolites()])
+        S = network.stoichiometric_matrix()
+        # One matrix product for all reactions and all elements, the charge being the last column.
+        self._imbalance = np.asarray(S.T.dot(np.column_stack([counts, charges]).astype(float)))
+        involved = network.substrate_matrix().T.astype(np.int32)
+        self._known = (involved.dot((~known).astype(np.int32)) == 0) & \
+                      np.array([not (network.variable_stoichiometry_p(r) or network.incomplete_substrates_p(r))
+                                for r in self._reactions], dtype=bool)
+
+    def __repr__(self):
+        return '<ReactionBalances '+str(len(self._reactions))+' reactions, '+ \
+               str(len(self.unbalanced_reactions()))+' unbalanced>'
+
+    def columns(self):
+        """ Return the element symbols and 'charge', in the order of the columns of the imbalance matrix. """
+        return self._elements + ['charge']
+
+    def imbalance_matrix(self):
+        """
+        Return the imbalance of all reactions as a NumPy array, one row per reaction
+        (see method reactions) and one column per element and the charge (see
+        method columns), and a boolean array, False for the reactions whose
+        imbalance is unknown.
+        """
+        return (self._imbalance, self._known)
+
+    def reactions(self):
+        """ Return the reactions, in the order of the rows of the imbalance matrix. """
+        return list(self._reactions)
+
+    def _unbalanced(self, include_charge):
+        imbalance = self._imbalance if include_charge else self._imbalance[:, :-1]
+        return self._known & (np.abs(imbalance) > 1e-9).any(axis=1)
+
+    def unbalanced_reactions(self, include_charge=True):
+        """
+        Return the reactions whose imbalance is known and not zero.
+        If include_charge is False, only the elements are checked.
+        """
+        return list(self._reactions[self._unbalanced(include_charge)])
+
+    def unknown_balance_reactions(self):
+        """ Return the reactions whose imbalance is unknown. """
+        return list(self._reactions[~self._known])
+
+    def balanced_p(self, rxn, include_charge=True):
+        """
+        A predicate that is True if the reaction is balanced, False if it is unbalanced,
+        and None if its balance is unknown.
+        """
+        j = self._rxn_code.get(frameid_key(rxn))
+        if j is None or not self._known[j]:
+            return None
+        return not self._unbalanced(include_charge)[j]
+
+    def imbalance(self, rxn):
+        """
+        Return the imbalance of a reaction as a dictionary of the elements and
+        'charge' to their non-zero imbalance, or None if the reaction is unknown.
+        """
+        j = self._rxn_code.get(frameid_key(rxn))
+        if j is None:
+            return None
+        columns = self.columns()
+        return dict((columns[k], float(self._imbalance[j, k])) for k in np.nonzero(np.abs(self._imbalance[j]) > 1e-9)[0])
+
+class ReactionGibbsTable():
+    """
+    The standard Gibbs free energy changes of all the reactions of a reaction
+    network, computed from the Gibbs free energies of formation (GIBBS-0) of their
+    substrates: the sum over the right side minus the sum over the left side of the
+    coefficients times the Gibbs free energies of formation.
+
+    The change is not known (NaN) for the reactions with a substrate without
+    GIBBS-0, with a variable coefficient such as n, or with missing substrates.
+    """
+
+    def __init__(self, network, formulaIndex):
+        self._reactions = np.array(network.reactions(), dtype=object)
+        self._rxn_code = dict((r, j) for j, r in enumerate(self._reactions))
+        self._metabolites = network.metabolites()
+        self._substrates = network.substrate_matrix().T.tocsr()
+        self._gibbs = formulaIndex.gibbs_vector([cpd for (cpd, compartment) in self._metabolites])
+        missing = np.isnan(self._gibbs)
+        deltaG = np.asarray(network.stoichiometric_matrix().T.dot(np.where(missing, 0.0, self._gibbs))).ravel()
+        self._known = (self._substrates.astype(np.int32).dot(missing.astype(np.int32)) == 0) & \
+                      np.array([not (network.variable_stoichiometry_p(r) or network.incomplete_substrates_p(r))
+                                for r in self._reactions], dtype=bool)
+        self._delta_g = np.where(self._known, deltaG, np.nan)
+
+    def __repr__(self):
+        return '<ReactionGibbsTable '+str(len(self._reactions))+' reactions, '+ \
+               str(int(self._known.sum()))+' with a Gibbs free energy change>'
+
+    def table(self):
+        """
+        Return the reactions, their standard Gibbs free energy changes and a
+        boolean array which is False for the reactions with missing data,
+        as three NumPy arrays in the same order.
+        """
+        return (self._reactions.copy(), self._delta_g.copy(), self._known.copy())
+
+    def delta_g(self, rxn):
+        """ Return the standard Gibbs free energy change of a reaction, or None if it is not known. """
+        j = self._rxn_code.get(frameid_key(rxn))
+        if j is None or not self._known[j]:
+            return None
+        return float(self._delta_g[j])
+
+    def missing_compounds(self, rxn):
+        """ Return the substrates of a reaction without GIBBS-0. """
+        j = self._rxn_code.get(frameid_key(rxn))
+        if j is None:
+            return []
+        row = self._substrates[j].indices
+        return sorted(set(self._metabolites[i][0] for i in row if np.isnan(self._gibbs[i])))
+
+    def substrate_gibbs(self, rxn):
+        """
+        Return the Gibbs free energies of formation of the substrates of a reaction,
+        as a dictionary of compounds to their GIBBS-0, None when missing.
+        """
+        j = self._rxn_code.get(frameid_key(rxn))
+        if j is None:
+            return {}
+        return dict((self._metabolites[i][0], None if np.isnan(self._gibbs[i]) else float(self._gibbs[i]))
+                    for i in self._substrates[j].indices)
+
+class MassIndex():
+    """
+    A local index of the monoisotopic masses and formulas of the compounds of a
+    PGDB, built from the FormulaIndex of the PGDB. The compounds without formula,
+    or with an element without a known mass (e.g., R for a generic group), are
+    not in the index.
+    """
+
+    def __init__(self, pgdb):
+        formulaIndex = pgdb.formula_index()
+        self._orgid = pgdb._orgid
+        compounds = formulaIndex.compounds()
+        elements = formulaIndex.elements()
+        (counts, charges, known) = formulaIndex.element_matrix(compounds)
+        elementMasses = np.array([MONOISOTOPIC_MASSES.get(e, np.nan) for e in elements], dtype=float)
+        # Unknown element masses only matter for the compounds having these elements.
+        masses = counts.dot(np.where(np.isnan(elementMasses), 0.0, elementMasses))
+        unknownElements = np.isnan(elementMasses).astype(np.int32)
+        indexed = known & (counts.dot(unknownElements) == 0) if len(elements) else known
+        order = np.argsort(masses[indexed], kind='mergesort')
+        self._compounds = np.array(compounds, dtype=object)[indexed][order]
+        self._masses = masses[indexed][order]
+        self._cpd_position = dict((c, j) for j, c in enumerate(self._compounds))
+        self._formula_code = {}
+        for i in np.nonzero(known)[0]:
+            formula = hill_formula(dict(zip(elements, counts[i])))
+            self._formula_code.setdefault(formula, []).append(compounds[i])
+
+    def __repr__(self):
+        return '<MassIndex '+self._orgid+', '+str(len(self._compounds))+' compounds, '+ \
+               str(len(self._formula_code))+' formulas>'
+
+    def mass(self, cpd):
+        """ Return the monoisotopic mass of a compound, or None if it is not in the index. """
+        j = self._cpd_position.get(frameid_key(cpd))
+        return None if j is None else float(self._masses[j])
+
+    def search_ranges(self, masses, ppm=5.0):
+        """
+        Search a batch of masses with a tolerance in parts per million.
+
+        Parms
+           masses, a list or NumPy array of floats.
+           ppm, a float, the tolerance: a compound of mass m matches a mass x
+                when abs(m - x) <= x * ppm / 1e6.
+        Return
+           two NumPy arrays (starts, ends): the compounds matching masses[i] are
+           the compounds starts[i] to ends[i] - 1 of the compounds sorted by mass.
+        """
+        masses = np.asarray(masses, dtype=float)
+        tolerances = masses * ppm * 1e-6
+        return (np.searchsorted(self._masses, masses - tolerances, side='left'),
+                np.searchsorted(self._masses, masses + tolerances, side='right'))
+
+    def search(self, masses, ppm=5.0):
+        """
+        Return, for each mass of a batch, the compounds within the tolerance.
+        See method search_ranges for the parameters.
+
+        Return
+           a list, one element per mass, of lists of tuples
+           (compound, monoisotopic mass, error in ppm), by increasing mass.
+        """
+        masses = np.asarray(masses, dtype=float)
+        (starts, ends) = self.search_ranges(masses, ppm)
+        return [[(self._compounds[j], float(self._masses[j]), float((self._masses[j] - x) / x * 1e6) if x else 0.0)
+                 for j in range(start, end)]
+                for (x, start, end) in zip(masses, starts, ends)]
+
+    def compounds_of_formula(self, formula):
+        """
+        Return the compounds with exactly the given formula.
+
+        Parm
+           formula, a string such as 'C11H12N2O2', or a dictionary of element
+                    symbols to counts.
+        Return
+           a list of compound frame ids.
+        """
+        counts = formula if isinstance(formula, dict) else parse_formula(formula)
+        return list(self._formula_code.get(hill_formula(counts), []))
@@ -0,0 +1,275 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class CompoundIndex, a local index of the chemical
+structures of the compounds of a PGDB, for searching similar compounds.
+
+Use method compound_index of class PGDB to create a CompoundIndex. For example,
+
+    >>> ci = ecoli.compound_index()
+    >>> ci.similar_compounds('TRP', k=5)
+    [('|TRP|', 1.0), ('|D-TRYPTOPHAN|', 1.0), ...]
+
+The structure of each compound (slots STRUCTURE-ATOMS and STRUCTURE-BONDS)
+is reduced to a fingerprint: the linear paths of up to MAX_PATH_BONDS
+bonds of the molecule, such as C-C=O, are hashed to NB_BITS bits. The
+fingerprints are packed into a NumPy array of bytes, eight bits per byte,
+and the Tanimoto similarity of a compound to all the compounds is computed
+at once over that array.
+
+If a cache directory is set (see function set_cache_dir of config.py), the
+fingerprints are saved in that directory and loaded in the next sessions,
+as long as the PGDB, on the same running Pathway Tools, has the same
+compounds with the same structures (compared by a digest). Since the
+digest is computed from the structures, the structures are still
+requested from Pathway Tools in every session: the cache only saves the
+computation of the fingerprints. A cache that cannot be written is ignored.
+"""
+
+import os
+import zlib
+import hashlib
+import config
+from PTools import host_pool
+from PToolsIndex import np, require_numpy, frameid_key, as_list
+
+# The number of bits of the fingerprints, a multiple of 8.
+NB_BITS = 1024
+
+# The maximum number of bonds of the paths hashed in the fingerprints.
+MAX_PATH_BONDS = 5
+
+# The number of bits set in each byte value.
+_popcount = None
+
+def popcount_table():
+    """ Return a NumPy array of the number of bits set in each of the 256 byte values. """
+    global _popcount
+    if _popcount is None:
+        _popcount = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint16)
+    return _popcount
+
+def structure_paths(atoms, bonds, maxBonds=MAX_PATH_BONDS):
+    """
+    Return the set of the linear paths of a molecule as strings, such as 'C1C2O'
+    for C-C=O, each path being written in the smaller of its two directions.
+
+    Parms
+       atoms, a list of element symbols, the value of slot STRUCTURE-ATOMS.
+       bonds, a list of triples (atom, atom, bond order), the value of slot
+              STRUCTURE-BONDS, where the atoms are indices starting at 1.
+       maxBonds, an integer, the maximum number of bonds of the paths.
+    Return
+       a set of strings.
+    """
+    symbols = [a.strip('|').capitalize() if isinstance(a, basestring) else str(a) for a in as_list(atoms)]
+    neighbors = [[] for a in symbols]
+    for bond in as_list(bonds):
+        bond = as_list(bond)
+        if len(bond) < 3:
+            continue
+        (i, j, order) = (bond[0], bond[1], as_list(bond[2]))
+        if isinstance(i, (int, long)) and isinstance(j, (int, long)) and 0 < i <= len(symbols) and 0 < j <= len(symbols):
+            order = str(order[0]) if order else '1'
+            neighbors[i-1].append((j-1, order))
+            neighbors[j-1].append((i-1, order))
+    paths = set()
+    def extend(path, visited, tokens):
+        # tokens alternates the symbols of the atoms and the orders of the bonds of the path.
+        paths.add(min(''.join(tokens), ''.join(reversed(tokens))))
+        if len(path) > maxBonds:
+            return
+        for (j, order) in neighbors[path[-1]]:
+            if not (j in visited):
+                visited.add(j)
+                path.append(j)
+                extend(path, visited, tokens + [order, symbols[j]])
+                path.pop()
+                visited.discard(j)
+    for i in range(len(symbols)):
+        extend([i], set([i]), [symbols[i]])
+    return paths
+
+def fingerprint(atoms, bonds, nbBits=NB_BITS, maxBonds=MAX_PATH_BONDS):
+    """
+    Return the fingerprint of a molecule as a NumPy array of nbBits/8 bytes.
+    See function structure_paths for the parameters atoms and bonds.
+    """
+    bits = np.zeros(nbBits, dtype=bool)
+    for path in structure_paths(atoms, bonds, maxBonds):
+        bits[(zlib.crc32(path) & 0xffffffff) % nbBits] = True
+    return np.packbits(bits)
+
+def structure_digest(structures):
+    """
+    Return a SHA-1 digest, as a hexadecimal string, of a list of triples
+    (compound, atoms, bonds), the values of slots STRUCTURE-ATOMS and
+    STRUCTURE-BONDS of the compounds.
+    """
+    digest = hashlib.sha1()
+    for structure in structures:
+        digest.update(repr(structure))
+    return digest.hexdigest()
+
+class CompoundIndex():
+    """
+    A local index of the fingerprints of the compounds of a PGDB that have a
+    structure, built with one bulk request per chunk of compounds. The
+    fingerprints are loaded from the cache directory if the structures,
+    which are always requested, have not changed.
+    """
+
+    def __init__(self, pgdb, useCache=True):
+        require_numpy('the compound index')
+        self._orgid = pgdb._orgid
+        (hostname, hostport) = pgdb._host or host_pool().primary()
+        self._host = hostname+':'+str(hostport)
+        compounds = sorted(frameid_key(c) for c in pgdb.get_class_all_instances('|Compounds|'))
+        data = pgdb.get_frames_slot_values(compounds, ['STRUCTURE-ATOMS', 'STRUCTURE-BONDS'])
+        withStructure = [c for c in compounds if data.get(c, {}).get('structure_atoms')]
+        self._digest = structure_digest([(c, data[c]['structure_atoms'], data[c].get('structure_bonds'))
+                                         for c in withStructure])
+        if not (useCache and self._load(compounds)):
+            self._compounds = np.array(withStructure, dtype=object)
+            self._fingerprints = np.zeros((len(withStructure), NB_BITS // 8), dtype=np.uint8)
+            for i, c in enumerate(withStructure):
+                self._fingerprints[i] = fingerprint(data[c]['structure_atoms'], data[c]['structure_bonds'])
+            self._all_compounds = compounds
+            self._save()
+        self._cpd_code = dict((c, i) for i, c in enumerate(self._compounds))
+        self._nb_bits_set = popcount_table()[self._fingerprints].sum(axis=1)
+
+    def __repr__(self):
+        return '<CompoundIndex '+self._orgid+', '+str(len(self._compounds))+' fingerprints>'
+
+    def _cache_file(self):
+        if config._cache_dir is None:
+            return None
+        return os.path.join(config._cache_dir, self._orgid+'-compound-fingerprints.npz')
+
+    def _load(self, compounds):
+        """
+        Load the fingerprints from the cache directory, if they were computed with
+        the same parameters for the same compounds and structures, on the same
+        Pathway Tools. Return True if loaded.
+        """
+        fileName = self._cache_file()
+        if fileName is None or not os.path.exists(fileName):
+            return False
+        try:
+            saved = np.load(fileName)
+            try:
+                if int(saved['nb_bits']) != NB_BITS or int(saved['max_path_bonds']) != MAX_PATH_BONDS or \
+                   str(saved['digest']) != self._digest or str(saved['host']) != self._host or \
+                   list(saved['all_compounds']) != compounds:
+                    return False
+                self._compounds = np.array(list(saved['compounds']), dtype=object)
+                self._fingerprints = saved['fingerprints']
+                self._all_compounds = compounds
+                return True
+            finally:
+                saved.close()
+        except (IOError, KeyError, ValueError):
+            return False
+
+    def _save(self):
+        """
+        Save the fingerprints in the cache directory, if one is set. The index
+        is still usable if they cannot be saved.
+        """
+        fileName = self._cache_file()
+        if fileName is None:
+            return
+        # Write to a temporary file first, so that an interrupted save leaves no partial cache file.
+        tmpFileName = fileName + '.tmp.npz'
+        try:
+            if not os.path.isdir(config._cache_dir):
+                os.makedirs(config._cache_dir)
+            np.savez(tmpFileName, compounds=np.array(list(self._compounds), dtype=str),
+                     all_compounds=np.array(self._all_compounds, dtype=str),
+                     fingerprints=self._fingerprints, nb_bits=NB_BITS, max_path_bonds=MAX_PATH_BONDS,
+                     digest=self._digest, host=self._host)
+            try:
+                os.rename(tmpFileName, fileName)
+            except OSError:
+                # On Windows, rename does not replace an existing file.
+                os.remove(fileName)
+                os.rename(tmpFileName, fileName)
+        except (IOError, OSError), msg:
+            if config._debug:
+                print 'Could not save the compound fingerprints in '+fileName+': '+str(msg)
+            if os.path.exists(tmpFileName):
+                try:
+                    os.remove(tmpFileName)
+                except OSError:
+                    pass
+
+    def compounds(self):
+        """ Return the compounds with a fingerprint, in the order of the rows of the fingerprints. """
+        return list(self._compounds)
+
+    def fingerprint(self, cpd):
+        """ Return the fingerprint of a compound as a NumPy array of bytes, or None. """
+        i = self._cpd_code.get(frameid_key(cpd))
+        return None if i is None else self._fingerprints[i].copy()
+
+    def tanimoto(self, query):
+        """
+        Return the Tanimoto similarities of a compound to all the compounds of the index.
+
+        Parm
+           query, a compound (frame id or PFrame) of the index, or a fingerprint
+                  as returned by function fingerprint.
+        Return
+           a NumPy array of floats, in the order of method compounds.
+        """
+        if isinstance(query, np.ndarray):
+            fp = query
+        else:
+            fp = self.fingerprint(query)
+            if fp is None:
+                return np.zeros(len(self._compounds))
+        table = popcount_table()
+        common = table[self._fingerprints & fp].sum(axis=1)
+        union = self._nb_bits_set + table[fp].sum() - common
+        return np.where(union > 0, common / np.maximum(union, 1).astype(float), 0.0)
+
+    def similar_compounds(self, query, k=10, threshold=0.0):
+        """
+        Return the k compounds most similar to query by the Tanimoto similarity
+        of their fingerprints.
+
+        Parms
+           query, a compound (frame id or PFrame) or a fingerprint, see method tanimoto.
+           k, an integer, the maximum number of compounds returned.
+           threshold, a float, the minimal similarity of the compounds returned.
+        Return
+           a list of pairs (compound, similarity), by decreasing similarity.
+        """
+        similarities = self.tanimoto(query)
+        if len(similarities) == 0 or k <= 0:
+            return []
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.lexsort((top, -similarities[top]))]
+        return [(self._compounds[i], float(similarities[i])) for i in top if similarities[i] >= threshold]
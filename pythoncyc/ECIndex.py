@@ -0,0 +1,188 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class ECIndex, a local index of the EC numbers of the
+reactions of a PGDB, with the enzymes and genes of these reactions.
+
+Use method ec_index of class PGDB to create an ECIndex. For example,
+
+    >>> eci = ecoli.ec_index()
+    >>> eci.reactions_of_ec('1.1.1.-')
+    >>> eci.genes_of_ec('EC-2.7')
+    >>> ec_lookup([ecoli.ec_index(), meta.ec_index()], '1.1.1.1', kind='enzymes')
+
+The EC numbers are kept in a trie, one level per component of the EC number.
+Each node of the trie has the sorted reactions of all the EC numbers below
+it, so that looking up a partial EC number, such as 1.1.1.- or 1.1, does not
+scan the reactions.
+"""
+
+from PToolsIndex import frameid_key, as_list, unique, protein_forms_and_genes
+
+def ec_components(ec):
+    """
+    Split an EC number into its components, removing the prefix EC- and the
+    unspecified components. For example, 'EC-1.1.1.-' gives ['1', '1', '1'].
+
+    Parm
+       ec, a string or a PFrame of an EC number.
+    Return
+       a list of strings.
+    """
+    ec = frameid_key(ec)
+    if not isinstance(ec, basestring):
+        return []
+    ec = ec.strip('|').strip()
+    if ec.upper().startswith('EC-'):
+        ec = ec[3:]
+    elif ec.upper().startswith('EC '):
+        ec = ec[3:].strip()
+    components = []
+    for c in ec.split('.'):
+        if c in ('', '-', '*'):
+            break
+        components.append(c)
+    return components
+
+class _ECNode():
+    """ A node of the EC trie: its children by component and the reactions below it. """
+
+    def __init__(self):
+        self.children = {}
+        self.reactions = []
+
+class ECIndex():
+    """
+    A local index of the EC numbers of the reactions of a PGDB, built with a few
+    bulk requests: the EC-NUMBER and ENZYMATIC-REACTION slots of the reactions,
+    the enzymes of the enzymatic reactions and the genes of these enzymes.
+    """
+
+    def __init__(self, pgdb):
+        self._orgid = pgdb._orgid
+        reactions = sorted(frameid_key(r) for r in pgdb.get_class_all_instances('|Reactions|'))
+        rxnData = pgdb.get_frames_slot_values(reactions, ['EC-NUMBER', 'ENZYMATIC-REACTION'])
+        self._root = _ECNode()
+        self._ecs_of_rxn = {}
+        for rxn in reactions:
+            ecs = [ec_components(ec) for ec in as_list(rxnData.get(rxn, {}).get('ec_number'))]
+            ecs = [ec for ec in ecs if ec]
+            self._ecs_of_rxn[rxn] = ['EC-'+'.'.join(ec) for ec in ecs]
+            for ec in ecs:
+                node = self._root
+                node.reactions.append(rxn)
+                for c in ec:
+                    node = node.children.setdefault(c, _ECNode())
+                    node.reactions.append(rxn)
+        self._finish(self._root)
+
+        enzrxnsOf = dict((r, [frameid_key(er) for er in as_list(rxnData.get(r, {}).get('enzymatic_reaction'))])
+                         for r in reactions)
+        enzrxns = unique([er for r in reactions for er in enzrxnsOf[r]])
+        erData = pgdb.get_frames_slot_values(enzrxns, ['ENZYME'])
+        self._enzymes_of_rxn = {}
+        for r in reactions:
+            self._enzymes_of_rxn[r] = unique([frameid_key(e) for er in enzrxnsOf[r]
+                                              for e in as_list(erData.get(er, {}).get('enzyme'))[0:1]])
+        (forms, self._genes_of_enzyme) = protein_forms_and_genes(pgdb, unique([e for es in self._enzymes_of_rxn.values()
+                                                                               for e in es]))
+
+    def _finish(self, node):
+        """ Remove the duplicate reactions of the nodes and sort them. """
+        node.reactions = sorted(set(node.reactions))
+        for child in node.children.values():
+            self._finish(child)
+
+    def __repr__(self):
+        return '<ECIndex '+self._orgid+', '+str(len(self._root.reactions))+' reactions with an EC number>'
+
+    def _node(self, ec):
+        node = self._root
+        for c in ec_components(ec):
+            node = node.children.get(c)
+            if node is None:
+                return None
+        return node
+
+    def ec_numbers(self, ec=''):
+        """
+        Return the complete EC numbers known below a partial EC number, or all of
+        them by default, as strings such as 'EC-1.1.1.1'.
+        """
+        node = self._node(ec)
+        if node is None:
+            return []
+        result = []
+        def collect(node, prefix):
+            if not node.children and prefix:
+                result.append('EC-'+'.'.join(prefix))
+            for c in sorted(node.children):
+                collect(node.children[c], prefix + [c])
+        collect(node, ec_components(ec))
+        return result
+
+    def ec_numbers_of_reaction(self, rxn):
+        """ Return the EC numbers of a reaction, as strings such as 'EC-1.1.1.1'. """
+        return list(self._ecs_of_rxn.get(frameid_key(rxn), []))
+
+    def reactions_of_ec(self, ec):
+        """
+        Return the reactions of an EC number or of all the EC numbers below a partial
+        EC number, such as '1.1.1.-', 'EC-1.1' or '1.1.1'.
+        """
+        node = self._node(ec)
+        return list(node.reactions) if node is not None else []
+
+    def enzymes_of_reaction(self, rxn):
+        """
+        Same as method enzymes_of_reaction of class PGDB, without options, answered locally.
+        """
+        return list(self._enzymes_of_rxn.get(frameid_key(rxn), []))
+
+    def genes_of_reaction(self, rxn):
+        """
+        Same as method genes_of_reaction of class PGDB, answered locally.
+        """
+        return sorted(set(g for e in self.enzymes_of_reaction(rxn) for g in self._genes_of_enzyme.get(e, [])))
+
+    def enzymes_of_ec(self, ec):
+        """ Return the enzymes of the reactions of an EC number, possibly partial. """
+        return unique([e for r in self.reactions_of_ec(ec) for e in self._enzymes_of_rxn.get(r, [])])
+
+    def genes_of_ec(self, ec):
+        """ Return the genes of the enzymes of the reactions of an EC number, possibly partial. """
+        return sorted(set(g for e in self.enzymes_of_ec(ec) for g in self._genes_of_enzyme.get(e, [])))
+
+def ec_lookup(ecIndexes, ec, kind='reactions'):
+    """
+    Look up an EC number, possibly partial, in the ECIndex of several PGDBs.
+
+    Parms
+       ecIndexes, a list of ECIndex objects, e.g., [ecoli.ec_index(), meta.ec_index()].
+       ec, a string, an EC number such as '1.1.1.-'.
+       kind, one of 'reactions', 'enzymes' or 'genes'.
+    Return
+       a dictionary of the orgids to the lists of reactions, enzymes or genes.
+    """
+    lookups = {'reactions': ECIndex.reactions_of_ec, 'enzymes': ECIndex.enzymes_of_ec, 'genes': ECIndex.genes_of_ec}
+    return dict((index._orgid, lookups[kind](index, ec)) for index in ecIndexes)
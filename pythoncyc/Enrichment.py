@@ -0,0 +1,184 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module computes the over-representation (enrichment) of a set of
+genes in the pathways of a PGDB, using the gene x pathway incidence
+matrix of a PathwayIndex.
+
+Use method pathway_enrichment of class PGDB. For example,
+
+    >>> er = ecoli.pathway_enrichment(['EG11024', 'EG11025', 'EG11026'])
+    >>> er.significant(0.05)
+
+For each pathway, the p-value is the probability of having at least as
+many of the given genes in that pathway when drawing that many genes at
+random from the background (one-sided hypergeometric test). The p-values
+of all pathways are computed at once with NumPy, from a table of the
+logarithms of the factorials. The q-values are the p-values corrected for
+the false discovery rate by the Benjamini-Hochberg procedure.
+"""
+
+from PToolsIndex import np, require_numpy, frameid_key
+
+class EnrichmentResult():
+    """
+    The enrichment of a set of genes in the pathways of a PGDB. All attributes
+    are NumPy arrays with one value per pathway, in the same order:
+
+       pathways, the frame ids of the pathways,
+       hits, the number of the given genes in the pathway,
+       sizes, the number of genes of the background in the pathway,
+       pvalues, the p-values of the hypergeometric test,
+       qvalues, the p-values adjusted by the Benjamini-Hochberg procedure,
+       fold_enrichments, hits / expected number of hits.
+
+    The attributes nb_genes and nb_background are the number of the given
+    genes found in the background and the size of the background.
+    """
+
+    def __init__(self, pathways, hits, sizes, nbGenes, nbBackground):
+        self.pathways = pathways
+        self.hits = hits
+        self.sizes = sizes
+        self.nb_genes = nbGenes
+        self.nb_background = nbBackground
+        self.pvalues = hypergeometric_sf(hits, sizes, nbGenes, nbBackground)
+        self.qvalues = benjamini_hochberg(self.pvalues)
+        expected = sizes * float(nbGenes) / max(nbBackground, 1)
+        self.fold_enrichments = np.where(expected > 0, hits / np.maximum(expected, 1e-300), 0.0)
+
+    def __repr__(self):
+        return '<EnrichmentResult '+str(self.nb_genes)+' genes of '+str(self.nb_background)+', '+ \
+               str(len(self.pathways))+' pathways>'
+
+    def __len__(self):
+        return len(self.pathways)
+
+    def significant(self, alpha=0.05, use_qvalues=True):
+        """
+        Return the pathways with at least one hit and a q-value (or p-value)
+        of at most alpha, sorted by increasing p-value.
+
+        Parms
+           alpha, a float.
+           use_qvalues, a boolean, False => compare the p-values to alpha.
+        Return
+           a list of tuples (pathway, hits, size, p-value, q-value).
+        """
+        values = self.qvalues if use_qvalues else self.pvalues
+        selected = np.nonzero((values <= alpha) & (self.hits > 0))[0]
+        selected = selected[np.argsort(self.pvalues[selected], kind='mergesort')]
+        return [(self.pathways[j], int(self.hits[j]), int(self.sizes[j]),
+                 float(self.pvalues[j]), float(self.qvalues[j])) for j in selected]
+
+def log_factorials(n):
+    """
+    Return a NumPy array of the natural logarithms of 0!, 1!, ..., n!.
+    """
+    table = np.zeros(n + 1)
+    if n > 0:
+        np.cumsum(np.log(np.arange(1, n + 1)), out=table[1:])
+    return table
+
+def hypergeometric_sf(hits, sizes, nbDrawn, nbTotal):
+    """
+    Return, for each pathway, the probability of drawing at least hits genes of
+    the pathway when drawing nbDrawn genes among nbTotal genes, of which sizes
+    are in the pathway.
+
+    Parms
+       hits, sizes, NumPy arrays of integers.
+       nbDrawn, nbTotal, integers.
+    Return
+       a NumPy array of floats.
+    """
+    hits = np.asarray(hits, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    if len(hits) == 0:
+        return np.zeros(0)
+    lf = log_factorials(nbTotal)
+    def logChoose(n, k):
+        return lf[n] - lf[k] - lf[n - k]
+    # Sum the terms x = hits .. min(sizes, nbDrawn) of all pathways as one matrix.
+    upper = np.minimum(sizes, nbDrawn)
+    width = max(int((upper - hits).max()) + 1, 1)
+    x = hits[:, None] + np.arange(width)[None, :]
+    valid = (x <= upper[:, None]) & (nbDrawn - x <= nbTotal - sizes[:, None])
+    x = np.where(valid, x, 0)
+    K = sizes[:, None]
+    terms = logChoose(K, np.minimum(x, K)) + logChoose(nbTotal - K, np.clip(nbDrawn - x, 0, nbTotal - K)) \
+            - logChoose(nbTotal, nbDrawn)
+    terms = np.where(valid, terms, -np.inf)
+    top = terms.max(axis=1)
+    finite = np.isfinite(top)
+    sums = np.zeros(len(hits))
+    sums[finite] = np.exp(top[finite]) * np.exp(terms[finite] - top[finite][:, None]).sum(axis=1)
+    return np.minimum(sums, 1.0)
+
+def benjamini_hochberg(pvalues):
+    """
+    Return the p-values adjusted for the false discovery rate by the
+    Benjamini-Hochberg procedure, as a NumPy array in the same order.
+    """
+    pvalues = np.asarray(pvalues, dtype=float)
+    n = len(pvalues)
+    if n == 0:
+        return pvalues
+    order = np.argsort(pvalues)[::-1]
+    ranks = np.arange(n, 0, -1)
+    adjusted = np.minimum.accumulate(pvalues[order] * n / ranks)
+    qvalues = np.empty(n)
+    qvalues[order] = np.minimum(adjusted, 1.0)
+    return qvalues
+
+def pathway_enrichment(pathwayIndex, genes, background=None, include_super_pwys=False):
+    """
+    Compute the enrichment of a set of genes in all the pathways of a PathwayIndex.
+
+    Parms
+       pathwayIndex, a PathwayIndex object.
+       genes, a list of genes, frame ids or PFrames.
+       background, a list of genes or None for the genes of the pathways of the index.
+                   The genes not in the background are ignored.
+       include_super_pwys, a boolean, True => the genes of a pathway are
+                   also counted in its super-pathways.
+    Return
+       an EnrichmentResult object.
+    """
+    require_numpy('the pathway enrichment')
+    incidence = pathwayIndex.incidence('gene', include_super_pwys)
+    indexGenes = pathwayIndex.items('gene')
+    code = dict((g, i) for i, g in enumerate(indexGenes))
+    if background is None:
+        backgroundSet = set(indexGenes)
+    else:
+        backgroundSet = set(frameid_key(g) for g in background)
+    geneSet = set(frameid_key(g) for g in genes) & backgroundSet
+    inBackground = np.zeros(len(indexGenes))
+    inBackground[[code[g] for g in backgroundSet if g in code]] = 1
+    selected = np.zeros(len(indexGenes))
+    selected[[code[g] for g in geneSet if g in code]] = 1
+    hits = np.asarray(incidence.T.dot(selected), dtype=np.int64).ravel()
+    sizes = np.asarray(incidence.T.dot(inBackground), dtype=np.int64).ravel()
+    return EnrichmentResult(np.array(pathwayIndex.pathways(), dtype=object), hits, sizes,
+                            len(geneSet), len(backgroundSet))
@@ -0,0 +1,232 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module parses the results of the flux balance analysis (FBA) done
+by MetaFlux, the FBA module of Pathway Tools, and keeps a cache of these
+results.
+
+The result of function run_fba (see PGDB.py and __init__.py) is a
+FBAResult object. A FBAResult is a list, so it can still be used as
+the list documented in method run_fba of class PGDB, but it also
+gives access to the fluxes as NumPy arrays indexed by reaction frame ids.
+
+The cache is keyed on a hash of the contents of the FBA input file and
+on the running Pathway Tools, so running twice the same FBA input file
+returns a copy of the first result without asking Pathway Tools to run
+MetaFlux again. The cache can only be used when the FBA input file can be
+read locally, that is, when Pathway Tools runs on the same machine or
+shares its file system. It keeps the last FBA_CACHE_SIZE results.
+
+A raw result of python-run-fba that is not a list, e.g., None when
+MetaFlux could not run at all, is returned as is, not as a FBAResult.
+"""
+
+import hashlib
+import copy
+import collections
+import config
+from PTools import PythonCycError, host_pool
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The maximum number of FBA results kept in the cache.
+FBA_CACHE_SIZE = 32
+
+# The raw results of the cached FBA runs keyed on (host, orgid, SHA-1 of the
+# FBA input file), from the least to the most recently used.
+_fba_results = collections.OrderedDict()
+
+class FBAResult(list):
+    """
+    The result of running MetaFlux on a FBA input file. The values of
+    the list are the eight values described in method run_fba of class PGDB.
+    These values are also available as the attributes success, errors, messages,
+    solver_status, biomass_flux, nb_cases, model_reactions and active_reactions.
+
+    The NumPy attributes reactions, fluxes and the method flux give the
+    flux of every reaction of the model, with a flux of zero for the
+    reactions that were not active.
+    """
+
+    def __init__(self, result):
+        if not isinstance(result, list):
+            raise PythonCycError('The result of run_fba should be a list but received {0}.'.format(result))
+        list.__init__(self, result)
+        # Pad missing values so that a short result from a failed run can still be parsed.
+        values = result + [None] * (8 - len(result))
+        self.success         = bool(values[0])
+        self.errors          = values[1] or []
+        self.messages        = values[2] or []
+        self.solver_status   = values[3]
+        self.biomass_flux    = values[4] or 0.0
+        self.nb_cases        = values[5]
+        self.model_reactions = values[6] or []
+        # List of pairs (reaction frame id, flux).
+        self.active_reactions = [_reaction_flux_pair(pair) for pair in (values[7] or [])]
+        self._reactions = None
+        self._fluxes = None
+        self._index = None
+
+    def _parse_fluxes(self):
+        """
+        Build the NumPy arrays of reactions and fluxes. The reactions are
+        those of the model followed by any active reaction not in the model
+        (e.g., exchange reactions).
+        """
+        if np is None:
+            raise PythonCycError('NumPy is needed to access the fluxes of a FBAResult as arrays. Please install NumPy.')
+        index = {}
+        for rxn in self.model_reactions:
+            index.setdefault(rxn, len(index))
+        for (rxn, flux) in self.active_reactions:
+            index.setdefault(rxn, len(index))
+        reactions = [None] * len(index)
+        for rxn, i in index.iteritems():
+            reactions[i] = rxn
+        fluxes = np.zeros(len(reactions))
+        for (rxn, flux) in self.active_reactions:
+            fluxes[index[rxn]] = flux
+        self._index = index
+        self._reactions = np.array(reactions, dtype=object)
+        self._fluxes = fluxes
+
+    @property
+    def reactions(self):
+        """ A NumPy array of the reaction frame ids of the model. """
+        if self._reactions is None:
+            self._parse_fluxes()
+        return self._reactions
+
+    @property
+    def fluxes(self):
+        """ A NumPy array of fluxes, aligned with attribute reactions. """
+        if self._fluxes is None:
+            self._parse_fluxes()
+        return self._fluxes
+
+    @property
+    def index(self):
+        """ A dictionary of reaction frame ids to their positions in attribute reactions. """
+        if self._index is None:
+            self._parse_fluxes()
+        return self._index
+
+    def flux(self, rxns):
+        """
+        Return the flux of a reaction, or a NumPy array of fluxes for a
+        list of reactions. Reactions not in the model have a flux of zero.
+
+        Parm
+           rxns, a reaction frame id or a list of reaction frame ids.
+        Return
+           a float or a NumPy array of floats.
+        """
+        if isinstance(rxns, basestring):
+            i = self.index.get(rxns)
+            return 0.0 if i is None else self.fluxes[i]
+        positions = np.array([self.index.get(rxn, -1) for rxn in rxns], dtype=int)
+        fluxes = np.zeros(len(positions))
+        known = positions >= 0
+        fluxes[known] = self.fluxes[positions[known]]
+        return fluxes
+
+    def active_fluxes(self):
+        """
+        Return the active reactions and their fluxes as two NumPy arrays.
+        """
+        active = self.fluxes != 0
+        return (self.reactions[active], self.fluxes[active])
+
+def _reaction_flux_pair(pair):
+    """
+    Convert an active reaction of a FBA result to a pair (reaction frame id, flux).
+    """
+    (a, b) = pair
+    if isinstance(a, basestring):
+        return (a, float(b))
+    else:
+        return (b, float(a))
+
+def fba_input_key(fileName, orgid=None, host=None):
+    """
+    Compute the key of the FBA cache for an FBA input file.
+
+    Parms
+       fileName, a string, the name of the FBA input file.
+       orgid, a string, the orgid under which FBA is run, or None.
+       host, a pair (host name, port) of the running Pathway Tools running FBA,
+             or None for the primary host set in config.py.
+    Return
+       a tuple (host, orgid, SHA-1 of the file contents), or None if the
+       file cannot be read locally.
+    """
+    try:
+        f = open(fileName, 'rb')
+        try:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        finally:
+            f.close()
+    except IOError:
+        return None
+    return (tuple(host or host_pool().primary()), orgid, digest)
+
+def run_fba_cached(fileName, runFn, orgid=None, useCache=True, host=None):
+    """
+    Run FBA with function runFn unless an identical FBA input file
+    has already been run successfully.
+
+    Parms
+       fileName, a string, the name of the FBA input file.
+       runFn, a function of no argument that returns the raw result of python-run-fba.
+       orgid, a string, the orgid under which FBA is run, or None.
+       useCache, a boolean, False => always run MetaFlux.
+       host, a pair (host name, port) of the running Pathway Tools called by runFn,
+             or None for the primary host set in config.py.
+    Return
+       a new FBAResult, or the raw result of runFn if it is not a list.
+    """
+    key = fba_input_key(fileName, orgid, host) if useCache else None
+    if key is not None and key in _fba_results:
+        if config._debug:
+            print 'Using cached FBA result for '+fileName
+        raw = _fba_results.pop(key)
+        _fba_results[key] = raw
+        return FBAResult(copy.deepcopy(raw))
+    raw = runFn()
+    if not isinstance(raw, list):
+        return raw
+    result = FBAResult(copy.deepcopy(raw))
+    # Only successful runs are cached, a failed run may be due to a transient problem.
+    if key is not None and result.success:
+        _fba_results[key] = raw
+        while len(_fba_results) > FBA_CACHE_SIZE:
+            _fba_results.popitem(last=False)
+    return result
+
+def clear_fba_cache():
+    """
+    Remove all the FBA results from the cache.
+    """
+    _fba_results.clear()
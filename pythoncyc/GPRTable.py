@@ -0,0 +1,275 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class GPRTable, the gene-protein-reaction associations
+of a PGDB:
+
+   gene -> protein (enzyme) -> enzymatic reaction -> reaction
+
+The associations are kept in two forms. The columns are four NumPy arrays
+of the same length, one row per association (gene, enzyme, enzymatic
+reaction, reaction). The rules are two boolean sparse matrices: an enzyme
+needs ALL the genes of its subunits (matrix enzymes x genes), and a
+reaction needs ANY of its enzymes (matrix reactions x enzymes). Knockouts
+and expression mapping are computed over these matrices for all the
+reactions at once.
+
+Use method gpr_table of class PGDB to create a GPRTable. For example,
+
+    >>> gpr = ecoli.gpr_table()
+    >>> gpr.rule_string('TRYPSYN-RXN')
+    '(|EG11024| and |EG11025|)'
+    >>> gpr.knockout(['EG11024'])
+    ['|RXN0-2381|', '|TRYPSYN-RXN|', ...]
+    >>> gpr.reaction_expression({'EG11024': 3.2, 'EG11025': 1.5})
+"""
+
+from PToolsIndex import np, sparse, require_scipy, frameid_key, as_list, unique, incidence_matrix
+
+class GPRTable():
+    """
+    The gene-protein-reaction associations of a PGDB, built with a few bulk
+    requests: the enzymatic reactions of the reactions, the enzymes of these,
+    the subunits of the enzymes from the protein index, and the genes of the
+    subunits.
+    """
+
+    def __init__(self, pgdb):
+        require_scipy('the GPR table')
+        self._orgid = pgdb._orgid
+        reactions = sorted(frameid_key(r) for r in pgdb.get_class_all_instances('|Reactions|'))
+        rxnData = pgdb.get_frames_slot_values(reactions, ['ENZYMATIC-REACTION'])
+        enzrxnsOf = dict((r, [frameid_key(er) for er in as_list(rxnData.get(r, {}).get('enzymatic_reaction'))])
+                         for r in reactions)
+        enzrxns = unique([er for r in reactions for er in enzrxnsOf[r]])
+        erData = pgdb.get_frames_slot_values(enzrxns, ['ENZYME'])
+        enzymeOf = {}
+        for er in enzrxns:
+            enzyme = [frameid_key(e) for e in as_list(erData.get(er, {}).get('enzyme'))[0:1]]
+            if enzyme and isinstance(enzyme[0], basestring):
+                enzymeOf[er] = enzyme[0]
+        enzymes = sorted(set(enzymeOf.values()))
+
+        # The subunits of the enzymes, in their unmodified forms, and the genes of these.
+        proteinIndex = pgdb.protein_index()
+        subunitsOf = {}
+        for e in enzymes:
+            subunitsOf[e] = unique([proteinIndex.unmodified_form(c)
+                                    for c in proteinIndex.base_components_of_protein(e)[0] or [e]])
+        subunits = unique([s for e in enzymes for s in subunitsOf[e]])
+        subunitData = pgdb.get_frames_slot_values(subunits, ['GENE'])
+        genesOf = dict((e, unique([frameid_key(g) for s in subunitsOf[e]
+                                   for g in as_list(subunitData.get(s, {}).get('gene'))
+                                   if isinstance(frameid_key(g), basestring)]))
+                       for e in enzymes)
+        genes = sorted(set(g for e in enzymes for g in genesOf[e]))
+
+        # The columns: one row per (gene, enzyme, enzymatic reaction, reaction),
+        # with gene None for an enzyme without known genes.
+        rows = []
+        for r in reactions:
+            for er in enzrxnsOf[r]:
+                e = enzymeOf.get(er)
+                if e is not None:
+                    rows.extend((g, e, er, r) for g in genesOf[e] or [None])
+        self._columns = {}
+        for k, name in enumerate(['gene', 'protein', 'enzrxn', 'reaction']):
+            self._columns[name] = np.array([row[k] for row in rows], dtype=object)
+
+        self._reactions = reactions
+        self._enzymes = enzymes
+        self._genes = genes
+        self._rxn_code = dict((r, i) for i, r in enumerate(reactions))
+        self._enzyme_code = dict((e, i) for i, e in enumerate(enzymes))
+        self._gene_code = dict((g, i) for i, g in enumerate(genes))
+        # The rules: AND over the genes of an enzyme, OR over the enzymes of a reaction.
+        self._and = incidence_matrix(enzymes, genes, [(e, g) for e in enzymes for g in genesOf[e]])
+        self._or = incidence_matrix(reactions, enzymes, [(row[3], row[1]) for row in rows])
+        self._nb_enzymes_of_rxn = np.asarray(self._or.sum(axis=1)).ravel()
+        self._enzymes_of_gene = self._and.T.tocsr()
+        self._rxns_of_enzyme = self._or.T.tocsr()
+
+    def __repr__(self):
+        return '<GPRTable '+self._orgid+', '+str(len(self._columns['reaction']))+' associations>'
+
+    def columns(self):
+        """
+        Return the associations as a dictionary of four NumPy arrays of the same
+        length, keyed by 'gene', 'protein', 'enzrxn' and 'reaction'. Row i is one
+        association. The gene is None for the enzymes without known genes.
+        """
+        return dict((name, column.copy()) for name, column in self._columns.iteritems())
+
+    def reactions(self):
+        """ Return the reactions, in the order of the rows of the OR matrix. """
+        return list(self._reactions)
+
+    def enzymes(self):
+        """ Return the enzymes, in the order of the rows of the AND matrix. """
+        return list(self._enzymes)
+
+    def genes(self):
+        """ Return the genes, in the order of the columns of the AND matrix. """
+        return list(self._genes)
+
+    def rule_matrices(self):
+        """
+        Return the rules as a pair of boolean SciPy CSR matrices (and, or):
+        and[e, g] is True if enzyme e needs gene g, or[r, e] is True if enzyme
+        e catalyzes reaction r. See methods genes, enzymes and reactions for the
+        order of the rows and columns.
+        """
+        return (self._and.copy(), self._or.copy())
+
+    def rule(self, rxn):
+        """
+        Return the rule of a reaction as a list of lists of genes: the reaction
+        needs all the genes of any of the lists. An enzyme without known genes
+        gives an empty list, that is, a reaction that cannot be knocked out.
+        """
+        i = self._rxn_code.get(frameid_key(rxn))
+        if i is None:
+            return []
+        return [[self._genes[j] for j in self._and.getrow(e).indices]
+                for e in self._or.getrow(i).indices]
+
+    def rule_string(self, rxn):
+        """ Return the rule of a reaction as a string, such as '(G1 and G2) or G3'. """
+        return ' or '.join('(' + ' and '.join(genes) + ')' if len(genes) > 1 else (genes[0] if genes else '()')
+                           for genes in self.rule(rxn))
+
+    def genes_of_reaction(self, rxn):
+        """
+        Same as method genes_of_reaction of class PGDB, answered locally.
+        """
+        return sorted(set(g for genes in self.rule(rxn) for g in genes))
+
+    def reactions_of_gene(self, gene):
+        """
+        Same as method reactions_of_gene of class PGDB, answered locally.
+        """
+        return sorted(set(self._columns['reaction'][self._columns['gene'] == frameid_key(gene)]))
+
+    def enzymes_of_gene(self, gene):
+        """
+        Return the enzymes of the reactions that need a gene. Unlike method
+        enzymes_of_gene of class PGDB, the enzymes without enzymatic reactions are
+        not returned.
+        """
+        j = self._gene_code.get(frameid_key(gene))
+        if j is None:
+            return []
+        return [self._enzymes[e] for e in self._enzymes_of_gene.getrow(j).indices]
+
+    def reactions_of_enzyme(self, protein):
+        """
+        Same as method reactions_of_enzyme of class PGDB, without options, answered locally.
+        """
+        e = self._enzyme_code.get(frameid_key(protein))
+        if e is None:
+            return []
+        return [self._reactions[r] for r in self._rxns_of_enzyme.getrow(e).indices]
+
+    def _gene_vector(self, genes):
+        """ A boolean vector over the genes, True for the given genes. """
+        v = np.zeros(len(self._genes), dtype=bool)
+        codes = [self._gene_code[g] for g in (frameid_key(g) for g in genes) if g in self._gene_code]
+        v[codes] = True
+        return v
+
+    def reaction_activity(self, genes):
+        """
+        Evaluate the rules of all the reactions with some genes knocked out.
+
+        Parm
+           genes, a list of the genes knocked out.
+        Return
+           a boolean NumPy array, in the order of method reactions: False for the
+           reactions whose enzymes all need a gene knocked out. The reactions
+           without enzymes are True.
+        """
+        knockedOut = self._gene_vector(genes).astype(np.int64)
+        enzymeActive = (self._and * knockedOut) == 0
+        nbActive = self._or * enzymeActive.astype(np.int64)
+        return (nbActive > 0) | (self._nb_enzymes_of_rxn == 0)
+
+    def knockout(self, genes):
+        """
+        Return the reactions blocked when the given genes are knocked out, that is,
+        the reactions whose enzymes all need one of these genes.
+        """
+        return [self._reactions[i] for i in np.nonzero(~self.reaction_activity(genes))[0]]
+
+    def single_knockouts(self):
+        """
+        Return the reactions blocked by the knockout of each gene alone, computed
+        for all the genes at once.
+
+        Return
+           a boolean SciPy CSR matrix of shape (genes, reactions): entry [g, r] is
+           True if knocking out gene g blocks reaction r. See methods genes and
+           reactions for the order of the rows and columns.
+        """
+        # The number of enzymes of each reaction needing each gene, compared to
+        # the number of enzymes of the reaction.
+        counts = (self._or.astype(np.int64) * self._and.astype(np.int64)).T.tocoo()
+        blocked = counts.data == self._nb_enzymes_of_rxn[counts.col]
+        return sparse.csr_matrix((np.ones(blocked.sum(), dtype=bool), (counts.row[blocked], counts.col[blocked])),
+                                 shape=(len(self._genes), len(self._reactions)), dtype=bool)
+
+    def reaction_expression(self, values):
+        """
+        Map gene expression values to the reactions, taking the minimum over the
+        genes of an enzyme (AND) and the maximum over the enzymes of a reaction (OR).
+        The genes without a value are ignored.
+
+        Parm
+           values, a dictionary of genes to numbers, or a NumPy array of numbers in
+                   the order of method genes, with NaN for the unknown values.
+        Return
+           a NumPy array of floats, in the order of method reactions, NaN for the
+           reactions without any value.
+        """
+        if isinstance(values, dict):
+            x = np.empty(len(self._genes))
+            x.fill(np.nan)
+            for g, value in values.iteritems():
+                j = self._gene_code.get(frameid_key(g))
+                if j is not None:
+                    x[j] = value
+        else:
+            x = np.asarray(values, dtype=float)
+        enzymeValues = _reduce_rows(np.fmin, self._and, x)
+        return _reduce_rows(np.fmax, self._or, enzymeValues)
+
+def _reduce_rows(ufunc, m, x):
+    """
+    Reduce with ufunc, for every row of the CSR matrix m, the values of x at the
+    columns of the row. The empty rows give NaN.
+    """
+    result = np.empty(m.shape[0])
+    result.fill(np.nan)
+    nonEmpty = np.nonzero(np.diff(m.indptr) > 0)[0]
+    if len(nonEmpty):
+        result[nonEmpty] = ufunc.reduceat(x[m.indices], m.indptr[nonEmpty])
+    return result
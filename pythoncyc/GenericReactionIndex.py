@@ -0,0 +1,228 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class GenericReactionIndex, a local index of the
+compound classes of a PGDB and of the generic reactions, that is, the
+reactions with a compound class as substrate, with their specific forms.
+
+A compound class covers itself, its subclasses and its instances. This
+covering relation is kept as a boolean sparse matrix over the substrates.
+A reaction S is a specific form of a generic reaction G when, on each
+side and in the same or the reverse direction, every substrate of G covers
+a substrate of S and every substrate of S is covered by a substrate of G.
+This is computed for all the reactions at once with products of the
+covering matrix and the matrices of the substrates of the reactions.
+
+Use method generic_reaction_index of class PGDB to create a
+GenericReactionIndex. For example,
+
+    >>> gri = ecoli.generic_reaction_index()
+    >>> gri.specific_forms_of_rxn('ALCOHOL-DEHYDROG-GENERIC-RXN')
+    >>> gri.members_of_class('Alcohols')
+    >>> gri.expand_reactions(ecoli.all_rxns())
+"""
+
+from PToolsIndex import np, sparse, require_scipy, frameid_key, as_list, unique
+
+class GenericReactionIndex():
+    """
+    A local index of the compound classes and of the generic reactions of a
+    PGDB, built with a few bulk requests: the hierarchy of the compounds and
+    the substrates of the reactions.
+    """
+
+    def __init__(self, pgdb):
+        require_scipy('the generic reaction index')
+        self._orgid = pgdb._orgid
+        (supersOf, typesOf) = pgdb.get_class_hierarchy('|Compounds|')
+        reactions = sorted(frameid_key(r) for r in pgdb.get_class_all_instances('|Reactions|'))
+        data = pgdb.get_frames_slot_values(reactions, ['LEFT', 'RIGHT'])
+        sides = {}
+        for side in ['left', 'right']:
+            sides[side] = dict((r, unique([s for s in (frameid_key(x) for x in as_list(data.get(r, {}).get(side)))
+                                           if isinstance(s, basestring)]))
+                               for r in reactions)
+
+        # The nodes are the compound classes, the compounds and the other substrates.
+        self._classes = set(['|Compounds|']) | set(supersOf)
+        nodes = sorted(self._classes) + sorted(set(typesOf) - self._classes)
+        nodes += sorted(set(s for side in sides.values() for ss in side.values() for s in ss) - set(nodes))
+        code = dict((n, i) for i, n in enumerate(nodes))
+        n = len(nodes)
+        pairs = [(code[sup], code[c]) for c, sups in supersOf.iteritems() for sup in sups if sup in code] + \
+                [(code[t], code[x]) for x, types in typesOf.iteritems() for t in types if t in code]
+        direct = sparse.csr_matrix((np.ones(len(pairs), dtype=np.int64), ([p[0] for p in pairs], [p[1] for p in pairs])),
+                                   shape=(n, n))
+        # covers[i, j] is True if node i is node j or one of its direct or indirect classes.
+        covers = sparse.identity(n, dtype=np.int64, format='csr')
+        power = covers
+        for depth in range(n):
+            power = (power * direct).tocsr()
+            power.eliminate_zeros()
+            if power.nnz == 0:
+                break
+            covers = covers + power
+        self._covers = (covers != 0).tocsr()
+        self._covered_by = self._covers.T.tocsr()
+        self._nodes = np.array(nodes, dtype=object)
+        self._code = code
+
+        # The substrates of the reactions, then the specific forms of the generic reactions.
+        self._reactions = reactions
+        self._rxn_code = dict((r, i) for i, r in enumerate(reactions))
+        matrices = {}
+        for side in ['left', 'right']:
+            rows = [i for i, r in enumerate(reactions) for s in sides[side][r]]
+            columns = [code[s] for r in reactions for s in sides[side][r]]
+            matrices[side] = sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, columns)), shape=(len(reactions), n))
+        isClass = np.zeros(n, dtype=np.int64)
+        isClass[[code[c] for c in self._classes]] = 1
+        generic = np.nonzero((matrices['left'] * isClass + matrices['right'] * isClass) > 0)[0]
+        self._generics = [reactions[i] for i in generic]
+        self._generic_code = dict((r, k) for k, r in enumerate(self._generics))
+        self._substrates = matrices
+        specific = None
+        for (genericSide, specificSide) in [(('left', 'right'), ('left', 'right')), (('left', 'right'), ('right', 'left'))]:
+            match = None
+            for (gs, ss) in zip(genericSide, specificSide):
+                m = self._side_match(matrices[gs][generic], matrices[ss])
+                match = m if match is None else match.multiply(m)
+            specific = match if specific is None else specific + match
+        # A generic reaction is not a specific form of itself.
+        itself = sparse.csr_matrix((np.ones(len(generic), dtype=np.int64), (np.arange(len(generic)), generic)),
+                                   shape=specific.shape)
+        self._specific = (((specific != 0).astype(np.int64) - itself) > 0).tocsr()
+        self._nonspecific = self._specific.T.tocsr()
+
+    def _side_match(self, genericSide, specificSide):
+        """
+        Return a boolean sparse matrix (generic reactions x reactions): True if,
+        on one side, every substrate of the generic reaction covers a substrate
+        of the reaction, and every substrate of the reaction is covered by a
+        substrate of the generic reaction. Both sides must have substrates.
+        """
+        covers = self._covers.astype(np.int64)
+        nbGeneric = np.asarray(genericSide.sum(axis=1)).ravel()
+        nbSpecific = np.asarray(specificSide.sum(axis=1)).ravel()
+        # The substrates of the reactions covered by some substrate of each generic reaction.
+        coveredByGeneric = ((genericSide * covers) != 0).astype(np.int64)
+        allCovered = (specificSide * coveredByGeneric.T).tocoo()
+        ok1 = allCovered.data == nbSpecific[allCovered.row]
+        # The substrates of each generic reaction that cover some substrate of the reactions.
+        coveringSpecific = ((specificSide * covers.T) != 0).astype(np.int64)
+        allCovering = (coveringSpecific * genericSide.T).tocoo()
+        ok2 = allCovering.data == nbGeneric[allCovering.col]
+        shape = (genericSide.shape[0], specificSide.shape[0])
+        m1 = sparse.csr_matrix((np.ones(ok1.sum(), dtype=np.int64), (allCovered.col[ok1], allCovered.row[ok1])), shape=shape)
+        m2 = sparse.csr_matrix((np.ones(ok2.sum(), dtype=np.int64), (allCovering.col[ok2], allCovering.row[ok2])), shape=shape)
+        return m1.multiply(m2).tocsr()
+
+    def __repr__(self):
+        return '<GenericReactionIndex '+self._orgid+', '+str(len(self._generics))+' generic reactions, '+ \
+               str(self._specific.nnz)+' specific forms>'
+
+    def compound_classes(self):
+        """ Return the compound classes, including |Compounds|. """
+        return sorted(self._classes)
+
+    def members_of_class(self, cls, include_subclasses=False):
+        """
+        Return the compounds that are direct or indirect instances of a compound
+        class, with its direct or indirect subclasses if include_subclasses is True.
+        """
+        i = self._code.get(frameid_key(cls))
+        if i is None:
+            return []
+        return sorted(c for c in self._nodes[self._covers.getrow(i).indices]
+                      if c != self._nodes[i] and (include_subclasses or not (c in self._classes)))
+
+    def classes_of_compound(self, cpd):
+        """ Return the direct and indirect compound classes of a compound or of a class. """
+        i = self._code.get(frameid_key(cpd))
+        if i is None:
+            return []
+        return sorted(c for c in self._nodes[self._covered_by.getrow(i).indices] if c != self._nodes[i])
+
+    def generic_reactions(self):
+        """ Return the reactions with a compound class as substrate. """
+        return list(self._generics)
+
+    def specific_forms_matrix(self):
+        """
+        Return the specific forms of all the generic reactions as a boolean SciPy
+        CSR matrix of shape (generic reactions, reactions), in the order of
+        methods generic_reactions and reactions.
+        """
+        return self._specific.copy()
+
+    def reactions(self):
+        """ Return the reactions, in the order of the columns of the specific forms matrix. """
+        return list(self._reactions)
+
+    def specific_forms_of_rxn(self, rxn):
+        """
+        Same as method specific_forms_of_rxn of class PGDB, answered locally.
+        """
+        k = self._generic_code.get(frameid_key(rxn))
+        if k is None:
+            return []
+        return [self._reactions[i] for i in self._specific.getrow(k).indices]
+
+    def nonspecific_forms_of_rxn(self, rxn):
+        """
+        Same as method nonspecific_forms_of_rxn of class PGDB, answered locally.
+        """
+        i = self._rxn_code.get(frameid_key(rxn))
+        if i is None:
+            return []
+        return [self._generics[k] for k in self._nonspecific.getrow(i).indices]
+
+    def rxn_specific_form_of_rxn_p(self, specific_rxn, generic_rxn):
+        """
+        Same as method rxn_specific_form_of_rxn_p of class PGDB, answered locally.
+        """
+        k = self._generic_code.get(frameid_key(generic_rxn))
+        i = self._rxn_code.get(frameid_key(specific_rxn))
+        return k is not None and i is not None and bool(self._specific[k, i])
+
+    def substrate_of_generic_rxn(self, cpd, rxn):
+        """
+        Same as method substrate_of_generic_rxn of class PGDB, answered locally.
+        """
+        i = self._rxn_code.get(frameid_key(rxn))
+        if i is None:
+            return False
+        substrates = set(self._substrates['left'].getrow(i).indices) | set(self._substrates['right'].getrow(i).indices)
+        classes = self.classes_of_compound(cpd)
+        return any(self._code[c] in substrates for c in classes)
+
+    def expand_reactions(self, rxns):
+        """
+        Return the given reactions followed by the specific forms of the generic
+        ones among them, without duplicates.
+        """
+        rxns = [frameid_key(r) for r in rxns]
+        generic = np.zeros(len(self._generics), dtype=np.int64)
+        generic[[self._generic_code[r] for r in rxns if r in self._generic_code]] = 1
+        specific = np.nonzero(self._nonspecific * generic)[0]
+        return unique(rxns + [self._reactions[i] for i in specific])
@@ -0,0 +1,448 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class GenomeIndex, a local index of the positions of
+the genes, promoters, terminators and DNA binding sites on the replicons
+of a PGDB.
+
+Use method genome_index of class PGDB to create a GenomeIndex. For example,
+
+    >>> gi = ecoli.genome_index()
+    >>> gi.next_gene_on_replicon('EG11024')
+    >>> gi.features_in_window('COLI-K12', 1000, 5000)
+
+The index keeps, for each replicon, the features sorted by their left end
+positions in NumPy arrays. A neighbor query is answered by the rank of a
+gene on its replicon, and an overlap or window query by a binary search
+on the sorted left end positions. Genes are clustered locally by method
+gene_clusters, or for several organisms at once by function
+gene_clusters_of_organisms.
+"""
+
+from PToolsIndex import np, require_numpy, frameid_key, as_list, first_value
+
+# The kinds of features kept by a GenomeIndex, as (class, kind name).
+FEATURE_CLASSES = [('|Genes|', 'gene'),
+                   ('|Promoters|', 'promoter'),
+                   ('|Terminators|', 'terminator'),
+                   ('|DNA-Binding-Sites|', 'binding-site')]
+
+class _Intervals():
+    """
+    Intervals [left, right] sorted by left end positions. The intervals that
+    overlap a query interval [a, b] have a left end position in [a - L, b]
+    where L is the length of the longest interval, so they are found by two
+    binary searches followed by a filter on the right end positions.
+    """
+    def __init__(self, ids, left, right, kinds):
+        order = np.lexsort((right, left))
+        self.ids   = np.array(ids, dtype=object)[order]
+        self.left  = np.array(left, dtype=np.int64)[order]
+        self.right = np.array(right, dtype=np.int64)[order]
+        self.kinds = np.array(kinds, dtype=object)[order]
+        self.maxLength = int((self.right - self.left).max()) if len(ids) else 0
+
+    def overlapping(self, a, b):
+        """ Return the positions of the intervals overlapping [a, b]. """
+        lo = np.searchsorted(self.left, a - self.maxLength, 'left')
+        hi = np.searchsorted(self.left, b, 'right')
+        return lo + np.nonzero(self.right[lo:hi] >= a)[0]
+
+class GenomeIndex():
+    """
+    A local index of the genomic features of a PGDB. The index is built
+    with one request per class of features and answers the neighbor,
+    overlap and window queries without communicating with Pathway Tools.
+
+    Features without positions are not placed on their replicons but their
+    transcription units are still known.
+    """
+
+    def __init__(self, pgdb):
+        require_numpy('the genome index')
+        self._orgid = pgdb._orgid
+        replicons = [frameid_key(r) for r in pgdb.get_class_all_instances('|Genetic-Elements|')]
+        repliconData = pgdb.get_frames_slot_values(replicons, ['CIRCULAR?'])
+        self._circular = dict((r, bool(first_value(repliconData.get(r, {}).get('circular_p'))))
+                              for r in replicons)
+        tus = set(frameid_key(tu) for tu in pgdb.get_class_all_instances('|Transcription-Units|'))
+
+        # Location of each feature as (left, right, direction, kind), and
+        # the transcription units containing each feature.
+        self._location = {}
+        self._tus_of = {}
+        self._replicon_of = {}
+        slots = {'gene':         ['LEFT-END-POSITION', 'RIGHT-END-POSITION', 'TRANSCRIPTION-DIRECTION', 'COMPONENT-OF'],
+                 'promoter':     ['ABSOLUTE-PLUS-1-POS', 'COMPONENT-OF'],
+                 'terminator':   ['LEFT-END-POSITION', 'RIGHT-END-POSITION', 'COMPONENT-OF'],
+                 'binding-site': ['ABS-CENTER-POS', 'SITE-LENGTH', 'COMPONENT-OF']}
+        for className, kind in FEATURE_CLASSES:
+            frameids = pgdb.get_class_all_instances(className)
+            for frameid, data in pgdb.get_frames_slot_values(frameids, slots[kind]).iteritems():
+                containers = [frameid_key(c) for c in as_list(data['component_of'])]
+                self._tus_of[frameid] = [c for c in containers if c in tus]
+                if kind == 'gene':
+                    for c in containers:
+                        if c in self._circular:
+                            self._replicon_of[frameid] = c
+                self._location[frameid] = _feature_location(kind, data)
+
+        # The replicon of a feature that is not a gene is the replicon
+        # of the genes of its transcription units.
+        self._members_of_tu = {}
+        for frameid, tusOfFeature in self._tus_of.iteritems():
+            for tu in tusOfFeature:
+                self._members_of_tu.setdefault(tu, []).append(frameid)
+        for tu, members in self._members_of_tu.iteritems():
+            replicon = None
+            for m in members:
+                replicon = replicon or self._replicon_of.get(m)
+            if replicon:
+                self._replicon_of[tu] = replicon
+                for m in members:
+                    self._replicon_of.setdefault(m, replicon)
+
+        # The sorted arrays, per replicon.
+        placed = {}
+        for frameid, (left, right, direction, kind) in self._location.iteritems():
+            replicon = self._replicon_of.get(frameid)
+            if replicon and left is not None:
+                placed.setdefault(replicon, []).append((frameid, left, right, kind))
+        self._features = {}
+        self._genes = {}
+        self._gene_rank = {}
+        for replicon, features in placed.iteritems():
+            ids, left, right, kinds = zip(*features)
+            intervals = _Intervals(ids, left, right, kinds)
+            self._features[replicon] = intervals
+            genes = intervals.ids[intervals.kinds == 'gene']
+            self._genes[replicon] = genes
+            for rank, gene in enumerate(genes):
+                self._gene_rank[gene] = rank
+
+    def __repr__(self):
+        return '<GenomeIndex '+self._orgid+', '+str(len(self._gene_rank))+' placed genes on '+str(len(self._genes))+' replicons>'
+
+    def replicons(self):
+        """
+        Return the frame ids of the replicons that have placed features.
+        """
+        return sorted(self._features.keys())
+
+    def replicon_of(self, item):
+        """
+        Return the replicon (an instance of class Genetic-Elements) of a feature, or None.
+        """
+        return self._replicon_of.get(frameid_key(item))
+
+    def location(self, item):
+        """
+        Return the location of a feature as a list [replicon, left, right, direction],
+        where direction is '+', '-' or None, or None if the feature has no known location.
+        """
+        item = frameid_key(item)
+        if not (item in self._location) or self._location[item][0] is None:
+            return None
+        (left, right, direction, kind) = self._location[item]
+        return [self._replicon_of.get(item), left, right, direction]
+
+    def genes_of_replicon(self, replicon):
+        """
+        Return the genes of a replicon sorted by their left end positions.
+        """
+        return list(self._genes.get(frameid_key(replicon), []))
+
+    def _neighbor_gene(self, gene, step):
+        gene = frameid_key(gene)
+        if not (gene in self._gene_rank):
+            return [None, None]
+        replicon = self._replicon_of[gene]
+        genes = self._genes[replicon]
+        rank = self._gene_rank[gene] + step
+        if 0 <= rank < len(genes):
+            return [genes[rank], None]
+        elif self._circular.get(replicon) and len(genes) > 1:
+            return [genes[rank % len(genes)], None]
+        else:
+            return [None, 'last' if step > 0 else 'first']
+
+    def next_gene_on_replicon(self, gene):
+        """
+        Same as method next_gene_on_replicon of class PGDB, answered locally.
+        Return a list of two values: the next gene, or None, and 'last' if
+        the gene is the last gene of a linear replicon.
+        """
+        return self._neighbor_gene(gene, 1)
+
+    def previous_gene_on_replicon(self, gene):
+        """
+        Same as method previous_gene_on_replicon of class PGDB, answered locally.
+        Return a list of two values: the previous gene, or None, and 'first' if
+        the gene is the first gene of a linear replicon.
+        """
+        return self._neighbor_gene(gene, -1)
+
+    def gene_distance(self, g1, g2):
+        """
+        Return the number of genes separating g1 and g2 on their replicon
+        (1 for adjacent genes), or None if they are not placed on the same replicon.
+        """
+        g1 = frameid_key(g1)
+        g2 = frameid_key(g2)
+        if not (g1 in self._gene_rank and g2 in self._gene_rank):
+            return None
+        replicon = self._replicon_of[g1]
+        if replicon != self._replicon_of[g2]:
+            return None
+        d = abs(self._gene_rank[g1] - self._gene_rank[g2])
+        if self._circular.get(replicon):
+            d = min(d, len(self._genes[replicon]) - d)
+        return d
+
+    def adjacent_genes_p(self, g1, g2):
+        """
+        Same as method adjacent_genes_p of class PGDB, answered locally.
+        """
+        return self.gene_distance(g1, g2) == 1
+
+    def neighboring_genes_p(self, g1, g2, n=10):
+        """
+        Same as method neighboring_genes_p of class PGDB, answered locally.
+        """
+        d = self.gene_distance(g1, g2)
+        return d is not None and d <= n
+
+    def _gene_ranks(self, genes):
+        """
+        Return four NumPy arrays for a list of genes: the replicon codes and
+        the ranks of the genes (-1 for genes not placed), and, indexed by
+        replicon codes, the number of genes and the circularity of the replicons.
+        """
+        replicons = self.replicons()
+        codeOf = dict((r, i) for i, r in enumerate(replicons))
+        codes = np.array([codeOf[self._replicon_of[g]] if g in self._gene_rank else -1 for g in genes], dtype=np.int64)
+        ranks = np.array([self._gene_rank.get(g, -1) for g in genes], dtype=np.int64)
+        sizes = np.array([len(self._genes[r]) for r in replicons], dtype=np.int64)
+        circular = np.array([bool(self._circular.get(r)) for r in replicons], dtype=bool)
+        return (codes, ranks, sizes, circular)
+
+    def gene_clusters(self, genes=None, max_gap=10):
+        """
+        Local version of method gene_clusters of class PGDB. Instead of a list
+        of neighbor lists, the clusters are returned as a cluster id for each gene.
+        Two genes are in the same cluster when they are on the same replicon
+        and a chain of genes from genes links them where consecutive genes of
+        the chain are at most max_gap genes from one another.
+
+        Parms
+           genes, a list of frame ids or PFrames. Defaults to all placed genes.
+           max_gap, an integer, the maximum distance, in number of genes, between
+                    two consecutive genes of a cluster.
+        Return
+           two NumPy arrays: the frame ids of the genes and their cluster ids,
+           numbered from 0. Genes not placed on a replicon have cluster id -1.
+        """
+        if genes is None:
+            genes = self._gene_rank.keys()
+        genes = [frameid_key(g) for g in genes]
+        (codes, ranks, sizes, circular) = self._gene_ranks(genes)
+        return (np.array(genes, dtype=object), cluster_ranks(codes, ranks, sizes, circular, max_gap))
+
+    def features_in_window(self, replicon, left, right, kinds=None, length=None):
+        """
+        Return the features overlapping the window [left, right] of a replicon,
+        sorted by their left end positions.
+
+        On a circular replicon, a window with left > right crosses the origin:
+        it is split into the windows from left to the end of the replicon and from
+        its start to right. If the length of the replicon is given, a window
+        extending past the origin, with left < 1 or right > length, is split too.
+
+        Parms
+           replicon, a frame id or PFrame of an instance of class Genetic-Elements.
+           left, right, integers, the window in base pairs.
+           kinds, a list of kinds of features to return among 'gene', 'promoter',
+                  'terminator' and 'binding-site'. Defaults to all kinds.
+           length, an integer, the length of a circular replicon in base pairs, or None.
+        Return
+           a list of frame ids.
+        """
+        replicon = frameid_key(replicon)
+        intervals = self._features.get(replicon)
+        if intervals is None:
+            return []
+        if self._circular.get(replicon) and length:
+            if right - left + 1 >= length:
+                (left, right) = (1, length)
+            else:
+                (left, right) = ((left - 1) % length + 1, (right - 1) % length + 1)
+        if self._circular.get(replicon) and left > right:
+            # The features are within the replicon, so the ends of the two windows are
+            # the smallest left end and the largest right end of the features.
+            positions = np.union1d(intervals.overlapping(left, int(intervals.right.max())),
+                                   intervals.overlapping(int(intervals.left[0]), right))
+        else:
+            positions = intervals.overlapping(left, right)
+        if kinds is not None:
+            positions = positions[np.in1d(intervals.kinds[positions], list(kinds))]
+        return list(intervals.ids[positions])
+
+    def genes_in_window(self, replicon, left, right, length=None):
+        """
+        Return the genes overlapping the window [left, right] of a replicon.
+        See method features_in_window for the windows crossing the origin.
+        """
+        return self.features_in_window(replicon, left, right, kinds=['gene'], length=length)
+
+    def overlapping_features(self, item, kinds=None):
+        """
+        Return the features, other than item, that overlap the given feature.
+        """
+        return self.features_near(item, 0, kinds)
+
+    def features_near(self, item, distance, kinds=None, length=None):
+        """
+        Return the features, other than item, that are at most distance base
+        pairs from the given feature. If the length of a circular replicon is
+        given, the features across its origin are included.
+        """
+        item = frameid_key(item)
+        location = self.location(item)
+        if location is None:
+            return []
+        [replicon, left, right, direction] = location
+        return [f for f in self.features_in_window(replicon, left - distance, right + distance, kinds, length)
+                if f != item]
+
+    def containing_tus(self, site):
+        """
+        Same as method containing_tus of class PGDB, answered locally.
+        """
+        site = frameid_key(site)
+        if site in self._members_of_tu:
+            return [site]
+        return list(self._tus_of.get(site, []))
+
+    def binding_sites_affecting_gene(self, gene):
+        """
+        Same as method binding_sites_affecting_gene of class PGDB, answered locally.
+        """
+        sites = []
+        for tu in self._tus_of.get(frameid_key(gene), []):
+            for m in self._members_of_tu.get(tu, []):
+                if self._location[m][3] == 'binding-site' and not (m in sites):
+                    sites.append(m)
+        return sites
+
+def cluster_ranks(codes, ranks, sizes, circular, max_gap):
+    """
+    Cluster genes given by the codes of their replicons and their ranks on these
+    replicons, in one pass over the arrays sorted by replicon and rank. A new
+    cluster starts at each change of replicon or when the gap with the previous
+    gene is larger than max_gap. On a circular replicon, the last and first
+    clusters are merged when they are close across the origin.
+
+    Parms
+       codes, a NumPy array of integers, the replicon code of each gene, -1 if not placed.
+       ranks, a NumPy array of integers, the rank of each gene on its replicon.
+       sizes, a NumPy array of integers, the number of genes of each replicon code.
+       circular, a NumPy array of booleans, True for each circular replicon code.
+       max_gap, an integer.
+    Return
+       a NumPy array of cluster ids, numbered from 0, aligned with codes, -1 for genes not placed.
+    """
+    clusters = np.empty(len(codes), dtype=np.int64)
+    clusters.fill(-1)
+    placed = np.nonzero(codes >= 0)[0]
+    if len(placed) == 0:
+        return clusters
+    order = placed[np.lexsort((ranks[placed], codes[placed]))]
+    c = codes[order]
+    k = ranks[order]
+    newCluster = np.ones(len(order), dtype=bool)
+    newCluster[1:] = (c[1:] != c[:-1]) | (k[1:] - k[:-1] > max_gap)
+    ids = np.cumsum(newCluster) - 1
+    # First and last genes of each replicon, in the sorted arrays.
+    first = np.nonzero(np.r_[True, c[1:] != c[:-1]])[0]
+    last = np.r_[first[1:] - 1, len(order) - 1]
+    wrap = circular[c[first]] & (k[first] + sizes[c[first]] - k[last] <= max_gap) & (ids[first] != ids[last])
+    mapping = np.arange(ids[-1] + 1)
+    mapping[ids[last[wrap]]] = ids[first[wrap]]
+    clusters[order] = np.unique(mapping[ids], return_inverse=True)[1]
+    return clusters
+
+def gene_clusters_of_organisms(genomeIndexes, genesLists=None, max_gap=10):
+    """
+    Cluster the genes of several organisms in a single pass. See method
+    gene_clusters of class GenomeIndex.
+
+    Parms
+       genomeIndexes, a list of GenomeIndex objects, one per organism.
+       genesLists, a list of lists of genes, one list per GenomeIndex, or None
+                   to cluster all placed genes of each organism.
+       max_gap, an integer.
+    Return
+       three NumPy arrays: the orgids, the gene frame ids and the cluster ids,
+       unique across all organisms. Genes not placed have cluster id -1.
+    """
+    if genesLists is None:
+        genesLists = [None] * len(genomeIndexes)
+    orgids, allGenes, allCodes, allRanks, allSizes, allCircular = [], [], [], [], [], []
+    offset = 0
+    for gi, genes in zip(genomeIndexes, genesLists):
+        genes = [frameid_key(g) for g in (gi._gene_rank.keys() if genes is None else genes)]
+        (codes, ranks, sizes, circular) = gi._gene_ranks(genes)
+        # Shift the replicon codes so that they are unique across organisms.
+        allCodes.append(np.where(codes >= 0, codes + offset, -1))
+        offset += len(sizes)
+        allRanks.append(ranks)
+        allSizes.append(sizes)
+        allCircular.append(circular)
+        allGenes.extend(genes)
+        orgids.extend([gi._orgid] * len(genes))
+    clusters = cluster_ranks(np.concatenate(allCodes), np.concatenate(allRanks),
+                             np.concatenate(allSizes), np.concatenate(allCircular), max_gap)
+    return (np.array(orgids, dtype=object), np.array(allGenes, dtype=object), clusters)
+
+def _feature_location(kind, data):
+    """
+    Return the location (left, right, direction, kind) of a feature from its slot values.
+    """
+    direction = None
+    if kind == 'promoter':
+        left = right = first_value(data['absolute_plus_1_pos'])
+    elif kind == 'binding-site':
+        center = first_value(data['abs_center_pos'])
+        length = first_value(data['site_length']) or 0
+        if center is None:
+            left = right = None
+        else:
+            left  = int(center - length / 2)
+            right = int(center + length / 2)
+    else:
+        left  = first_value(data['left_end_position'])
+        right = first_value(data['right_end_position'])
+        direction = first_value(data.get('transcription_direction'))
+    if left is not None and right is None:
+        right = left
+    return (left, right, direction, kind)
@@ -0,0 +1,194 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class ModulatorIndex, a local index of all the
+regulation frames of a PGDB, in both directions:
+
+   modulator (regulator) <-> regulation frame <-> regulated entity
+
+Each regulation frame has a sign (see function mode_sign of
+RegulationIndex.py), its mechanisms, whether it is physiologically
+relevant, and its kind: 'enzyme' for the regulation of the activity of
+an enzymatic reaction, 'transcription' for the regulation of
+transcription, 'other' for the other regulations. The regulations are
+kept as columnar NumPy arrays, one row per regulation frame, and the
+questions are answered by masking these arrays.
+
+The compounds bound to the transcription factors are found from the
+composition of the regulators in the protein index of the PGDB.
+
+Use method modulator_index of class PGDB to create a ModulatorIndex. For example,
+
+    >>> mi = ecoli.modulator_index()
+    >>> mi.regulated_by_compound('TRP', mode='-')
+    >>> mi.enzrxn_inhibitors('ANTHRANSYN-ENZRXN', phys_relevant_only=True)
+    >>> mi.tfs_bound_to_compound('TRP')
+"""
+
+from PToolsIndex import np, require_numpy, frameid_key, as_list, first_value, unique
+from RegulationIndex import REGULATION_CLASS, mode_sign
+
+# The class of the regulations of the activity of the enzymatic reactions.
+ENZYME_REGULATION_CLASS = '|Regulation-of-Enzyme-Activity|'
+
+def _mechanism_key(mechanism):
+    """ A mechanism, such as :ALLOSTERIC or |COMPETITIVE|, as an upper case string. """
+    return str(frameid_key(mechanism)).strip('|').lstrip(':').upper()
+
+class ModulatorIndex():
+    """
+    A local index of the regulation frames of a PGDB, built with a few bulk
+    requests: the instances of class Regulation, of its subclasses for the
+    regulation of enzymes and of transcription, and the slots of these frames.
+    """
+
+    def __init__(self, pgdb):
+        require_numpy('the modulator index')
+        self._orgid = pgdb._orgid
+        regs = sorted(frameid_key(r) for r in pgdb.get_class_all_instances('|Regulation|'))
+        enzymeRegs = set(frameid_key(r) for r in pgdb.get_class_all_instances(ENZYME_REGULATION_CLASS))
+        transcriptionRegs = set(frameid_key(r) for r in pgdb.get_class_all_instances(REGULATION_CLASS))
+        data = pgdb.get_frames_slot_values(regs, ['REGULATOR', 'REGULATED-ENTITY', 'MODE', 'MECHANISM',
+                                                  'PHYSIOLOGICALLY-RELEVANT?'])
+        rows = []
+        for reg in regs:
+            slots = data.get(reg, {})
+            regulator = frameid_key(first_value(slots.get('regulator')))
+            regulated = frameid_key(first_value(slots.get('regulated_entity')))
+            kind = 'enzyme' if reg in enzymeRegs else ('transcription' if reg in transcriptionRegs else 'other')
+            rows.append((reg, regulator, regulated, mode_sign(slots.get('mode')),
+                         tuple(_mechanism_key(m) for m in as_list(slots.get('mechanism'))),
+                         bool(first_value(slots.get('physiologically_relevant_p'))), kind))
+        self._columns = {}
+        for k, name in enumerate(['regulation', 'regulator', 'regulated', 'sign', 'mechanisms', 'phys_relevant', 'kind']):
+            self._columns[name] = np.empty(len(rows), dtype=object)
+            self._columns[name][:] = [row[k] for row in rows]
+        self._columns['sign'] = self._columns['sign'].astype(np.int8)
+        self._columns['phys_relevant'] = self._columns['phys_relevant'].astype(bool)
+        self._rows_of_regulator = {}
+        self._rows_of_regulated = {}
+        for i, row in enumerate(rows):
+            self._rows_of_regulator.setdefault(row[1], []).append(i)
+            self._rows_of_regulated.setdefault(row[2], []).append(i)
+
+        # The transcription factors bound to compounds: the small molecules among
+        # the base components of the regulators of transcription.
+        tfs = unique([row[1] for row in rows if row[6] == 'transcription' and isinstance(row[1], basestring)])
+        proteinIndex = pgdb.protein_index() if tfs else None
+        self._tfs_of_cpd = {}
+        for tf in tfs:
+            (components, coefficients) = proteinIndex.base_components_of_protein(tf, exclude_small_molecules=False)
+            (proteins, coefficients) = proteinIndex.base_components_of_protein(tf)
+            for cpd in set(components) - set(proteins) - set([tf]):
+                self._tfs_of_cpd.setdefault(cpd, []).append(tf)
+
+    def __repr__(self):
+        return '<ModulatorIndex '+self._orgid+', '+str(len(self._columns['regulation']))+' regulations>'
+
+    def columns(self):
+        """
+        Return the regulations as a dictionary of NumPy arrays of the same length, keyed
+        by 'regulation', 'regulator', 'regulated', 'sign' (+1, -1 or 0), 'mechanisms'
+        (tuples of strings such as 'ALLOSTERIC'), 'phys_relevant' (booleans) and 'kind'
+        ('enzyme', 'transcription' or 'other'). Row i is one regulation frame.
+        """
+        return dict((name, column.copy()) for name, column in self._columns.iteritems())
+
+    def _select(self, rows, mode=None, mechanisms=None, phys_relevant=None, kind=None):
+        """ The rows, a list of row indices, that match the given filters, as a NumPy array. """
+        rows = np.array(rows, dtype=np.int64)
+        if mode is not None:
+            rows = rows[self._columns['sign'][rows] == mode_sign(mode)]
+        if phys_relevant:
+            rows = rows[self._columns['phys_relevant'][rows]]
+        if kind is not None:
+            rows = rows[self._columns['kind'][rows] == kind]
+        if mechanisms:
+            mechanisms = set(_mechanism_key(m) for m in as_list(mechanisms))
+            rows = rows[np.array([bool(mechanisms.intersection(self._columns['mechanisms'][i])) for i in rows],
+                                 dtype=bool)]
+        return rows
+
+    def regulated_by(self, modulators, mode=None, mechanisms=None, phys_relevant=None, kind=None):
+        """
+        Return the entities regulated by some modulators.
+
+        Parms
+           modulators, a modulator or a list of modulators (compounds, proteins, ...).
+           mode, '+', '-' or None for any sign of regulation.
+           mechanisms, a list of mechanisms (e.g., ['ALLOSTERIC']), or None for any.
+           phys_relevant, if True, only the physiologically relevant regulations.
+           kind, 'enzyme', 'transcription', 'other' or None for any.
+        Return
+           a list of frame ids, the regulated enzymatic reactions, promoters, genes...
+        """
+        rows = [i for m in as_list(modulators) for i in self._rows_of_regulator.get(frameid_key(m), [])]
+        rows = self._select(rows, mode, mechanisms, phys_relevant, kind)
+        return sorted(set(self._columns['regulated'][rows]))
+
+    def modulators_of(self, entity, mode=None, mechanisms=None, phys_relevant=None, kind=None):
+        """
+        Return the modulators of a regulated entity. See method regulated_by for
+        the filters mode, mechanisms, phys_relevant and kind.
+        """
+        rows = self._select(self._rows_of_regulated.get(frameid_key(entity), []), mode, mechanisms, phys_relevant, kind)
+        return sorted(set(r for r in self._columns['regulator'][rows] if r is not None))
+
+    def regulated_by_compound(self, cpd, mode=None, mechanisms=None, phys_relevant=None):
+        """
+        Return the enzymatic reactions whose activity is regulated by a compound,
+        or by any compound of a list. See method regulated_by for the filters.
+        """
+        return self.regulated_by(cpd, mode, mechanisms, phys_relevant, kind='enzyme')
+
+    def deactivated_or_inhibited_by_compound(self, cpds, mode=None, mechanisms=None, phys_relevant=None):
+        """
+        Same as method deactivated_or_inhibited_by_compound of class PGDB, without
+        option slots, answered locally.
+        """
+        return self.regulated_by_compound(cpds, mode, mechanisms, phys_relevant)
+
+    def enzrxn_activators(self, er, phys_relevant_only=None):
+        """
+        Same as method enzrxn_activators of class PGDB, answered locally.
+        """
+        return self.modulators_of(er, '+', phys_relevant=phys_relevant_only, kind='enzyme')
+
+    def enzrxn_inhibitors(self, er, phys_relevant_only=None):
+        """
+        Same as method enzrxn_inhibitors of class PGDB, answered locally.
+        """
+        return self.modulators_of(er, '-', phys_relevant=phys_relevant_only, kind='enzyme')
+
+    def tfs_bound_to_compound(self, cpd):
+        """
+        Same as method tfs_bound_to_compound of class PGDB, without option
+        include_inactive, answered locally.
+        """
+        return sorted(self._tfs_of_cpd.get(frameid_key(cpd), []))
+
+    def all_modulators(self):
+        """
+        Same as method all_modulators of class PGDB, answered locally.
+        """
+        return sorted(r for r in self._rows_of_regulator if r is not None)
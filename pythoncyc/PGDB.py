@@ -25,6 +25,21 @@ import sys
 import config 
 from PTools import PToolsError, PythonCycError
 from PToolsFrame import Symbol, PFrame, convertLispIdtoPythonId
+from FBA import run_fba_cached
+from Chemistry import FormulaIndex, ReactionBalances, ReactionGibbsTable, MassIndex
+from CompoundIndex import CompoundIndex
+from ECIndex import ECIndex
+from Enrichment import pathway_enrichment
+from GenericReactionIndex import GenericReactionIndex
+from GPRTable import GPRTable
+from GenomeIndex import GenomeIndex
+from ModulatorIndex import ModulatorIndex
+from PathwayIndex import PathwayIndex
+from ProteinIndex import ProteinIndex
+from ReactionNetwork import ReactionNetwork
+from RegulationIndex import RegulationIndex
+from TranscriptionUnitIndex import TranscriptionUnitIndex
+from TransportIndex import TransportIndex
 if 'IPython' in sys.modules:
     from IPython.display import display, HTML
 
@@ -150,23 +165,34 @@ class PGDB():
 
     """
 
-    def __init__(self, orgid):
+    def __init__(self, orgid, validate=True, host=None):
         """
         Once a PGDB object is created, it has been validated that the
         organism (orgid) exists on the running Pathway Tools server.
         From that PGDB object (e.g. ecoli), many classes of objects
         can be retrieved by using the attribute syntax of Python, such
         as ecoli.reactions.
+
+        If validate is False, the orgid is assumed to exist, e.g., because
+        it was returned by pythoncyc.all_orgids(). If host, a pair (host name,
+        port), is given, the queries of this PGDB are sent to that running
+        Pathway Tools instead of the hosts set in config.py.
         """
         if config._debug:
             print "PGDB __init__"
         self._orgid = "unknown"
         self._error = False
+        self._host = host
         # All PFrame objects of the PGDB are stored in attribute _frames, keyed by their frame ids.
         self._frames = {}
+        # The local indexes (see PToolsIndex.py) built for this PGDB, keyed by their names.
+        self._indexes = {}
+        if not validate:
+            self._orgid = orgid
+            return None
         # Verify that the running Pathway Tools has the PGDB (organism).
         try: 
-           r = PTools.sendQueryToPTools('(orgid-exist-p \''+orgid+')')
+           r = PTools.sendQueryToPTools('(orgid-exist-p \''+orgid+')', host=host)
         except PToolsError, msg:
             raise PythonCycError('Pathway Tools was unable to verify if organism (orgid) %s is known in your running Pathway Tools. More specifically: %s' % (orgid, msg))
         if not r:
@@ -323,13 +349,16 @@ class PGDB():
         self.get_frame_objects([f.frameid for f in self.compounds.instances])
         self.get_frame_objects([f.frameid for f in self.proteins.instances])
 
-    def sendPgdbQuery(self, query):
+    def sendPgdbQuery(self, query, timeout=None):
         """
         Send a query for a specific PGDB using its orgid.
         Use the macro with-organism for the Lisp Python server.
 
-        Parm
+        Parms
            query, a string. That string should be acceptable to the Lisp Python server.
+           timeout, the maximum number of seconds to wait for the result, or None for
+                    the deadline of the current thread (see function deadline of PTools.py).
+                    PToolsTimeout is raised when it passes.
         Return
            the result (as a Python object) of the execution of the query in Pathway Tools.
         """
@@ -338,7 +367,8 @@ class PGDB():
             print "Cannot send any query because the selected organism is unknown."
             return None
         else:
-            return PTools.sendQueryToPTools('(with-organism (:org-id \''+self._orgid+') '+query+')')
+            return PTools.sendQueryToPTools('(with-organism (:org-id \''+self._orgid+') '+query+')', host=self._host,
+                                            timeout=timeout)
 
     def sendPgdbFnCallBool(self, fn, *args, **kwargs):
         """
@@ -365,9 +395,12 @@ class PGDB():
         Send a PGDB query to Pathway Tools based on function fn and arguments args and
         kwargs (keyword args) and return the result. If multiple values are
         returned by fn, the Pathway Tools Python server transforms them into a list.
+        The keyword arg _timeout, if given, is not sent to Pathway Tools but bounds
+        the number of seconds to wait for the result (see method sendPgdbQuery).
         """
+        timeout = kwargs.pop('_timeout', None)
         fnCall = prepareFnCall(fn, *args, **kwargs)
-        return self.sendPgdbQuery(fnCall)
+        return self.sendPgdbQuery(fnCall, timeout=timeout)
 
     def is_a_class_name(self, className):
         """
@@ -465,6 +498,100 @@ class PGDB():
                 f.__dict__[convertLispIdtoPythonId(slot)] = data
         return pframes
                
+    def get_frames_slot_values(self, frameids, slotNames, chunkSize=2000):
+        """
+        Retrieve in bulk the values of some slots for many frames. The frames
+        are requested by chunks of chunkSize frames, each chunk requiring
+        one request to Pathway Tools. No PFrame is created.
+
+        Parms
+            frameids, list of frame ids (strings) or PFrames.
+            slotNames, list of slot names (strings), e.g., ['LEFT-END-POSITION'].
+            chunkSize, an integer, the maximum number of frames per request.
+        Return
+            a dictionary keyed by frame ids, surrounded by vertical bars, where each value
+            is a dictionary of the slot names, converted by convertLispIdtoPythonId
+            (e.g., 'left_end_position'), to their values. A slot without value has value None.
+        """
+        slotIds = [convertLispIdtoPythonId(slot) for slot in slotNames]
+        result = {}
+        for start in range(0, len(frameids), chunkSize):
+            chunk = frameids[start:start+chunkSize]
+            frameObjects = self.sendPgdbFnCallList('get-frame-objects', may_be_frameid(chunk))
+            for frameid, slotsData in frameObjects.iteritems():
+                slots = dict((convertLispIdtoPythonId(slot), data) for slot, data in slotsData.iteritems())
+                key = frameid if (frameid.startswith('|') and frameid.endswith('|')) else '|'+frameid+'|'
+                result[key] = dict((slotId, slots.get(slotId)) for slotId in slotIds)
+        return result
+
+    def get_frames_slot_value_annots(self, frameids, slotNames, labels, chunkSize=500):
+        """
+        Retrieve in bulk the values of some slots for many frames, with some
+        annotations of each value, such as the COEFFICIENT and COMPARTMENT
+        of the values of the slots LEFT and RIGHT of the reactions. Each chunk of
+        chunkSize frames requires one request to Pathway Tools. No PFrame is created.
+
+        Parms
+            frameids, list of frame ids (strings) or PFrames.
+            slotNames, list of slot names (strings), e.g., ['LEFT', 'RIGHT'].
+            labels, list of annotation labels (strings), e.g., ['COEFFICIENT', 'COMPARTMENT'].
+            chunkSize, an integer, the maximum number of frames per request.
+        Return
+            a dictionary keyed by frame ids, surrounded by vertical bars, where each value
+            is a dictionary of the slot names, converted by convertLispIdtoPythonId
+            (e.g., 'left'), to a list of lists [value, annotation 1, annotation 2, ...]
+            with the annotations in the order of labels, None for a missing annotation.
+        """
+        slotIds = [convertLispIdtoPythonId(slot) for slot in slotNames]
+        annots = ' '.join('(get-value-annot f s v '+convertArgToLisp(Symbol(label))+')' for label in labels)
+        result = {}
+        for start in range(0, len(frameids), chunkSize):
+            chunk = frameids[start:start+chunkSize]
+            query = ('(loop for f in '+convertArgToLisp(may_be_frameid(chunk))+
+                     ' collect (loop for s in '+convertArgToLisp([Symbol(slot) for slot in slotNames])+
+                     ' collect (loop for v in (get-slot-values f s) collect (list v '+annots+'))))')
+            values = self.sendPgdbQuery(query) or []
+            for frameid, slotsValues in zip(chunk, values):
+                frameid = frameid.frameid if isinstance(frameid, PFrame) else frameid
+                key = frameid if (frameid.startswith('|') and frameid.endswith('|')) else '|'+frameid+'|'
+                slotsValues = list(slotsValues or []) + [[]] * len(slotIds)
+                result[key] = dict((slotId, slotsValues[i] or []) for i, slotId in enumerate(slotIds))
+        return result
+
+    def get_class_hierarchy(self, className):
+        """
+        Retrieve in bulk, in two requests to Pathway Tools, the hierarchy below a
+        class: the direct superclasses of all its subclasses and the direct types
+        of all its instances. No PFrame is created.
+
+        Parm
+            className, a symbol specified as a string (e.g., '|Compounds|').
+        Return
+            two dictionaries keyed by frame ids, surrounded by vertical bars: the
+            first one gives the list of the direct superclasses of each subclass,
+            the second one gives the list of the direct classes of each instance.
+        """
+        def bars(frameid):
+            return frameid if (frameid.startswith('|') and frameid.endswith('|')) else '|'+frameid+'|'
+        result = []
+        for (allFn, typesFn) in [('get-class-all-subs', 'get-class-direct-supers'),
+                                 ('get-class-all-instances', 'get-instance-direct-types')]:
+            query = ('(loop for x in ('+allFn+' '+convertArgToLisp(Symbol(className))+')'+
+                     ' collect (list x ('+typesFn+' x)))')
+            pairs = self.sendPgdbQuery(query) or []
+            result.append(dict((bars(x), [bars(t) for t in (types or []) if isinstance(t, basestring)])
+                               for (x, types) in pairs if isinstance(x, basestring)))
+        return tuple(result)
+
+    def _local_index(self, name, indexClass, refresh):
+        """
+        Return the local index name of this PGDB, building it with indexClass
+        if it has not been built yet or if refresh is True.
+        """
+        if refresh or not (name in self._indexes):
+            self._indexes[name] = indexClass(self)
+        return self._indexes[name]
+
     def is_an_instance_name(self, frameid):
         """ 
         Similar to method is_a_class_name but for a frame that is not a class.
@@ -509,7 +636,7 @@ class PGDB():
         """
         return self.sendPgdbFnCallList('get-class-all-subs', classArg)
 
-    def run_fba(self, fileName):
+    def run_fba(self, fileName, useCache=True):
        """
        In PythonCyc there is a run_fba method defined globally in the pythoncyc
        module and there is this version which is run under a specific PGDB.
@@ -519,9 +646,13 @@ class PGDB():
        Parms
            fileName, a string which is the name of the FBA input file on the
                      running Pathway Tools machine.
+           useCache, a boolean, if True and the FBA input file can be read locally,
+                     the result of a previous successful run of a file with identical
+                     contents is returned without running MetaFlux again.
 
        Returns
-           A list with the following values:
+           A FBAResult (see FBA.py), which is a list with the following values,
+           or the raw result of Pathway Tools if it is not a list:
              1) True <=> success, the FBA completed without error (for growth, see 5)
              2) List of error messages, if any
              3) List of output messages generated by MetaFlux (FBA module) during parsing
@@ -532,8 +663,11 @@ class PGDB():
                 or the number of active reactions if the FBA input file is solving a model
              7) The list of reactions that were in the model after instantiation
              8) The list of reactions that were active (non zero flux) with their fluxes
+           The FBAResult also gives these values as attributes and the fluxes
+           as NumPy arrays indexed by reaction frame ids.
        """
-       return self.sendPgdbFnCall('python-run-fba', fileName)
+       return run_fba_cached(fileName, lambda: self.sendPgdbFnCall('python-run-fba', fileName),
+                             orgid=self._orgid, useCache=useCache, host=self._host)
 
     def get_slot_values(self, frameid, slotName):
        """
@@ -928,6 +1062,57 @@ class PGDB():
            A list of instances of class Genes. 
        """
        return self.sendPgdbFnCallList('genes-of-reaction', may_be_frameid(rxn))
+
+    def ec_index(self, refresh=False):
+       """
+       Description
+           Returns the local index of the EC numbers of the reactions of this PGDB,
+           building it on its first use. The index finds the reactions, enzymes and
+           genes of an EC number, possibly partial (e.g., 1.1.1.-), and answers
+           locally methods enzymes_of_reaction (without options) and
+           genes_of_reaction. See ECIndex.py.
+       Parms
+           refresh
+               If True, the index is built again from Pathway Tools.
+   
+       Return value
+           An ECIndex object. 
+       """
+       return self._local_index('ec', ECIndex, refresh)
+   
+    def gpr_table(self, refresh=False):
+       """
+       Description
+           Returns the gene-protein-reaction associations of this PGDB, building
+           them on their first use with a few bulk requests. The associations are
+           given as columns (gene, protein, enzymatic reaction, reaction) and as
+           AND/OR rules over the genes, for computing knockouts and mapping gene
+           expression values to the reactions. See GPRTable.py.
+       Parms
+           refresh
+               If True, the associations are built again from Pathway Tools.
+   
+       Return value
+           A GPRTable object. 
+       """
+       return self._local_index('gpr', GPRTable, refresh)
+   
+    def generic_reaction_index(self, refresh=False):
+       """
+       Description
+           Returns the local index of the compound classes and of the generic
+           reactions of this PGDB, with their specific forms, building it on its
+           first use. The index answers locally methods specific_forms_of_rxn,
+           nonspecific_forms_of_rxn, rxn_specific_form_of_rxn_p and
+           substrate_of_generic_rxn. See GenericReactionIndex.py.
+       Parms
+           refresh
+               If True, the index is built again from Pathway Tools.
+   
+       Return value
+           A GenericReactionIndex object. 
+       """
+       return self._local_index('generic-reactions', GenericReactionIndex, refresh)
    
     def substrates_of_reaction(self, rxn):
        """
@@ -1081,6 +1266,130 @@ class PGDB():
       """
       kwargs = {'hole-if-any-gene-without-position?': hole_if_any_gene_without_position}
       return self.sendPgdbFnCallBool('pathway-hole-p', may_be_frameid(rxn), **kwargs)
+
+    def reaction_network(self, refresh=False):
+      """
+      Description
+          Returns the local reaction network of this PGDB, building it on its
+          first use. The network has the stoichiometry of all reactions, with the
+          compartments of their substrates, their directions and their enzymes.
+          Its method gap_analysis returns, in one pass, the dead-end metabolites,
+          the blocked reactions, the pathway holes (see method pathway_hole_p)
+          and the orphan reactions (see method rxn_without_sequenced_enzyme_p).
+          See ReactionNetwork.py.
+      Parms
+          refresh
+              If True, the network is built again from Pathway Tools.
+
+      Return value
+          A ReactionNetwork object. 
+      """
+      return self._local_index('reactions', ReactionNetwork, refresh)
+
+    def transport_index(self, refresh=False):
+      """
+      Description
+          Returns the local index of the compartments of the reactions of this PGDB
+          and of its transport reactions, with the compounds they transport from a
+          compartment to another and their transporters, building it on its first
+          use from the reaction network. The index answers locally methods
+          compartments_of_reaction, rxn_in_compartment_p, transported_chemicals and
+          all_transported_chemicals. See TransportIndex.py.
+      Parms
+          refresh
+              If True, the index is built again from Pathway Tools.
+
+      Return value
+          A TransportIndex object. 
+      """
+      return self._local_index('transports', TransportIndex, refresh)
+
+    def formula_index(self, refresh=False):
+      """
+      Description
+          Returns the local index of the chemical formulas, charges and Gibbs free
+          energies of formation of all the compounds of this PGDB, building it on
+          its first use. See Chemistry.py.
+      Parms
+          refresh
+              If True, the index is built again from Pathway Tools.
+
+      Return value
+          A FormulaIndex object. 
+      """
+      return self._local_index('formulas', FormulaIndex, refresh)
+
+    def reaction_balances(self):
+      """
+      Description
+          Checks the elemental and charge balance of all the reactions of this PGDB
+          at once, using the reaction network (see method reaction_network) and the
+          formula index (see method formula_index) of this PGDB. 
+      Parms
+          None.
+
+      Return value
+          A ReactionBalances object, whose method unbalanced_reactions returns
+          the unbalanced reactions and method imbalance the imbalance of a reaction. 
+      """
+      return ReactionBalances(self.reaction_network(), self.formula_index())
+
+    def reaction_gibbs_table(self):
+      """
+      Description
+          Computes the standard Gibbs free energy change of all the reactions of
+          this PGDB at once, from the Gibbs free energies of formation (slot GIBBS-0)
+          of their substrates, using the reaction network (see method reaction_network)
+          and the formula index (see method formula_index) of this PGDB. 
+      Parms
+          None.
+
+      Return value
+          A ReactionGibbsTable object, whose method table returns the reactions,
+          their Gibbs free energy changes as a NumPy array, and which
+          reactions have missing data. 
+      """
+      return ReactionGibbsTable(self.reaction_network(), self.formula_index())
+
+    def mass_index(self, refresh=False):
+      """
+      Description
+          Returns the local index of the monoisotopic masses and formulas of the
+          compounds of this PGDB, building it on its first use from the formula
+          index (see method formula_index). Its method search matches a batch of
+          measured masses with a tolerance in ppm and its method compounds_of_formula
+          finds the compounds of a formula. See Chemistry.py.
+      Parms
+          refresh
+              If True, the formula index and this index are built again from
+              Pathway Tools.
+
+      Return value
+          A MassIndex object. 
+      """
+      if refresh:
+          self.formula_index(refresh=True)
+      return self._local_index('masses', MassIndex, refresh)
+
+    def compound_index(self, refresh=False):
+      """
+      Description
+          Returns the local index of the structure fingerprints of all the compounds
+          of this PGDB, building it on its first use. The fingerprints are loaded from
+          the cache directory set by function set_cache_dir of module config when
+          the structures of the compounds have not changed, but these structures
+          are still requested from Pathway Tools to be compared. Its method
+          similar_compounds returns the compounds most similar to a given compound.
+          See CompoundIndex.py.
+      Parms
+          refresh
+              If True, the index is built again from Pathway Tools, ignoring
+              the cache directory, and saved again.
+
+      Return value
+          A CompoundIndex object. 
+      """
+      return self._local_index('compounds', lambda pgdb: CompoundIndex(pgdb, useCache=not refresh), refresh)
   
     def rxn_present_p(self, rxn):
       """
@@ -1688,6 +1997,28 @@ class PGDB():
       """
       # exclude_self is an optional parameter for the Lisp fn version.
       return self.sendPgdbFnCallList('homomultimeric-containers-of', may_be_frameid(protein), exclude_self)
+
+    def protein_index(self, refresh=False):
+      """
+      Description
+          Returns the local index of the composition of the protein complexes of
+          this PGDB, building it on its first use. The index has the direct and
+          indirect components of every complex with their total coefficients, and
+          the containers of every component. It answers locally the same questions
+          as methods monomers_of_protein, base_components_of_protein, containers_of,
+          top_containers and homomultimeric_containers_of. It also groups every
+          protein with its modified and bound forms, answering locally methods
+          unmodified_form, unmodified_or_unbound_form, modified_forms,
+          modified_and_unmodified_forms, all_forms_of_protein and
+          reduce_modified_proteins. See ProteinIndex.py.
+      Parms
+          refresh
+              If True, the index is built again from Pathway Tools.
+
+      Return value
+          A ProteinIndex object. 
+      """
+      return self._local_index('proteins', ProteinIndex, refresh)
   
     def polypeptide_or_homomultimer_p(self, protein):
       """
@@ -2184,6 +2515,51 @@ class PGDB():
       """
       kwargs = {'include-super-pwys': include_super_pwys}
       return self.sendPgdbFnCallList('pathways-of-gene', may_be_frameid(gene), **kwargs)
+
+    def pathway_index(self, refresh=False):
+      """
+      Description
+          Returns the local pathway membership index of this PGDB, building it on its
+          first use. The index keeps which genes, reactions, enzymatic reactions and
+          compounds are in which pathways, as sparse incidence matrices, and answers
+          locally the same questions as methods pathways_of_gene, pathways_of_enzrxn,
+          pathways_of_compound, genes_of_pathway and compounds_of_pathway, optionally
+          including the super-pathways. It also keeps the predecessors of the reactions
+          of all the pathways, and answers locally methods get_predecessors,
+          get_successors, rxns_adjacent_in_pwy_p, pathway_components and
+          noncontiguous_pathway_p. See PathwayIndex.py.
+      Parms
+          refresh
+              If True, the index is built again from Pathway Tools.
+
+      Return value
+          A PathwayIndex object. 
+      """
+      return self._local_index('pathways', PathwayIndex, refresh)
+
+    def pathway_enrichment(self, genes, background=None, include_super_pwys=False):
+      """
+      Description
+          Computes the over-representation of the given genes in every pathway of
+          this PGDB: a one-sided hypergeometric test per pathway and the false
+          discovery rate of these tests (Benjamini-Hochberg). All pathways are
+          tested in one pass over the gene x pathway matrix of the pathway index
+          of this PGDB (see method pathway_index), without requests to Pathway Tools
+          once that index is built. See Enrichment.py.
+      Parms
+          genes
+              A list of instances of class Genes, frame ids or PFrames.
+          background
+              A list of genes, the population from which the genes are drawn.
+              By default, all the genes of the pathways of this PGDB.
+          include_super_pwys
+              If True, the genes of a pathway are also counted in its super-pathways.
+
+      Return value
+          An EnrichmentResult object, whose method significant returns
+          the enriched pathways. 
+      """
+      return pathway_enrichment(self.pathway_index(), genes, background, include_super_pwys)
   
     def chromosome_of_gene(self, gene):
       """
@@ -2312,9 +2688,28 @@ class PGDB():
       Return value
           A list of lists, where the first element of each sub-list is a
           gene from genes, and the rest of the list are all of the gene
-          neighbors of the first gene. 
+          neighbors of the first gene. For a local version returning cluster
+          ids, see method gene_clusters of the genome index (method genome_index).
       """
       return self.sendPgdbFnCallList('gene-clusters', may_be_frameid(genes), max_gap)
+
+    def genome_index(self, refresh=False):
+      """
+      Description
+          Returns the local genome index of this PGDB, building it on its first use.
+          The index keeps the positions of all genes, promoters, terminators and DNA
+          binding sites, and answers locally the same questions as methods
+          next_gene_on_replicon, previous_gene_on_replicon, adjacent_genes_p,
+          neighboring_genes_p, containing_tus and binding_sites_affecting_gene,
+          as well as overlap and window queries. See GenomeIndex.py.
+      Parms
+          refresh
+              If True, the index is built again from Pathway Tools.
+
+      Return value
+          A GenomeIndex object. 
+      """
+      return self._local_index('genome', GenomeIndex, refresh)
   
     def rna_coding_gene(self, gene):
       """
@@ -2451,6 +2846,25 @@ class PGDB():
           A list of instances of class Genes. 
       """
       return self.sendPgdbFnCallList('cotranscribed-genes', may_be_frameid(gene))
+
+    def transcription_unit_index(self, refresh=False):
+      """
+      Description
+          Returns the local transcription unit index of this PGDB, building it on its
+          first use. The index maps genes, transcription units, promoters, terminators
+          and binding sites to one another and groups the transcription units into
+          operons. It answers locally the same questions as methods operon_of_gene,
+          genes_in_same_operon, gene_transcription_units, cotranscribed_genes,
+          transcription_unit_promoter, transcription_unit_terminators and
+          transcription_unit_genes. See TranscriptionUnitIndex.py.
+      Parms
+          refresh
+              If True, the index is built again from Pathway Tools.
+
+      Return value
+          A TranscriptionUnitIndex object. 
+      """
+      return self._local_index('transcription-units', TranscriptionUnitIndex, refresh)
   
     def terminators_affecting_gene(self, gene):
       """
@@ -2783,6 +3197,43 @@ class PGDB():
           A list of instances of class Genes. 
       """
       return self.sendPgdbFnCallList('genes-regulated-by-gene', may_be_frameid(gene))
+
+    def regulation_index(self, refresh=False):
+      """
+      Description
+          Returns the local regulatory network index of this PGDB, building it on its
+          first use. The index links regulators, regulation frames, transcription
+          units and genes, with the sign of each regulation, and precomputes which
+          genes are directly or indirectly regulated by each gene. It answers locally
+          the same questions as methods genes_regulated_by_gene, genes_regulating_gene,
+          regulon_of_protein, genes_regulated_by_protein, activation_p and inhibition_p.
+          See RegulationIndex.py.
+      Parms
+          refresh
+              If True, the index is built again from Pathway Tools.
+
+      Return value
+          A RegulationIndex object. 
+      """
+      return self._local_index('regulation', RegulationIndex, refresh)
+
+    def modulator_index(self, refresh=False):
+      """
+      Description
+          Returns the local index of all the regulation frames of this PGDB, from the
+          modulators to the regulated entities and back, with the sign, mechanisms and
+          physiological relevance of each regulation, building it on its first use.
+          It answers locally the same questions as methods enzrxn_activators,
+          enzrxn_inhibitors, deactivated_or_inhibited_by_compound,
+          tfs_bound_to_compound and all_modulators. See ModulatorIndex.py.
+      Parms
+          refresh
+              If True, the index is built again from Pathway Tools.
+
+      Return value
+          A ModulatorIndex object. 
+      """
+      return self._local_index('modulators', ModulatorIndex, refresh)
   
     def regulators_of_gene_transcription(self, gene, by_function=None):
       """
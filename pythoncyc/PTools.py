@@ -24,8 +24,22 @@
 This module handles basic operations for receiving and sending messages via a
 network socket to Pathway Tools.
 
-No major class is defined in this file, but only toplevel functions and
-some simple classes for errors handling.
+No major class is defined in this file, but only toplevel functions,
+some simple classes for errors handling, and class HostPool, which routes
+the queries among several running Pathway Tools (see function set_hosts
+of config.py). The queries that modify a PGDB or read files of the server
+(see WRITE_FUNCTIONS) are always sent to the first of these hosts, the
+primary one, so that the PGDBs of the other hosts are never modified. When hedging is on (see function set_hedging of config.py),
+a query that modifies no PGDB and has not answered after the usual latency
+of its host is sent again to another host, and the first answer is used.
+
+The time of the queries can be bounded with function deadline, e.g.,
+
+    >>> with pythoncyc.deadline(2.5):
+    ...     ecoli.genes_of_pathway('TRPSYN-PWY')
+
+raises PToolsTimeout if the answers have not all been received after 2.5
+seconds. The queries sent in the scope of a deadline share it.
 
 """
 
@@ -34,8 +48,82 @@ import sys
 import socket as so
 import json
 import time
+import threading
+import collections
+import Queue
+import re
+import contextlib
 import config
 
+# The maximum number of seconds waited for the answer of a query without deadline.
+QUERY_TIMEOUT = 360
+
+# The weight of the last latency in the moving average of the latencies of a host.
+LATENCY_SMOOTHING = 0.2
+
+# The number of the last latencies of a host kept to compute its percentiles.
+LATENCY_WINDOW = 100
+
+# The minimum number of latencies of a host before its queries are hedged.
+HEDGE_MIN_SAMPLES = 20
+
+# The Pathway Tools functions that modify a PGDB or read files of the server.
+# Their queries are always sent to the primary host of the pool, and never twice.
+WRITE_FUNCTIONS = ['put-slot-value', 'put-slot-values', 'add-slot-value', 'remove-slot-value',
+                   'replace-slot-value', 'create-instance', 'create-frame', 'delete-frame',
+                   'save-kb', 'revert-kb', 'python-run-fba']
+
+_write_query_re = re.compile(r'\((' + '|'.join(re.escape(f) for f in WRITE_FUNCTIONS) + r')[\s)]', re.IGNORECASE)
+
+def write_query_p(query):
+    """ Return True if query calls a function of WRITE_FUNCTIONS. """
+    return _write_query_re.search(query) is not None
+
+# The deadline of the current thread, see function deadline.
+_local = threading.local()
+
+def current_deadline():
+    """
+    Return the time (as given by time.time()) by which the queries sent by the
+    current thread must have answered, or None if there is no deadline.
+    """
+    return getattr(_local, 'deadline', None)
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """
+    A context manager bounding to the given number of seconds the time of all the
+    queries sent by the current thread in its scope. A query still running at
+    the deadline is aborted and raises PToolsTimeout. A deadline inside the scope
+    of another one can only shorten it. If seconds is None, the deadline, if any,
+    is not changed.
+    """
+    previous = current_deadline()
+    end = None if seconds is None else time.time() + seconds
+    _local.deadline = previous if end is None or (previous is not None and previous <= end) else end
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+def deadline_passed_p():
+    """ A predicate that is True if the current thread has a deadline and it has passed. """
+    end = current_deadline()
+    return end is not None and end <= time.time()
+
+def remaining_time():
+    """
+    Return the number of seconds left to the current thread before its deadline,
+    at most QUERY_TIMEOUT. Raise PToolsTimeout if the deadline has passed.
+    """
+    end = current_deadline()
+    if end is None:
+        return QUERY_TIMEOUT
+    left = end - time.time()
+    if left <= 0:
+        raise PToolsTimeout('The deadline of the query to Pathway Tools has passed.')
+    return min(left, QUERY_TIMEOUT)
+
 def recvAll(s):
     """
     Receive the entire message sent by Pathway Tools on socket s.
@@ -55,6 +143,7 @@ def recvAll(s):
     if config._debug:
         print 'recvAll ...'
     # Get the type of message which is one character long.
+    s.settimeout(remaining_time())
     type = s.recv(1)
     # print "type ", type
     if type == 'A':
@@ -76,6 +165,7 @@ def sendAll(s, query):
     sent_len  = 0
     query_len = len(query)
     while sent_len < query_len:
+        s.settimeout(remaining_time())
         nb_chars = s.send(query[sent_len:])
         if nb_chars == 0:
             raise PythonCycError("Connection to Pathway Tools broke while sending query %s." % query)
@@ -93,6 +183,7 @@ def recvFixedLength(s, lengthMsg):
     pieces = []
     nbBytesRecv = 0
     while nbBytesRecv < lengthMsg:
+        s.settimeout(remaining_time())
         piece = s.recv(min(lengthMsg - nbBytesRecv, 4096))
         if piece == '':
             # Give up now because nothing was received.
@@ -108,7 +199,9 @@ def recvTimeOut(socket, timeOut=2):
     more characters are sent on socket after timeOut seconds, it is
     assumed that the message has ended. Therefore, it will always, whatever the lenght
     of the message, take at least timeOut seconds to execute this method. If no character
-    is received after 60 seconds, this method returns with an empty message.
+    is received after 60 seconds, this method returns with an empty message. If the
+    deadline of the current thread passes (see function deadline), PToolsTimeout
+    is raised.
 
     Parms
          socket, an open network socket.
@@ -128,7 +221,8 @@ def recvTimeOut(socket, timeOut=2):
             break
         elif time.time() - begin > 60:
             break
-        # Try to receive some text.
+        # Try to receive some text, until the deadline if any.
+        socket.settimeout(remaining_time())
         try:
             data = socket.recv(4096)
             if data:
@@ -147,37 +241,273 @@ def recvTimeOut(socket, timeOut=2):
     else:
         return ''.join(pieces)
 
+class HostPool():
+    """
+    A pool of running Pathway Tools serving the same PGDBs. Each query is routed
+    to the host with the smallest product of its number of outstanding queries
+    plus one by the exponentially weighted moving average (EWMA) of its latencies.
+    The hosts not measured yet are tried first. A failed connection counts as a
+    slow query, so that the other hosts are preferred. The last latencies of each
+    host are kept to decide when to hedge a query.
+    """
+
+    def __init__(self, hosts):
+        self.hosts = list(hosts)
+        self._lock = threading.Lock()
+        self._outstanding = dict((h, 0) for h in self.hosts)
+        self._latency = dict((h, None) for h in self.hosts)
+        self._nb_requests = dict((h, 0) for h in self.hosts)
+        self._nb_failures = dict((h, 0) for h in self.hosts)
+        self._nb_hedges = dict((h, 0) for h in self.hosts)
+        self._nb_hedge_wins = dict((h, 0) for h in self.hosts)
+        self._samples = dict((h, collections.deque(maxlen=LATENCY_WINDOW)) for h in self.hosts)
+
+    def primary(self):
+        """ Return the host receiving the queries that modify a PGDB: the first one. """
+        return self.hosts[0]
+
+    def acquire(self, exclude=[], hedge=False, host=None):
+        """
+        Choose a host for a query, other than the hosts in exclude if possible,
+        and count that query as outstanding on it. If hedge is True, the query
+        is counted as a hedge of a query sent to another host. If host is given,
+        that host is used.
+        """
+        with self._lock:
+            def cost(h):
+                return ((self._outstanding[h] + 1) * (self._latency[h] or 0.0), self._outstanding[h])
+            if host is None:
+                host = min([h for h in self.hosts if not (h in exclude)] or self.hosts, key=cost)
+            if hedge:
+                self._nb_hedges[host] += 1
+            self._outstanding[host] += 1
+            self._nb_requests[host] += 1
+            return host
+
+    def release(self, host, latency, failed=False, complete=True):
+        """
+        Count a query on host as done, after latency seconds. If complete is False,
+        the query was aborted by its deadline, so latency is only a lower bound
+        and is not kept to compute the percentiles of the latencies.
+        """
+        with self._lock:
+            self._outstanding[host] -= 1
+            if failed:
+                self._nb_failures[host] += 1
+                latency = max(latency, 2 * (self._latency[host] or 1.0))
+            elif complete:
+                self._samples[host].append(latency)
+            previous = self._latency[host]
+            self._latency[host] = latency if previous is None else \
+                                  LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * previous
+
+    def hedge_won(self, host):
+        """ Count a hedge sent to host that answered before the query it hedged. """
+        with self._lock:
+            self._nb_hedge_wins[host] += 1
+
+    def hedge_delay(self, host, percentile):
+        """
+        Return the given percentile (e.g., 95) of the last latencies of host, in seconds,
+        or None if too few queries to host have been measured.
+        """
+        with self._lock:
+            samples = sorted(self._samples[host])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        k = int(round(percentile / 100.0 * (len(samples) - 1)))
+        return samples[min(max(k, 0), len(samples) - 1)]
+
+    def metrics(self):
+        """
+        Return, for each host, a dictionary with its number of outstanding queries,
+        of queries, of failed queries, its average latency in seconds, its number of
+        hedges (the queries sent to it as duplicates of slow queries sent to another
+        host) and of hedges that answered first.
+        """
+        with self._lock:
+            return dict((h, {'outstanding': self._outstanding[h], 'requests': self._nb_requests[h],
+                             'failures': self._nb_failures[h], 'latency': self._latency[h],
+                             'hedges': self._nb_hedges[h], 'hedge_wins': self._nb_hedge_wins[h]})
+                        for h in self.hosts)
+
+_host_pool = None
+_host_pool_lock = threading.Lock()
+
+def host_pool():
+    """
+    Return the HostPool of the hosts set in config.py, creating it again when
+    the hosts have changed.
+    """
+    global _host_pool
+    hosts = config._hosts or [(config._hostname, config._hostport)]
+    with _host_pool_lock:
+        if _host_pool is None or _host_pool.hosts != hosts:
+            _host_pool = HostPool(hosts)
+        return _host_pool
+
+def host_pool_metrics():
+    """ Return the metrics of the hosts of the pool, see method metrics of class HostPool. """
+    return host_pool().metrics()
+
 # Call a PTools function synchronously for any PGDB.
-def sendQueryToPTools(query):
+def sendQueryToPTools(query, host=None, timeout=None):
     """ 
     Send a query to a running Pathway Tools application via a socket.
     
-    Parm
+    Parms
       query, a string that the Python server in Pathway Tools can evaluate. 
+      host, a pair (host name, port) of a running Pathway Tools, or None to
+            route the query to one of the hosts set in config.py.
+      timeout, the maximum number of seconds to wait for the result, or None
+            for the deadline of the current thread (see function deadline).
     Returns
       The result of the query, as a Python object, decoded by Json.
     """
+    with deadline(timeout):
+        return sendQueryToHosts(query, host)
+
+def sendQueryToHosts(query, host):
+    """ 
+    Send a query to host, or route it among the hosts set in config.py if host
+    is None. See function sendQueryToPTools.
+    """
+    if host is not None:
+        return sendQueryToHost(query, host)
+    pool = host_pool()
+    if write_query_p(query):
+        # Only the primary host gets the queries that modify a PGDB.
+        return sendQueryToPoolHost(query, pool, pool.acquire(host=pool.primary()))
+    if config._hedging and len(pool.hosts) > 1:
+        return sendHedgedQuery(query, pool)
+    # A query that could not connect to a host was not sent, so it is safe
+    # to try it on the other hosts.
+    tried = []
+    while True:
+        host = pool.acquire(exclude=tried)
+        tried.append(host)
+        try:
+            return sendQueryToPoolHost(query, pool, host)
+        except PToolsConnectionError:
+            if len(tried) >= len(pool.hosts):
+                raise
+
+def sendQueryToPoolHost(query, pool, host):
+    """
+    Send a query to a host acquired from pool, then release that host with
+    the latency of the query.
+    """
+    begin = time.time()
+    failed = True
+    complete = True
+    try:
+        result = sendQueryToHost(query, host)
+        failed = False
+        return result
+    except PToolsTimeout:
+        # The query was aborted by its deadline, not by a failure of the host.
+        (failed, complete) = (False, False)
+        raise
+    except PToolsError, msg:
+        # Only the failures to connect or to receive are failures of the host.
+        failed = not str(msg).startswith('An internal error')
+        raise
+    finally:
+        pool.release(host, time.time() - begin, failed, complete)
+
+def sendHedgedQuery(query, pool):
+    """
+    Send a query to a host of pool. If it has not answered within the latency
+    percentile set by function set_hedging of config.py, send it to another
+    host, and return the first answer. An error is raised only if every host
+    sent the query fails.
+    """
+    answers = Queue.Queue()
+    end = current_deadline()
+    def send(host):
+        # The query sent by this thread has the deadline of the calling thread.
+        _local.deadline = end
+        try:
+            answers.put((host, True, sendQueryToPoolHost(query, pool, host)))
+        except Exception:
+            answers.put((host, False, sys.exc_info()))
+    def start(host):
+        thread = threading.Thread(target=send, args=(host,))
+        thread.daemon = True
+        thread.start()
+    primary = pool.acquire()
+    start(primary)
+    hedge = None
+    pending = 1
+    delay = pool.hedge_delay(primary, config._hedge_percentile)
+    try:
+        answer = answers.get(True, delay) if delay is not None else answers.get()
+    except Queue.Empty:
+        hedge = pool.acquire(exclude=[primary], hedge=True)
+        start(hedge)
+        pending += 1
+        answer = answers.get()
+    error = None
+    while True:
+        (host, ok, value) = answer
+        pending -= 1
+        if ok:
+            if host == hedge:
+                pool.hedge_won(hedge)
+            return value
+        error = error or value
+        # A query that could not connect was not sent: it is sent to another host at once.
+        if hedge is None and issubclass(value[0], PToolsConnectionError):
+            hedge = pool.acquire(exclude=[primary])
+            start(hedge)
+            pending += 1
+        if pending == 0:
+            raise error[0], error[1], error[2]
+        answer = answers.get()
+
+def sendQueryToHost(query, host):
+    """ 
+    Send a query to a given running Pathway Tools. See function sendQueryToPTools.
+    """
     if config._debug:
         print 'Sending query '+query
-    if config._hostname == '':
+    (hostname, hostport) = host
+    if hostname == '':
        raise PToolsError('The hostname to connect to a running Pathway Tools has not been set. Use function config.set_hostname() to set the host name of your running Pathway Tools.') 
+    # The socket may time out slightly before the clock reaches the deadline: the
+    # timeout comes from the deadline whenever it is shorter than QUERY_TIMEOUT.
+    timeout = remaining_time()
+    byDeadline = timeout < QUERY_TIMEOUT
     try:
         s = so.socket(so.AF_INET, so.SOCK_STREAM)
         # Make socket non blocking.
         s.setblocking(0)
-        s.settimeout(360)  # The query may take a long time in some cases.
-        s.connect((config._hostname,config._hostport))
+        s.settimeout(timeout)  # The query may take a long time in some cases.
+        s.connect((hostname,hostport))
+    except so.timeout:
+        s.close()
+        if byDeadline or deadline_passed_p():
+            raise PToolsTimeout('The deadline of the query to Pathway Tools has passed while connecting to '+hostname+' on port '+str(hostport)+'.')
+        raise PToolsConnectionError('Timed out while connecting to a running Pathway Tools at '+hostname+' on port '+str(hostport)+'.')
     except so.error, msg:
-        raise PToolsError('Failed to create a connection to a running Pathway Tools at '+ config._hostname+ ' on port '+ str(config._hostport)+'. Make sure Pathway Tools is running with option -python. Error code: '+str(msg[0])+', error message: '+ msg[1])
-    # Send, receive and close socket.
-    sendAll(s,query)
-    if config._debug:
-        print 'Sent '+query+' to Pathway Tools.'
-    response = recvAll(s)
+        s.close()
+        raise PToolsConnectionError('Failed to create a connection to a running Pathway Tools at '+ hostname+ ' on port '+ str(hostport)+'. Make sure Pathway Tools is running with option -python. Error code: '+str(msg[0])+', error message: '+ msg[1])
+    # Send, receive and close socket, even if the deadline passes.
+    try:
+        sendAll(s,query)
+        if config._debug:
+            print 'Sent '+query+' to Pathway Tools.'
+        response = recvAll(s)
+    except so.timeout:
+        if byDeadline or deadline_passed_p():
+            raise PToolsTimeout('The deadline of the query to Pathway Tools at '+hostname+' on port '+str(hostport)+' has passed.')
+        # Not the deadline of the caller, but QUERY_TIMEOUT: the host does not answer.
+        raise PToolsError('No answer from the running Pathway Tools at '+hostname+' on port '+str(hostport)+' after '+str(QUERY_TIMEOUT)+' seconds.')
+    finally:
+        s.close()
     if config._debug and len(response) < 4000:
         print 'JSON Received: ', response
     r = json.loads(response)
-    s.close()
     if isinstance(r,basestring) and r.startswith(':error'):
         raise PToolsError('An internal error occurred in the running Pathway Tools application: %s' % r)
     else:
@@ -194,3 +524,11 @@ class PToolsError(Exception):
     """Error generated when Pathway Tools send an error due to its own Lisp execution."""
     pass
 
+class PToolsConnectionError(PToolsError):
+    """Error generated when no connection can be made to a running Pathway Tools."""
+    pass
+
+class PToolsTimeout(PToolsError):
+    """Error generated when the deadline of a query to Pathway Tools has passed."""
+    pass
+
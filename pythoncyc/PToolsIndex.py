@@ -0,0 +1,197 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines a few functions shared by the local indexes of PythonCyc.
+
+A local index is built from a few bulk requests to Pathway Tools and then
+answers locally, without any communication with Pathway Tools, the same
+questions that some methods of class PGDB send to Pathway Tools one item
+at a time. The local indexes are created by methods of class PGDB, such as
+genome_index, and are kept by the PGDB object until refreshed.
+
+The local indexes use NumPy, and some of them the sparse matrices of SciPy,
+which are not needed for the rest of PythonCyc.
+"""
+
+from PTools import PythonCycError
+from PToolsFrame import PFrame
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import scipy.sparse as sparse
+except ImportError:
+    sparse = None
+
+def require_numpy(what):
+    """
+    Raise a PythonCycError if NumPy is not installed.
+
+    Parm
+       what, a string describing the functionality that needs NumPy.
+    """
+    if np is None:
+        raise PythonCycError('NumPy is needed for %s. Please install NumPy.' % what)
+
+def require_scipy(what):
+    """
+    Raise a PythonCycError if NumPy or SciPy, for its sparse matrices, is not installed.
+
+    Parm
+       what, a string describing the functionality that needs SciPy.
+    """
+    require_numpy(what)
+    if sparse is None:
+        raise PythonCycError('SciPy is needed for %s. Please install SciPy.' % what)
+
+def frameid_key(x):
+    """
+    Convert a frame id or a PFrame to the frame id used as key by the local
+    indexes, that is, the frame id surrounded by vertical bars as
+    stored in PFrames.
+
+    Parm
+       x, a string or a PFrame.
+    Return
+       a string, or x unchanged if it is neither a string nor a PFrame.
+    """
+    if isinstance(x, PFrame):
+        return x.frameid
+    elif isinstance(x, basestring) and x:
+        return x if (x.startswith('|') and x.endswith('|')) else '|'+x+'|'
+    else:
+        return x
+
+def as_list(value):
+    """
+    Slot values are received either as a single value or as a list of values.
+    Return value as a list, None being the empty list.
+    """
+    if value is None or value is False:
+        return []
+    elif isinstance(value, list):
+        return value
+    else:
+        return [value]
+
+def first_value(value):
+    """
+    Return the first value of a slot value received from Pathway Tools, or None.
+    """
+    values = as_list(value)
+    return values[0] if values else None
+
+def unique(values):
+    """
+    Remove the duplicates of a list, keeping the order of the values.
+    """
+    seen = set()
+    return [v for v in values if not (v in seen or seen.add(v))]
+
+def protein_forms_and_genes(pgdb, proteins):
+    """
+    Follow, in bulk, the slots COMPONENTS and UNMODIFIED-FORM from the given
+    proteins down to their polypeptides and RNAs, and the slot GENE of these.
+    Only one request to Pathway Tools is done for each level of the complexes.
+
+    Parms
+       pgdb, a PGDB object.
+       proteins, a list of frame ids or PFrames.
+    Return
+       two dictionaries keyed by the frame ids of the proteins and their subunits:
+       the first one gives the set of frame ids reachable from a protein by
+       COMPONENTS and UNMODIFIED-FORM, including the protein itself,
+       the second one gives the set of genes of these frames.
+    """
+    links = {}
+    genesOf = {}
+    frontier = set(frameid_key(p) for p in proteins if isinstance(frameid_key(p), basestring))
+    while frontier:
+        data = pgdb.get_frames_slot_values(list(frontier), ['COMPONENTS', 'UNMODIFIED-FORM', 'GENE'])
+        nextFrontier = set()
+        for f in frontier:
+            slots = data.get(f, {})
+            children = [frameid_key(c) for c in as_list(slots.get('components')) + as_list(slots.get('unmodified_form'))
+                        if isinstance(c, basestring)]
+            links[f] = children
+            genesOf[f] = set(frameid_key(g) for g in as_list(slots.get('gene')))
+            nextFrontier.update(c for c in children if not (c in links))
+        frontier = nextFrontier
+    forms = {}
+    def closure(f, visiting):
+        if f in forms:
+            return forms[f]
+        visiting.add(f)
+        reached = set([f])
+        for c in links.get(f, []):
+            if not (c in visiting):
+                reached |= closure(c, visiting)
+        visiting.discard(f)
+        forms[f] = reached
+        return reached
+    for f in links:
+        closure(f, set())
+    genes = dict((f, set().union(*[genesOf.get(c, set()) for c in reached])) for f, reached in forms.iteritems())
+    return (forms, genes)
+
+def csr_from_pairs(nbRows, rows, columns):
+    """
+    Build a compressed sparse row (CSR) adjacency from pairs (row, column).
+
+    Parms
+       nbRows, an integer, the number of rows.
+       rows, columns, NumPy arrays of integers of the same length.
+    Return
+       two NumPy arrays (indptr, indices): the columns of row i are
+       indices[indptr[i]:indptr[i+1]], sorted.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = np.asarray(columns, dtype=np.int64)
+    order = np.lexsort((columns, rows))
+    indptr = np.zeros(nbRows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=nbRows), out=indptr[1:])
+    return (indptr, columns[order])
+
+def incidence_matrix(rowIds, columnIds, pairs):
+    """
+    Build a boolean sparse incidence matrix.
+
+    Parms
+       rowIds, columnIds, lists of frame ids, the rows and columns of the matrix.
+       pairs, an iterable of pairs (row frame id, column frame id). Pairs with
+              an unknown frame id are ignored.
+    Return
+       a SciPy CSR matrix of booleans of shape (len(rowIds), len(columnIds)).
+    """
+    rowCode = dict((r, i) for i, r in enumerate(rowIds))
+    columnCode = dict((c, j) for j, c in enumerate(columnIds))
+    rows, columns = [], []
+    for (r, c) in pairs:
+        if r in rowCode and c in columnCode:
+            rows.append(rowCode[r])
+            columns.append(columnCode[c])
+    m = sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, columns)),
+                          shape=(len(rowIds), len(columnIds)), dtype=bool)
+    m.sum_duplicates()
+    return m
@@ -0,0 +1,213 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module queries many organisms (PGDBs) concurrently. Each query to
+Pathway Tools opens its own connection (see function sendQueryToPTools
+of PTools.py), so several queries can be sent at the same time from a
+pool of threads, to one or several running Pathway Tools, either given
+explicitly or set by function set_hosts of config.py. The number of
+queries sent at the same time to each Pathway Tools is bounded.
+
+Function map_orgids, available from the pythoncyc module, calls the same
+function or PGDB method for many organisms and streams the results as they
+complete. Function presence_matrix compares the pathways (or reactions,
+compounds, genes) of many organisms. For example,
+
+    >>> for (orgid, n) in pythoncyc.map_orgids(lambda pgdb: len(pgdb.all_pathways()), pythoncyc.all_orgids()):
+    ...     print orgid, n
+    >>> pm = pythoncyc.presence_matrix(pythoncyc.all_orgids(), kind='pathways')
+    >>> pm.matrix.sum(axis=0)
+    >>> pm.orgids_with('PWY-6147')
+"""
+
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+import config
+from PTools import sendQueryToPTools, host_pool, current_deadline, deadline, PythonCycError
+from PToolsFrame import Symbol
+from PGDB import PGDB, prepareFnCall
+from PToolsIndex import np, sparse, require_scipy, frameid_key, as_list, unique
+
+# The maximum number of queries sent at the same time to each Pathway Tools.
+CONNECTIONS_PER_HOST = 4
+
+# The maximum number of threads sending queries.
+DEFAULT_WORKERS = 8
+
+# The queries listing the features of an organism, by kind of features.
+PRESENCE_QUERIES = {'pathways':  prepareFnCall('all-pathways', ':all', False),
+                    'reactions': prepareFnCall('get-class-all-instances', Symbol('|Reactions|')),
+                    'compounds': prepareFnCall('get-class-all-instances', Symbol('|Compounds|')),
+                    'genes':     prepareFnCall('get-class-all-instances', Symbol('|Genes|'))}
+
+class _HostSlots():
+    """
+    The hosts that can be queried, assigned in turn to the tasks, each one with
+    a semaphore bounding the number of tasks running on it at the same time.
+    """
+
+    def __init__(self, hosts, connectionsPerHost):
+        if hosts:
+            self._hosts = list(hosts)
+            self._semaphores = [threading.BoundedSemaphore(connectionsPerHost) for h in self._hosts]
+        else:
+            # The host None routes each query among the hosts of the pool of PTools.py.
+            self._hosts = [None]
+            self._semaphores = [threading.BoundedSemaphore(connectionsPerHost * len(host_pool().hosts))]
+
+    def first_host(self):
+        return self._hosts[0]
+
+    def run(self, k, fn):
+        """ Call fn with the host of the task number k, when that host has a free slot. """
+        i = k % len(self._hosts)
+        self._semaphores[i].acquire()
+        try:
+            return fn(self._hosts[i])
+        finally:
+            self._semaphores[i].release()
+
+def _orgid_key(orgid):
+    """ An orgid, such as |ECOLI| or ecoli, as an upper case string without bars. """
+    return orgid.strip('|').upper()
+
+def map_orgids(fn, orgids, workers=DEFAULT_WORKERS, hosts=None, connectionsPerHost=CONNECTIONS_PER_HOST,
+               validate=True):
+    """
+    Call the same function, or PGDB method, for several organisms concurrently,
+    yielding the results as they complete.
+
+    Parms
+       fn, a function called with a PGDB object, or the name of a method of class
+           PGDB without arguments, e.g., 'all_pathways'. Use a lambda to pass arguments,
+           e.g., lambda pgdb: pgdb.pathways_of_gene('EG11024').
+       orgids, a list of orgids, e.g., the result of pythoncyc.all_orgids().
+       workers, the number of threads calling fn.
+       hosts, a list of pairs (host name, port) of running Pathway Tools having
+              the same PGDBs, to which the organisms are assigned in turn, or None
+              to route every query among the hosts set in config.py.
+       connectionsPerHost, the maximum number of calls of fn running at the same
+              time on each host.
+       validate, if True, the orgids are checked with one call to all-orgids,
+              instead of one orgid-exist-p per organism.
+    Return
+       an iterator of pairs (orgid, result of fn), in the order of completion.
+       An error raised by fn is raised by the iterator. The calls of fn share the
+       deadline of the thread calling map_orgids, if any (see function deadline of
+       PTools.py), even if the iterator is used outside the scope of that deadline.
+    """
+    orgids = unique(list(orgids))
+    slots = _HostSlots(hosts, connectionsPerHost)
+    # The orgids are checked, and the deadline taken, when map_orgids is called,
+    # not when the first result is asked.
+    if validate:
+        # The orgids are symbols, such as |ECOLI|, compared without bars nor case.
+        known = set(_orgid_key(o) for o in sendQueryToPTools('(all-orgids)', host=slots.first_host()) or []
+                    if isinstance(o, basestring))
+        unknown = [o for o in orgids if not (_orgid_key(o) in known)]
+        if unknown:
+            raise PythonCycError("The organisms orgids %s are unknown. Use pythoncyc.all_orgids() to get a list of known orgids." % unknown)
+    call = (lambda pgdb: getattr(pgdb, fn)()) if isinstance(fn, basestring) else fn
+    return _map_orgids(call, orgids, workers, slots, current_deadline())
+
+def _map_orgids(call, orgids, workers, slots, end):
+    """
+    The generator of the results of map_orgids, calling function call for the
+    orgids on the hosts of slots, with deadline end (a time, or None).
+    """
+    def task(t):
+        (k, orgid) = t
+        with deadline(None if end is None else end - time.time()):
+            return (orgid, slots.run(k, lambda host: call(PGDB(orgid, validate=False, host=host))))
+    pool = ThreadPool(max(1, min(workers, len(orgids))))
+    try:
+        for result in pool.imap_unordered(task, list(enumerate(orgids))):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+class PresenceMatrix():
+    """
+    The presence of some features (pathways, reactions, ...) in some organisms.
+
+    Attributes
+       matrix, a boolean SciPy CSR matrix of organisms x features.
+       orgids, the list of the orgids, in the order of the rows of matrix.
+       features, the sorted list of the frame ids of the features, in the order
+                 of the columns of matrix.
+       orgid_code, feature_code, dictionaries of the orgids and of the features to
+                   their row and column numbers.
+    """
+
+    def __init__(self, orgids, featuresOf):
+        require_scipy('the presence matrix')
+        self.orgids = list(orgids)
+        self.features = sorted(set(f for fs in featuresOf for f in fs))
+        self.orgid_code = dict((o, i) for i, o in enumerate(self.orgids))
+        self.feature_code = dict((f, j) for j, f in enumerate(self.features))
+        rows = [i for i, fs in enumerate(featuresOf) for f in fs]
+        columns = [self.feature_code[f] for fs in featuresOf for f in fs]
+        self.matrix = sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, columns)),
+                                        shape=(len(self.orgids), len(self.features)), dtype=bool)
+
+    def __repr__(self):
+        return '<PresenceMatrix '+str(len(self.orgids))+' organisms x '+str(len(self.features))+' features>'
+
+    def features_of(self, orgid):
+        """ Return the features present in an organism. """
+        i = self.orgid_code.get(orgid)
+        return [] if i is None else [self.features[j] for j in self.matrix[i].indices]
+
+    def orgids_with(self, feature):
+        """ Return the organisms where a feature is present. """
+        j = self.feature_code.get(frameid_key(feature))
+        if j is None:
+            return []
+        return [self.orgids[i] for i in self.matrix[:, j].nonzero()[0]]
+
+def presence_matrix(orgids, kind='pathways', workers=DEFAULT_WORKERS, hosts=None,
+                    connectionsPerHost=CONNECTIONS_PER_HOST):
+    """
+    Fetch concurrently the pathways, reactions, compounds or genes of several
+    organisms and return which ones are present in which organisms.
+
+    Parms
+       orgids, a list of orgids, e.g., the result of pythoncyc.all_orgids().
+       kind, one of 'pathways', 'reactions', 'compounds' or 'genes'.
+       workers, the number of threads sending queries.
+       hosts, a list of pairs (host name, port) of running Pathway Tools having
+              the same PGDBs, to which the organisms are assigned in turn, or None
+              to route every query among the hosts set in config.py.
+       connectionsPerHost, the maximum number of queries sent at the same time to each host.
+    Return
+       a PresenceMatrix object.
+    """
+    if not (kind in PRESENCE_QUERIES):
+        raise PythonCycError('Unknown kind %s for the presence matrix. Use one of %s.' % (kind, sorted(PRESENCE_QUERIES)))
+    query = PRESENCE_QUERIES[kind]
+    orgids = unique(list(orgids))
+    fetch = lambda pgdb: [frameid_key(f) for f in as_list(pgdb.sendPgdbQuery(query)) if isinstance(f, basestring)]
+    featuresOf = dict(map_orgids(fetch, orgids, workers, hosts, connectionsPerHost, validate=False))
+    return PresenceMatrix(orgids, [featuresOf[o] for o in orgids])
@@ -0,0 +1,374 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class PathwayIndex, a local index of the membership
+of the genes, reactions, enzymatic reactions and compounds in the pathways
+of a PGDB.
+
+Use method pathway_index of class PGDB to create a PathwayIndex. For example,
+
+    >>> pi = ecoli.pathway_index()
+    >>> pi.pathways_of_gene('EG11024')
+    >>> pi.pathways_of_compound('TRP', include_super_pwys=True)
+
+The membership is kept as sparse boolean incidence matrices (SciPy CSR
+matrices), with one row per gene, reaction, enzymatic reaction or compound
+and one column per pathway. A reaction is in a pathway when it is listed
+in the REACTION-LIST of that pathway. The super-pathways are added by
+multiplying an incidence matrix with the closure of the relation
+pathway -> super-pathway.
+
+The topology of the pathways, from their slots PREDECESSORS, is kept as
+one directed graph for all the pathways, whose nodes are the pairs
+(pathway, reaction) and whose edges go from a reaction to its successors
+in the same pathway. The connected components and a topological order of
+the reactions of all the pathways are computed once on that graph.
+"""
+
+from PToolsIndex import np, sparse, require_scipy, frameid_key, as_list, unique, \
+     protein_forms_and_genes, incidence_matrix
+
+# The kinds of items of the incidence matrices.
+KINDS = ['reaction', 'gene', 'enzrxn', 'compound']
+
+class PathwayIndex():
+    """
+    A local index of the pathways of a PGDB, built with a few bulk requests:
+    the pathways and their reactions, the substrates and enzymatic reactions
+    of these reactions, the enzymes of the enzymatic reactions and the genes
+    of these enzymes.
+    """
+
+    def __init__(self, pgdb):
+        require_scipy('the pathway index')
+        self._orgid = pgdb._orgid
+        pathways = [frameid_key(p) for p in pgdb.all_pathways('all', False)]
+        pathwaySet = set(pathways)
+        pwyData = pgdb.get_frames_slot_values(pathways, ['REACTION-LIST', 'SUB-PATHWAYS', 'SUPER-PATHWAYS',
+                                                          'PREDECESSORS'])
+
+        # Pairs (reaction, pathway) and (pathway, super-pathway). In a super-pathway,
+        # REACTION-LIST also lists its sub-pathways.
+        rxnPairs = []
+        superPairs = []
+        for pwy in pathways:
+            data = pwyData.get(pwy, {})
+            for x in as_list(data.get('reaction_list')):
+                x = frameid_key(x)
+                if x in pathwaySet:
+                    superPairs.append((x, pwy))
+                else:
+                    rxnPairs.append((x, pwy))
+            superPairs.extend((pwy, frameid_key(s)) for s in as_list(data.get('super_pathways')))
+            superPairs.extend((frameid_key(s), pwy) for s in as_list(data.get('sub_pathways')))
+        reactions = sorted(set(r for (r, p) in rxnPairs))
+
+        rxnData = pgdb.get_frames_slot_values(reactions, ['LEFT', 'RIGHT', 'ENZYMATIC-REACTION'])
+        cpdRxnPairs = []
+        enzrxnRxnPairs = []
+        for rxn in reactions:
+            data = rxnData.get(rxn, {})
+            for cpd in as_list(data.get('left')) + as_list(data.get('right')):
+                # Substrates given as strings with spaces (e.g., 'an electron acceptor') are not frames.
+                if isinstance(cpd, basestring) and not (' ' in cpd):
+                    cpdRxnPairs.append((frameid_key(cpd), rxn))
+            enzrxnRxnPairs.extend((frameid_key(er), rxn) for er in as_list(data.get('enzymatic_reaction')))
+        enzrxns = sorted(set(er for (er, r) in enzrxnRxnPairs))
+        erData = pgdb.get_frames_slot_values(enzrxns, ['ENZYME'])
+        enzymeOf = dict((er, frameid_key(er_data.get('enzyme'))) for er, er_data in erData.iteritems()
+                        if er_data.get('enzyme'))
+        (forms, genesOfEnzyme) = protein_forms_and_genes(pgdb, unique(enzymeOf.values()))
+        geneRxnPairs = [(g, r) for (er, r) in enzrxnRxnPairs for g in genesOfEnzyme.get(enzymeOf.get(er), [])]
+
+        self._pathways = np.array(pathways, dtype=object)
+        self._pathway_code = dict((p, j) for j, p in enumerate(pathways))
+        self._ids = {'reaction': reactions,
+                     'enzrxn':   enzrxns,
+                     'gene':     sorted(set(g for (g, r) in geneRxnPairs)),
+                     'compound': sorted(set(c for (c, r) in cpdRxnPairs))}
+        self._codes = dict((kind, dict((x, i) for i, x in enumerate(ids))) for kind, ids in self._ids.iteritems())
+        # Incidence matrices item x pathway, by kind, then with the super-pathways.
+        rxnPwy = incidence_matrix(reactions, pathways, rxnPairs).astype(np.int32)
+        self._incidence = {'reaction': rxnPwy.astype(bool)}
+        for kind, pairs in [('gene', geneRxnPairs), ('enzrxn', enzrxnRxnPairs), ('compound', cpdRxnPairs)]:
+            itemRxn = incidence_matrix(self._ids[kind], reactions, pairs).astype(np.int32)
+            self._incidence[kind] = (itemRxn * rxnPwy).astype(bool).tocsr()
+        self._super_closure = _closure_matrix(pathways, superPairs)
+        self._incidence_with_super = {}
+        self._incidence_csc = {}
+        self._build_topology(pwyData, pathwaySet)
+
+    def _build_topology(self, pwyData, pathwaySet):
+        """
+        Build the graph of the pairs (pathway, reaction) from the slots REACTION-LIST
+        and PREDECESSORS, then its connected components and the topological levels
+        of its nodes.
+        """
+        nodes = []
+        self._node_code = {}
+        def node(pwy, rxn):
+            if not ((pwy, rxn) in self._node_code):
+                self._node_code[(pwy, rxn)] = len(nodes)
+                nodes.append((pwy, rxn))
+            return self._node_code[(pwy, rxn)]
+        sources, targets = [], []
+        for pwy in self._pathways:
+            data = pwyData.get(pwy, {})
+            for x in as_list(data.get('reaction_list')):
+                if not (frameid_key(x) in pathwaySet):
+                    node(pwy, frameid_key(x))
+            # Each value of PREDECESSORS is a list (reaction predecessor ...), or a lone reaction.
+            for value in as_list(data.get('predecessors')):
+                value = [frameid_key(x) for x in as_list(value) if isinstance(frameid_key(x), basestring)]
+                if not value:
+                    continue
+                rxn = node(pwy, value[0])
+                for pred in value[1:]:
+                    if not (pred in pathwaySet):
+                        sources.append(node(pwy, pred))
+                        targets.append(rxn)
+        n = len(nodes)
+        self._node_pwy = np.array([p for (p, r) in nodes], dtype=object)
+        self._node_rxn = np.array([r for (p, r) in nodes], dtype=object)
+        successors = sparse.csr_matrix((np.ones(len(sources), dtype=np.int32), (sources, targets)), shape=(n, n))
+        successors.sum_duplicates()
+        self._successors = (successors != 0).tocsr()
+        self._predecessors = self._successors.T.tocsr()
+        (sources, targets) = (np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64))
+
+        # The connected components, by propagating the smallest node code along the edges.
+        labels = np.arange(n)
+        for step in range(n):
+            newLabels = labels.copy()
+            np.minimum.at(newLabels, sources, labels[targets])
+            np.minimum.at(newLabels, targets, labels[sources])
+            newLabels = newLabels[newLabels]
+            if (newLabels == labels).all():
+                break
+            labels = newLabels
+        self._component = labels
+
+        # The topological levels: the nodes without predecessors are at level 0, and
+        # so on. The nodes on cycles, never freed, are after all the others.
+        level = np.empty(n, dtype=np.int64)
+        level.fill(n)
+        inDegree = np.asarray(self._predecessors.getnnz(axis=1)).ravel()
+        frontier = np.nonzero(inDegree == 0)[0]
+        depth = 0
+        while len(frontier):
+            level[frontier] = depth
+            released = self._successors[frontier].tocoo().col
+            np.subtract.at(inDegree, released, 1)
+            frontier = np.unique(released[inDegree[released] == 0])
+            depth += 1
+        # The nodes of each pathway, by level then in the order of REACTION-LIST.
+        order = np.lexsort((np.arange(n), level))
+        self._nodes_of_pwy = {}
+        for i in order:
+            self._nodes_of_pwy.setdefault(self._node_pwy[i], []).append(i)
+
+    def __repr__(self):
+        return '<PathwayIndex '+self._orgid+', '+str(len(self._pathways))+' pathways, '+ \
+               ', '.join(str(len(self._ids[kind]))+' '+kind+'s' for kind in KINDS)+'>'
+
+    def pathways(self):
+        """ Return the frame ids of the pathways, in the order of the columns of the incidence matrices. """
+        return list(self._pathways)
+
+    def items(self, kind):
+        """ Return the frame ids of the items of a kind, in the order of the rows of its incidence matrix. """
+        return list(self._ids[kind])
+
+    def incidence(self, kind, include_super_pwys=False):
+        """
+        Return the sparse boolean incidence matrix of a kind of items.
+
+        Parms
+           kind, one of 'reaction', 'gene', 'enzrxn' or 'compound'.
+           include_super_pwys, a boolean, True => an item is also in all
+                               the super-pathways of its pathways.
+        Return
+           a SciPy CSR matrix with one row per item (see method items) and
+           one column per pathway (see method pathways).
+        """
+        if not include_super_pwys:
+            return self._incidence[kind]
+        if not (kind in self._incidence_with_super):
+            m = self._incidence[kind].astype(np.int32) * self._super_closure
+            self._incidence_with_super[kind] = m.astype(bool).tocsr()
+        return self._incidence_with_super[kind]
+
+    def _pathways_of(self, kind, item, include_super_pwys):
+        i = self._codes[kind].get(frameid_key(item))
+        if i is None:
+            return []
+        return list(self._pathways[self.incidence(kind, include_super_pwys)[i].indices])
+
+    def _items_of(self, kind, pwy, include_sub_pwys):
+        """ The items of a pathway, with those of its sub-pathways if include_sub_pwys. """
+        j = self._pathway_code.get(frameid_key(pwy))
+        if j is None:
+            return []
+        key = (kind, bool(include_sub_pwys))
+        if not (key in self._incidence_csc):
+            self._incidence_csc[key] = self.incidence(kind, include_sub_pwys).tocsc()
+        m = self._incidence_csc[key]
+        return [self._ids[kind][i] for i in sorted(m.indices[m.indptr[j]:m.indptr[j+1]])]
+
+    def pathways_of_gene(self, gene, include_super_pwys=None):
+        """
+        Same as method pathways_of_gene of class PGDB, answered locally.
+        """
+        return self._pathways_of('gene', gene, include_super_pwys)
+
+    def pathways_of_reaction(self, rxn, include_super_pwys=None):
+        """
+        Return the pathways of a reaction, answered locally.
+        """
+        return self._pathways_of('reaction', rxn, include_super_pwys)
+
+    def pathways_of_enzrxn(self, enzrxn, include_super_pwys=None):
+        """
+        Same as method pathways_of_enzrxn of class PGDB, answered locally.
+        """
+        return self._pathways_of('enzrxn', enzrxn, include_super_pwys)
+
+    def pathways_of_compound(self, cpd, include_super_pwys=None):
+        """
+        Return the pathways having a reaction with cpd as a substrate. This is a
+        local version of method pathways_of_compound of class PGDB without its
+        options about generic reactions and modulators.
+        """
+        return self._pathways_of('compound', cpd, include_super_pwys)
+
+    def genes_of_pathway(self, pwy):
+        """
+        Same as method genes_of_pathway of class PGDB, unsorted, answered locally.
+        The genes of a super-pathway include those of its sub-pathways.
+        """
+        return self._items_of('gene', pwy, True)
+
+    def reactions_of_pathway(self, pwy, include_sub_pwys=False):
+        """
+        Return the reactions listed in the REACTION-LIST of a pathway, or of its
+        sub-pathways if include_sub_pwys is True.
+        """
+        return self._items_of('reaction', pwy, include_sub_pwys)
+
+    def compounds_of_pathway(self, pwy):
+        """
+        Same as method compounds_of_pathway of class PGDB, answered locally.
+        The compounds of a super-pathway include those of its sub-pathways.
+        """
+        return self._items_of('compound', pwy, True)
+
+    def _node(self, rxn, pwy):
+        return self._node_code.get((frameid_key(pwy), frameid_key(rxn)))
+
+    def get_predecessors(self, rxn, pwy):
+        """
+        Same as method get_predecessors of class PGDB, answered locally.
+        """
+        i = self._node(rxn, pwy)
+        return [] if i is None else sorted(self._node_rxn[self._predecessors.getrow(i).indices])
+
+    def get_successors(self, rxn, pwy):
+        """
+        Same as method get_successors of class PGDB, answered locally.
+        """
+        i = self._node(rxn, pwy)
+        return [] if i is None else sorted(self._node_rxn[self._successors.getrow(i).indices])
+
+    def rxns_adjacent_in_pwy_p(self, rxn1, rxn2, pwy):
+        """
+        Same as method rxns_adjacent_in_pwy_p of class PGDB, answered locally:
+        True if one reaction is a direct predecessor of the other one in pwy.
+        """
+        (i, j) = (self._node(rxn1, pwy), self._node(rxn2, pwy))
+        return i is not None and j is not None and bool(self._successors[i, j] or self._successors[j, i])
+
+    def topological_order(self, pwy):
+        """
+        Return the reactions of a pathway, each one after its predecessors. The
+        reactions on a cycle of predecessors come last.
+        """
+        return list(self._node_rxn[self._nodes_of_pwy.get(frameid_key(pwy), [])])
+
+    def pathway_components(self, pwy):
+        """
+        Same as method pathway_components of class PGDB, without options rxn_list
+        and pred_list, answered locally. The components are in topological order.
+        """
+        nodes = self._nodes_of_pwy.get(frameid_key(pwy), [])
+        components = []
+        position = {}
+        for i in nodes:
+            label = self._component[i]
+            if not (label in position):
+                position[label] = len(components)
+                components.append([])
+            components[position[label]].append(self._node_rxn[i])
+        return [components, len(components), len(nodes)]
+
+    def noncontiguous_pathway_p(self, pwy):
+        """
+        Same as method noncontiguous_pathway_p of class PGDB, answered locally.
+        """
+        return self.pathway_components(pwy)[1] > 1
+
+    def noncontiguous_pathways(self):
+        """
+        Return the pathways having more than one connected component, computed for
+        all the pathways at once.
+        """
+        if len(self._component) == 0:
+            return []
+        pairs = np.unique(np.array([self._pathway_code[p] for p in self._node_pwy], dtype=np.int64) * len(self._component)
+                          + self._component)
+        nbComponents = np.bincount(pairs // len(self._component), minlength=len(self._pathways))
+        return list(self._pathways[nbComponents > 1])
+
+def _closure_matrix(pathways, superPairs):
+    """
+    Return a sparse matrix X of pathway x pathway where X[p, q] is 1 when q is p
+    or q is a direct or indirect super-pathway of p.
+    """
+    supers = {}
+    for (p, s) in superPairs:
+        supers.setdefault(p, set()).add(s)
+    code = dict((p, j) for j, p in enumerate(pathways))
+    rows, columns = [], []
+    for p in pathways:
+        reached = set([p])
+        stack = [p]
+        while stack:
+            for s in supers.get(stack.pop(), []):
+                if not (s in reached):
+                    reached.add(s)
+                    stack.append(s)
+        for s in reached:
+            if s in code:
+                rows.append(code[p])
+                columns.append(code[s])
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)),
+                             shape=(len(pathways), len(pathways)))
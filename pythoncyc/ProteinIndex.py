@@ -0,0 +1,324 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class ProteinIndex, a local graph of the composition
+of the protein complexes of a PGDB:
+
+   complex -> component (with its coefficient)
+
+where the components are proteins, RNAs or compounds. Since the
+coefficients of the components of the components multiply, the sum of the
+powers of the matrix of the direct components gives, for every complex,
+all its direct and indirect components with their total coefficients.
+The transpose of that closure gives the containers of every component.
+
+The forms of the proteins are grouped in the same way as a union-find
+structure: every protein has the code of its unmodified form and of its
+unmodified or unbound form (a complex of one protein with only small
+molecules is a bound form of that protein), and the code of its group of
+modified and unmodified forms. A list of proteins is then canonicalized by
+indexing these arrays.
+
+Use method protein_index of class PGDB to create a ProteinIndex. For example,
+
+    >>> pi = ecoli.protein_index()
+    >>> pi.monomers_of_protein('CPLX0-7')
+    >>> pi.top_containers('EG10498-MONOMER')
+    >>> pi.reduce_modified_proteins(proteins, debind=True)
+"""
+
+from PToolsIndex import np, sparse, require_scipy, frameid_key, as_list, first_value, unique
+
+class ProteinIndex():
+    """
+    A local index of the composition of the protein complexes of a PGDB,
+    built with a few bulk requests: the proteins, polypeptides and RNAs, and
+    the components of the proteins with their coefficients.
+    """
+
+    def __init__(self, pgdb):
+        require_scipy('the protein index')
+        self._orgid = pgdb._orgid
+        proteins = sorted(frameid_key(p) for p in pgdb.get_class_all_instances('|Proteins|'))
+        self._polypeptides = set(frameid_key(p) for p in pgdb.get_class_all_instances('|Polypeptides|'))
+        self._rnas = set(frameid_key(r) for r in pgdb.get_class_all_instances('|RNAs|'))
+        data = pgdb.get_frames_slot_value_annots(proteins, ['COMPONENTS', 'UNMODIFIED-FORM'], ['COEFFICIENT'])
+
+        # The nodes are the proteins and their components, which may also be RNAs or compounds.
+        self._proteins = set(proteins)
+        nodes = list(proteins)
+        code = dict((p, i) for i, p in enumerate(nodes))
+        rows, columns, coefficients = [], [], []
+        self._unmodified_form = {}
+        for p in proteins:
+            for value in data.get(p, {}).get('components', []):
+                value = as_list(value) + [None]
+                component = frameid_key(value[0])
+                if not isinstance(component, basestring):
+                    continue
+                if not (component in code):
+                    code[component] = len(nodes)
+                    nodes.append(component)
+                coefficient = first_value(value[1])
+                rows.append(code[p])
+                columns.append(code[component])
+                coefficients.append(float(coefficient) if isinstance(coefficient, (int, long, float))
+                                    and not isinstance(coefficient, bool) else 1.0)
+            unmodified = [frameid_key(first_value(v)) for v in data.get(p, {}).get('unmodified_form', [])]
+            if unmodified and isinstance(unmodified[0], basestring):
+                self._unmodified_form[p] = unmodified[0]
+        self._nodes = np.array(nodes, dtype=object)
+        self._code = code
+
+        # The direct components, then the closure with the multiplied coefficients.
+        n = len(nodes)
+        direct = sparse.csr_matrix((coefficients, (rows, columns)), shape=(n, n))
+        direct.sum_duplicates()
+        closure = direct.copy()
+        power = direct
+        for depth in range(n):
+            power = (power * direct).tocsr()
+            power.eliminate_zeros()
+            if power.nnz == 0:
+                break
+            closure = closure + power
+        self._direct = direct
+        self._closure = closure.tocsr()
+        self._containers = (self._closure != 0).T.tocsr()
+        self._direct_containers = (direct != 0).T.tocsr()
+        self._leaf = np.asarray(direct.getnnz(axis=1) == 0).ravel()
+        self._build_forms()
+
+    def __repr__(self):
+        return '<ProteinIndex '+self._orgid+', '+str(len(self._proteins))+' proteins, '+ \
+               str(int((~self._leaf).sum()))+' complexes>'
+
+    def _build_forms(self):
+        """
+        Compute, for every node, the code of its unmodified form, of its unmodified
+        or unbound form, and of its group of modified and unmodified forms.
+        """
+        n = len(self._nodes)
+        # Direct links: the unmodified form, and the unbound form of a protein bound to small molecules.
+        unmodified = np.arange(n)
+        for p, u in self._unmodified_form.iteritems():
+            if u in self._code:
+                unmodified[self._code[p]] = self._code[u]
+        unbound = np.arange(n)
+        for i in np.nonzero(~self._leaf)[0]:
+            components = self._direct.getrow(i).indices
+            proteins = [j for j in components if self._nodes[j] in self._proteins]
+            others = [j for j in components if not (self._nodes[j] in self._proteins or self._nodes[j] in self._rnas)]
+            if len(proteins) == 1 and others:
+                unbound[i] = proteins[0]
+        self._unmodified_link = unmodified
+        self._unmodified_code = _follow(unmodified)
+        self._unbound_code = _follow(np.where(unmodified != np.arange(n), unmodified, unbound))
+        # The groups of modified and unmodified forms share their unmodified form.
+        self._form_group = self._unmodified_code
+        order = np.argsort(self._form_group, kind='mergesort')
+        bounds = np.nonzero(np.diff(self._form_group[order]))[0] + 1
+        self._group_members = dict((int(self._form_group[g[0]]), g) for g in np.split(order, bounds)) if n else {}
+
+    def _unmodified(self, p):
+        """ The unmodified form of p, following UNMODIFIED-FORM to the end. """
+        i = self._code.get(p)
+        return p if i is None else self._nodes[self._unmodified_code[i]]
+
+    def base_composition(self, p):
+        """
+        Return the base components of a protein, that is, its direct or indirect
+        components that have no components, with their total coefficients, as a
+        list of pairs (component, coefficient). A protein without components is its
+        own base component.
+        """
+        i = self._code.get(frameid_key(p))
+        if i is None:
+            return []
+        if self._leaf[i]:
+            return [(self._nodes[i], 1)]
+        row = self._closure.getrow(i)
+        return [(self._nodes[j], _number(c)) for (j, c) in sorted(zip(row.indices, row.data)) if self._leaf[j]]
+
+    def monomers_of_protein(self, p, coefficients=True, unmodify=None):
+        """
+        Same as method monomers_of_protein of class PGDB, answered locally.
+        """
+        p = frameid_key(p)
+        if unmodify:
+            p = self._unmodified(p)
+        monomers = [(c, n) for (c, n) in self.base_composition(p) if c in self._polypeptides]
+        if coefficients or coefficients is None:
+            return [[c for (c, n) in monomers], [n for (c, n) in monomers]]
+        return [c for (c, n) in monomers]
+
+    def base_components_of_protein(self, p, exclude_small_molecules=True):
+        """
+        Same as method base_components_of_protein of class PGDB, answered locally.
+        """
+        components = [(c, n) for (c, n) in self.base_composition(p)
+                      if not exclude_small_molecules or c in self._proteins or c in self._rnas]
+        return [[c for (c, n) in components], [n for (c, n) in components]]
+
+    def components_of_protein(self, p):
+        """
+        Return the direct components of a protein with their coefficients,
+        as a list of pairs (component, coefficient).
+        """
+        i = self._code.get(frameid_key(p))
+        if i is None:
+            return []
+        row = self._direct.getrow(i)
+        return [(self._nodes[j], _number(c)) for (j, c) in sorted(zip(row.indices, row.data))]
+
+    def containers_of(self, protein, exclude_self=None):
+        """
+        Same as method containers_of of class PGDB, answered locally.
+        """
+        protein = frameid_key(protein)
+        i = self._code.get(protein)
+        if i is None:
+            return []
+        containers = list(self._nodes[self._containers.getrow(i).indices])
+        return sorted(containers) if exclude_self else [protein] + sorted(containers)
+
+    def top_containers(self, protein):
+        """
+        Same as method top_containers of class PGDB, answered locally.
+        """
+        return [c for c in self.containers_of(protein)
+                if self._direct_containers.getrow(self._code[c]).nnz == 0]
+
+    def homomultimeric_containers_of(self, protein, exclude_self=None):
+        """
+        Same as method homomultimeric_containers_of of class PGDB, answered locally:
+        the containers of protein with only one kind of monomer.
+        """
+        return [c for c in self.containers_of(protein, exclude_self)
+                if not self._leaf[self._code[c]] and len(self.monomers_of_protein(c)[0]) == 1]
+
+    def unmodified_form(self, protein):
+        """
+        Same as method unmodified_form of class PGDB, answered locally.
+        """
+        return self._unmodified(frameid_key(protein))
+
+    def unmodified_or_unbound_form(self, protein):
+        """
+        Same as method unmodified_or_unbound_form of class PGDB, answered locally.
+        """
+        protein = frameid_key(protein)
+        i = self._code.get(protein)
+        return protein if i is None else self._nodes[self._unbound_code[i]]
+
+    def modified_and_unmodified_forms(self, protein):
+        """
+        Same as method modified_and_unmodified_forms of class PGDB, answered locally.
+        """
+        protein = frameid_key(protein)
+        i = self._code.get(protein)
+        if i is None:
+            return [protein]
+        return sorted(self._nodes[self._group_members[int(self._form_group[i])]])
+
+    def modified_forms(self, protein, exclude_self=None, all_variants=None):
+        """
+        Same as method modified_forms of class PGDB, answered locally.
+        """
+        protein = frameid_key(protein)
+        i = self._code.get(protein)
+        if i is None:
+            return [] if exclude_self else [protein]
+        if all_variants:
+            i = self._unmodified_code[i]
+        forms = []
+        for j in self._group_members[int(self._form_group[i])]:
+            # j is a modified form of i if i is on the chain of unmodified forms from j.
+            k = j
+            for step in range(len(self._nodes)):
+                if k == i or self._unmodified_link[k] == k:
+                    break
+                k = self._unmodified_link[k]
+            if k == i:
+                forms.append(self._nodes[j])
+        return sorted(f for f in forms if not (exclude_self and f == protein))
+
+    def all_forms_of_protein(self, protein):
+        """
+        Same as method all_forms_of_protein of class PGDB, answered locally: the
+        modified and unmodified forms of protein, their direct and indirect
+        components, and their containers.
+        """
+        forms = set()
+        for f in self.modified_and_unmodified_forms(protein):
+            forms.update(self.containers_of(f))
+            i = self._code.get(f)
+            if i is not None:
+                forms.update(self._nodes[self._closure.getrow(i).indices])
+        return sorted(f for f in forms if f in self._proteins)
+
+    def canonical_forms(self, proteins, debind=None):
+        """
+        Return the unmodified forms, or the unmodified or unbound forms if debind
+        is True, of a list of proteins as a NumPy array in the same order. The
+        proteins unknown to the index are kept as they are.
+        """
+        keys = [frameid_key(p) for p in proteins]
+        codes = np.array([self._code.get(k, -1) for k in keys], dtype=np.int64)
+        canonical = self._unbound_code if debind else self._unmodified_code
+        result = np.array(keys, dtype=object)
+        known = codes >= 0
+        if known.any():
+            result[known] = self._nodes[canonical[codes[known]]]
+        return result
+
+    def reduce_modified_proteins(self, prots, debind=None):
+        """
+        Same as method reduce_modified_proteins of class PGDB, answered locally.
+        """
+        return unique(list(self.canonical_forms(prots, debind)))
+
+def _follow(links):
+    """
+    Given an array of links between codes, where links[i] == i ends a chain,
+    return the array of the ends of the chains starting at every code.
+    A chain leading to a cycle ends at the smallest code of that cycle.
+    """
+    ends = links.copy()
+    for k in range(len(links)):
+        nextEnds = links[ends]
+        if (nextEnds == ends).all():
+            return ends
+        ends = nextEnds
+    # After len(links) steps, the chains that have not ended are on their cycles:
+    # go once around each cycle to find its smallest code.
+    smallest = ends.copy()
+    current = links[ends]
+    while not (current == ends).all():
+        smallest = np.minimum(smallest, current)
+        current = links[current]
+    return smallest
+
+def _number(x):
+    """ A coefficient as an integer when it is integral. """
+    return int(x) if float(x).is_integer() else float(x)
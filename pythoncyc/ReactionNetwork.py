@@ -0,0 +1,341 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class ReactionNetwork, a local copy of the reaction
+network of a PGDB: the stoichiometry of all reactions, with the
+compartment of each substrate, their directions, their enzymes and their
+pathways. On that network, the gap analysis finds in one pass the
+dead-end metabolites, the blocked reactions, the pathway holes and the
+reactions without a sequenced enzyme (orphan reactions).
+
+Use method reaction_network of class PGDB to create a ReactionNetwork. For example,
+
+    >>> rn = ecoli.reaction_network()
+    >>> rn.dead_end_metabolites('|CCO-CYTOSOL|')
+    >>> gaps = rn.gap_analysis()
+
+A metabolite is a pair (compound, compartment). A substrate without a
+COMPARTMENT annotation is in the default compartment, the cytosol, as
+in Pathway Tools. The stoichiometry is kept as two sparse matrices of
+metabolites x reactions, one for the left side and one for the right side
+of the reactions.
+"""
+
+from PToolsIndex import np, sparse, require_scipy, frameid_key, as_list, first_value, unique, \
+     protein_forms_and_genes
+
+# The compartment of the substrates without a COMPARTMENT annotation.
+DEFAULT_COMPARTMENT = '|CCO-CYTOSOL|'
+
+# The compartments whose metabolites are exchanged with the environment,
+# and hence are never dead ends.
+BOUNDARY_COMPARTMENTS = ['|CCO-OUT|', '|CCO-EXTRACELLULAR|']
+
+# Directions of the reactions: +1 left to right, -1 right to left, 0 reversible.
+DIRECTIONS = {'LEFT-TO-RIGHT': 1, 'PHYSIOL-LEFT-TO-RIGHT': 1, 'IRREVERSIBLE-LEFT-TO-RIGHT': 1,
+              'RIGHT-TO-LEFT': -1, 'PHYSIOL-RIGHT-TO-LEFT': -1, 'IRREVERSIBLE-RIGHT-TO-LEFT': -1,
+              'REVERSIBLE': 0}
+
+def direction_code(direction):
+    """
+    Return the direction code (+1, -1 or 0) of a value of slot REACTION-DIRECTION.
+    A reaction without a direction is reversible.
+    """
+    direction = first_value(direction)
+    if isinstance(direction, basestring):
+        return DIRECTIONS.get(direction.strip('|').upper(), 0)
+    return 0
+
+def coefficient_value(coefficient):
+    """
+    Return the numerical value of a COEFFICIENT annotation and a boolean that is
+    True if the coefficient is variable (e.g., 'n' or '(+ n 1)'), in which case
+    the value is 1.0.
+    """
+    if coefficient is None or coefficient is False or coefficient == []:
+        return (1.0, False)
+    elif isinstance(coefficient, (int, long, float)) and not isinstance(coefficient, bool):
+        return (float(coefficient), False)
+    else:
+        return (1.0, True)
+
+class ReactionNetwork():
+    """
+    A local copy of the reaction network of a PGDB, built with a few bulk
+    requests: the substrates of the reactions with their coefficients and
+    compartments, the slots of the reactions, their enzymes, the genes of these
+    enzymes and the positions of these genes.
+    """
+
+    def __init__(self, pgdb):
+        require_scipy('the reaction network')
+        self._orgid = pgdb._orgid
+        reactions = sorted(frameid_key(r) for r in pgdb.get_class_all_instances('|Reactions|'))
+        sides = pgdb.get_frames_slot_value_annots(reactions, ['LEFT', 'RIGHT'], ['COEFFICIENT', 'COMPARTMENT'])
+        rxnData = pgdb.get_frames_slot_values(reactions, ['REACTION-DIRECTION', 'ENZYMATIC-REACTION',
+                                                          'SPONTANEOUS?', 'IN-PATHWAY'])
+        self._reactions = np.array(reactions, dtype=object)
+        self._rxn_code = dict((r, j) for j, r in enumerate(reactions))
+
+        # The stoichiometry, as triples (metabolite code, reaction code, coefficient) per side.
+        self._metabolites = []
+        self._met_code = {}
+        triples = {'left': [], 'right': []}
+        self._variable = np.zeros(len(reactions), dtype=bool)
+        # The reactions with a substrate that is not a frame, or without substrates.
+        self._incomplete = np.zeros(len(reactions), dtype=bool)
+        for j, rxn in enumerate(reactions):
+            if not any(sides.get(rxn, {}).get(side) for side in ['left', 'right']):
+                self._incomplete[j] = True
+            for side in ['left', 'right']:
+                for value in sides.get(rxn, {}).get(side, []):
+                    value = as_list(value) + [None, None]
+                    (cpd, coefficient, compartment) = value[0:3]
+                    # Substrates given as strings with spaces are not frames.
+                    if not isinstance(cpd, basestring) or ' ' in cpd:
+                        self._incomplete[j] = True
+                        continue
+                    metabolite = (frameid_key(cpd), frameid_key(first_value(compartment)) or DEFAULT_COMPARTMENT)
+                    if not (metabolite in self._met_code):
+                        self._met_code[metabolite] = len(self._metabolites)
+                        self._metabolites.append(metabolite)
+                    (coefficient, variable) = coefficient_value(coefficient)
+                    self._variable[j] |= variable
+                    triples[side].append((self._met_code[metabolite], j, coefficient))
+        shape = (len(self._metabolites), len(reactions))
+        def sideMatrix(side):
+            if not triples[side]:
+                return sparse.csr_matrix(shape)
+            (rows, columns, coefficients) = zip(*triples[side])
+            return sparse.csr_matrix((coefficients, (rows, columns)), shape=shape)
+        self._left = sideMatrix('left')
+        self._right = sideMatrix('right')
+        self._compartments = np.array([c for (m, c) in self._metabolites], dtype=object)
+
+        self._direction = np.array([direction_code(rxnData.get(r, {}).get('reaction_direction')) for r in reactions],
+                                   dtype=np.int8)
+        self._spontaneous = np.array([bool(rxnData.get(r, {}).get('spontaneous_p')) for r in reactions], dtype=bool)
+        self._pathways_of_rxn = dict((r, [frameid_key(p) for p in as_list(rxnData.get(r, {}).get('in_pathway'))])
+                                     for r in reactions)
+        self._in_pathway = np.array([bool(self._pathways_of_rxn[r]) for r in reactions], dtype=bool)
+
+        # The enzymes of the reactions, their genes and whether these genes have a position.
+        enzrxnsOf = dict((r, [frameid_key(er) for er in as_list(rxnData.get(r, {}).get('enzymatic_reaction'))])
+                         for r in reactions)
+        enzrxns = unique([er for r in reactions for er in enzrxnsOf[r]])
+        erData = pgdb.get_frames_slot_values(enzrxns, ['ENZYME'])
+        enzymeOf = dict((er, frameid_key(first_value(data.get('enzyme')))) for er, data in erData.iteritems())
+        (forms, genesOfEnzyme) = protein_forms_and_genes(pgdb, unique([e for e in enzymeOf.values() if e]))
+        genes = unique([g for gs in genesOfEnzyme.values() for g in gs])
+        geneData = pgdb.get_frames_slot_values(genes, ['LEFT-END-POSITION'])
+        sequenced = set(g for g in genes if geneData.get(g, {}).get('left_end_position') is not None)
+        self._enzymes_of_rxn = dict((r, unique([enzymeOf[er] for er in enzrxnsOf[r] if enzymeOf.get(er)]))
+                                    for r in reactions)
+        self._has_enzyme = np.array([bool(self._enzymes_of_rxn[r]) for r in reactions], dtype=bool)
+        nbGenes = np.zeros(len(reactions), dtype=np.int32)
+        nbSequenced = np.zeros(len(reactions), dtype=np.int32)
+        for j, r in enumerate(reactions):
+            rxnGenes = set().union(*[genesOfEnzyme.get(e, set()) for e in self._enzymes_of_rxn[r]])
+            nbGenes[j] = len(rxnGenes)
+            nbSequenced[j] = len(rxnGenes & sequenced)
+        self._nb_genes = nbGenes
+        self._nb_sequenced_genes = nbSequenced
+
+    def __repr__(self):
+        return '<ReactionNetwork '+self._orgid+', '+str(len(self._reactions))+' reactions, '+ \
+               str(len(self._metabolites))+' metabolites>'
+
+    def reactions(self):
+        """ Return the frame ids of the reactions, in the order of the columns of the matrices. """
+        return list(self._reactions)
+
+    def metabolites(self):
+        """ Return the metabolites (compound, compartment), in the order of the rows of the matrices. """
+        return list(self._metabolites)
+
+    def compartments(self):
+        """ Return the compartments of the metabolites of the network. """
+        return sorted(set(self._compartments))
+
+    def stoichiometric_matrix(self):
+        """
+        Return the stoichiometric matrix of the network, as a SciPy CSR matrix of
+        metabolites x reactions, negative for the left side and positive for the
+        right side of the reactions. Variable coefficients (e.g., n) count as 1.
+        """
+        return (self._right - self._left).tocsr()
+
+    def substrate_matrix(self):
+        """
+        Return the boolean matrix of the metabolites x reactions, as a SciPy CSR matrix,
+        which is True when the metabolite is a substrate of the reaction, on either side.
+        """
+        return ((self._left != 0) + (self._right != 0)).tocsr()
+
+    def directions(self):
+        """ Return the directions of the reactions as a NumPy array: +1 left to right, -1 right to left, 0 reversible. """
+        return self._direction.copy()
+
+    def variable_stoichiometry_p(self, rxn):
+        """ A predicate that is True if rxn has a variable coefficient, such as n. """
+        j = self._rxn_code.get(frameid_key(rxn))
+        return j is not None and bool(self._variable[j])
+
+    def incomplete_substrates_p(self, rxn):
+        """
+        A predicate that is True if rxn has no substrates, or has a substrate that is
+        not a frame (e.g., a string with spaces) and is missing from the matrices.
+        """
+        j = self._rxn_code.get(frameid_key(rxn))
+        return j is not None and bool(self._incomplete[j])
+
+    def substrates_of_reaction(self, rxn):
+        """
+        Return the metabolites of a reaction as two lists of pairs (metabolite, coefficient),
+        the left side and the right side.
+        """
+        j = self._rxn_code.get(frameid_key(rxn))
+        if j is None:
+            return [[], []]
+        def side(m):
+            column = m.getcol(j).tocoo()
+            return [(self._metabolites[i], float(c)) for (i, c) in sorted(zip(column.row, column.data))]
+        return [side(self._left), side(self._right)]
+
+    def _participation(self, active):
+        """
+        Count, for each metabolite, the active reactions producing it, consuming it
+        and involving it, given the directions of the reactions.
+        """
+        left = (self._left != 0).astype(np.int32)
+        right = (self._right != 0).astype(np.int32)
+        forward = (active & (self._direction >= 0)).astype(np.int32)
+        backward = (active & (self._direction <= 0)).astype(np.int32)
+        produced = right.dot(forward) + left.dot(backward)
+        consumed = left.dot(forward) + right.dot(backward)
+        involved = self.substrate_matrix().astype(np.int32).dot(active.astype(np.int32))
+        return (produced, consumed, involved)
+
+    def _boundary_mask(self, boundary):
+        if boundary is None:
+            boundary = BOUNDARY_COMPARTMENTS
+        boundary = set(frameid_key(c) for c in boundary)
+        return np.array([c in boundary for c in self._compartments], dtype=bool)
+
+    def _dead_ends(self, active, isBoundary):
+        (produced, consumed, involved) = self._participation(active)
+        return (involved > 0) & ~isBoundary & ((produced == 0) | (consumed == 0) | (involved == 1))
+
+    def dead_end_metabolites(self, compartment=None, boundary=None):
+        """
+        Return the dead-end metabolites: the metabolites that are only produced or
+        only consumed by the reactions of the network, given their directions, or
+        that are involved in only one reaction.
+
+        Parms
+           compartment, a compartment (e.g., '|CCO-CYTOSOL|') or None for all compartments.
+           boundary, a list of compartments whose metabolites are exchanged with the
+                     environment and are never dead ends. By default, BOUNDARY_COMPARTMENTS.
+        Return
+           a list of pairs (compound, compartment).
+        """
+        dead = self._dead_ends(np.ones(len(self._reactions), dtype=bool), self._boundary_mask(boundary))
+        if compartment is not None:
+            dead &= (self._compartments == frameid_key(compartment))
+        return [self._metabolites[i] for i in np.nonzero(dead)[0]]
+
+    def _blocked(self, boundary):
+        """ The mask of the blocked reactions. """
+        isBoundary = self._boundary_mask(boundary)
+        incidence = self.substrate_matrix().astype(np.int32).T.tocsr()
+        active = np.ones(len(self._reactions), dtype=bool)
+        while True:
+            dead = self._dead_ends(active, isBoundary)
+            blocked = active & (incidence.dot(dead.astype(np.int32)) > 0)
+            if not blocked.any():
+                return ~active
+            active &= ~blocked
+
+    def blocked_reactions(self, boundary=None):
+        """
+        Return the blocked reactions: the reactions involving a dead-end metabolite,
+        found repeatedly until no more reactions are blocked, since removing a blocked
+        reaction may leave new dead-end metabolites. See method dead_end_metabolites
+        for parameter boundary.
+        """
+        return list(self._reactions[self._blocked(boundary)])
+
+    def orphan_p(self, rxn, complete=None):
+        """
+        Same as method rxn_without_sequenced_enzyme_p of class PGDB, answered locally.
+        A gene is sequenced when it has a position on the genome. Spontaneous reactions
+        are never orphans.
+        """
+        j = self._rxn_code.get(frameid_key(rxn))
+        return j is not None and bool(self._orphans(complete)[j])
+
+    def _orphans(self, complete):
+        if complete:
+            unsequenced = (self._nb_genes == 0) | (self._nb_sequenced_genes < self._nb_genes)
+        else:
+            unsequenced = (self._nb_sequenced_genes == 0)
+        return unsequenced & ~self._spontaneous
+
+    def orphan_reactions(self, complete=None):
+        """
+        Return the reactions without a sequenced enzyme. If complete is True,
+        also the reactions with any gene without a sequence.
+        """
+        return list(self._reactions[self._orphans(complete)])
+
+    def _holes(self, hole_if_any_gene_without_position):
+        noEnzyme = ~self._has_enzyme
+        if hole_if_any_gene_without_position:
+            noEnzyme |= (self._nb_sequenced_genes == 0)
+        return self._in_pathway & noEnzyme & ~self._spontaneous
+
+    def pathway_hole_p(self, rxn, hole_if_any_gene_without_position=None):
+        """
+        Same as method pathway_hole_p of class PGDB, answered locally: rxn is
+        a reaction of a pathway without an enzyme, and it is not spontaneous.
+        """
+        j = self._rxn_code.get(frameid_key(rxn))
+        return j is not None and bool(self._holes(hole_if_any_gene_without_position)[j])
+
+    def pathway_holes(self, hole_if_any_gene_without_position=None):
+        """
+        Return the reactions of pathways that are pathway holes. See method pathway_hole_p.
+        """
+        return list(self._reactions[self._holes(hole_if_any_gene_without_position)])
+
+    def gap_analysis(self, boundary=None):
+        """
+        Return the full gap analysis of the network as a dictionary with keys
+        'dead_end_metabolites', 'blocked_reactions', 'pathway_holes' and
+        'orphan_reactions', computed as by the methods of the same names.
+        The dead-end metabolites are those of the full network.
+        """
+        return {'dead_end_metabolites': self.dead_end_metabolites(boundary=boundary),
+                'blocked_reactions':    self.blocked_reactions(boundary),
+                'pathway_holes':        self.pathway_holes(),
+                'orphan_reactions':     self.orphan_reactions()}
@@ -0,0 +1,290 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class RegulationIndex, a local graph of the
+transcriptional regulation of a PGDB:
+
+   regulator -> regulation frame -> transcription unit -> gene
+
+where each regulation frame has a sign: activation (+1), inhibition (-1)
+or unknown (0). The regulators are related to the genes encoding them,
+which gives a graph between genes. The transitive closure of that graph,
+with the signs of the paths, is precomputed.
+
+Use method regulation_index of class PGDB to create a RegulationIndex. For example,
+
+    >>> ri = ecoli.regulation_index()
+    >>> ri.genes_regulated_by_gene('EG10164')
+    >>> ri.all_genes_regulated_by('EG10164', sign='-')
+"""
+
+from PToolsIndex import np, require_numpy, frameid_key, as_list, first_value, unique, protein_forms_and_genes
+
+# The class of the regulation frames of the regulatory graph.
+REGULATION_CLASS = '|Regulation-of-Transcription|'
+
+# Bits of the signs of the paths in the transitive closure.
+POSITIVE = 1
+NEGATIVE = 2
+
+def mode_sign(mode):
+    """
+    Return the sign of a regulation from the value of its slot MODE:
+    +1 for activation ('+'), -1 for inhibition ('-'), 0 otherwise.
+    """
+    mode = first_value(mode)
+    if mode == '+':
+        return 1
+    elif mode == '-':
+        return -1
+    else:
+        return 0
+
+class RegulationIndex():
+    """
+    A local index of the transcriptional regulatory network of a PGDB.
+    The index is built with a few bulk requests: the regulation frames and
+    the components of the regulators down to their genes. The transcription
+    units come from the TranscriptionUnitIndex of the PGDB.
+    """
+
+    def __init__(self, pgdb):
+        require_numpy('the regulation index')
+        self._orgid = pgdb._orgid
+        tuIndex = pgdb.transcription_unit_index()
+
+        # The regulation frames: regulator, sign and regulated transcription units (or genes).
+        regs = pgdb.get_class_all_instances(REGULATION_CLASS)
+        regData = pgdb.get_frames_slot_values(regs, ['REGULATOR', 'REGULATED-ENTITY', 'MODE'])
+        self._regulator = {}
+        self._sign = {}
+        self._tus_of_reg = {}
+        self._targets_of_reg = {}
+        for reg, data in regData.iteritems():
+            regulator = frameid_key(first_value(data['regulator']))
+            if not regulator:
+                continue
+            targetTUs = []
+            targetGenes = []
+            for entity in as_list(data['regulated_entity']):
+                entity = frameid_key(entity)
+                if tuIndex.transcription_unit_p(entity):
+                    targetTUs.append(entity)
+                elif tuIndex.gene_p(entity):
+                    # A gene, possibly in no transcription unit.
+                    targetGenes.append(entity)
+                else:
+                    targetTUs.extend(tuIndex.containing_tus(entity))
+            for tu in targetTUs:
+                targetGenes.extend(tuIndex.transcription_unit_genes(tu))
+            self._regulator[reg] = regulator
+            self._sign[reg] = mode_sign(data['mode'])
+            self._tus_of_reg[reg] = unique(targetTUs)
+            self._targets_of_reg[reg] = unique(targetGenes)
+
+        # The forms of the regulators (subunits, unmodified forms) and their genes.
+        (self._forms, self._genes_of_regulator) = protein_forms_and_genes(pgdb, unique(self._regulator.values()))
+        self._regulators_of_form = {}
+        for regulator in set(self._regulator.values()):
+            for f in self._forms.get(regulator, [regulator]):
+                self._regulators_of_form.setdefault(f, set()).add(regulator)
+        self._regulators_of_gene = {}
+        for regulator in set(self._regulator.values()):
+            for g in self._genes_of_regulator.get(regulator, []):
+                self._regulators_of_gene.setdefault(g, set()).add(regulator)
+        self._regs_of_regulator = {}
+        self._regs_of_gene = {}
+        for reg, regulator in self._regulator.iteritems():
+            self._regs_of_regulator.setdefault(regulator, []).append(reg)
+            for g in self._targets_of_reg[reg]:
+                self._regs_of_gene.setdefault(g, []).append(reg)
+
+        self._build_gene_graph()
+
+    def __repr__(self):
+        return '<RegulationIndex '+self._orgid+', '+str(len(self._regulator))+' regulations, '+str(len(self._sources))+' regulating genes>'
+
+    def _build_gene_graph(self):
+        """
+        Build the signed graph between genes and its transitive closure.
+        The closure is a matrix with one row per regulating gene and one column per
+        gene, where each entry has bit POSITIVE if there is a path with a positive
+        sign, and bit NEGATIVE if there is a path with a negative sign. A regulation
+        of unknown sign may act both ways.
+        """
+        edges = {}
+        for reg, regulator in self._regulator.iteritems():
+            for source in self._genes_of_regulator.get(regulator, []):
+                for target in self._targets_of_reg[reg]:
+                    edges.setdefault((source, target), set()).add(self._sign[reg])
+        nodes = set()
+        for (source, target) in edges:
+            nodes.add(source)
+            nodes.add(target)
+        self._genes = sorted(nodes)
+        self._gene_code = dict((g, i) for i, g in enumerate(self._genes))
+        successors = [[] for g in self._genes]
+        for (source, target), signs in edges.iteritems():
+            for sign in signs:
+                successors[self._gene_code[source]].append((self._gene_code[target], sign))
+        self._sources = sorted(set(self._gene_code[source] for (source, target) in edges))
+        self._source_row = dict((s, i) for i, s in enumerate(self._sources))
+        self._closure = np.zeros((len(self._sources), len(self._genes)), dtype=np.uint8)
+        for row, s in enumerate(self._sources):
+            reached = self._closure[row]
+            stack = [(s, POSITIVE)]
+            while stack:
+                (node, bits) = stack.pop()
+                for (target, sign) in successors[node]:
+                    newBits = _propagate(bits, sign)
+                    if newBits & ~reached[target]:
+                        reached[target] |= newBits
+                        stack.append((target, int(reached[target])))
+
+    def activation_p(self, reg_frame):
+        """
+        Same as method activation_p of class PGDB, answered locally.
+        """
+        return self._sign.get(frameid_key(reg_frame)) == 1
+
+    def inhibition_p(self, reg_frame):
+        """
+        Same as method inhibition_p of class PGDB, answered locally.
+        """
+        return self._sign.get(frameid_key(reg_frame)) == -1
+
+    def regulation_frames_of_gene(self, gene):
+        """
+        Return the regulation frames regulating the transcription of a gene.
+        """
+        return list(self._regs_of_gene.get(frameid_key(gene), []))
+
+    def _regs_of_protein(self, protein):
+        """ The regulation frames of all regulators that are forms of protein. """
+        regs = []
+        for regulator in self._regulators_of_form.get(frameid_key(protein), []):
+            regs.extend(self._regs_of_regulator[regulator])
+        return regs
+
+    def regulon_of_protein(self, protein):
+        """
+        Same as method regulon_of_protein of class PGDB, answered locally.
+        """
+        return unique([tu for reg in self._regs_of_protein(protein) for tu in self._tus_of_reg[reg]])
+
+    def transcription_units_of_protein(self, protein):
+        """
+        Same as method transcription_units_of_protein of class PGDB, answered locally.
+        """
+        return self.regulon_of_protein(protein)
+
+    def genes_regulated_by_protein(self, protein):
+        """
+        Same as method genes_regulated_by_protein of class PGDB, answered locally.
+        """
+        return unique([g for reg in self._regs_of_protein(protein) for g in self._targets_of_reg[reg]])
+
+    def regulators_of_gene_transcription(self, gene, by_function=None):
+        """
+        Same as method regulators_of_gene_transcription of class PGDB, answered locally.
+        If by_function is True, return a list of two lists: the activators and the inhibitors.
+        """
+        regs = self.regulation_frames_of_gene(gene)
+        if by_function:
+            return [unique([self._regulator[r] for r in regs if self._sign[r] == 1]),
+                    unique([self._regulator[r] for r in regs if self._sign[r] == -1])]
+        return unique([self._regulator[r] for r in regs])
+
+    def genes_regulated_by_gene(self, gene):
+        """
+        Same as method genes_regulated_by_gene of class PGDB, answered locally.
+        """
+        return unique([g for regulator in self._regulators_of_gene.get(frameid_key(gene), [])
+                          for reg in self._regs_of_regulator[regulator]
+                          for g in self._targets_of_reg[reg]])
+
+    def genes_regulating_gene(self, gene):
+        """
+        Same as method genes_regulating_gene of class PGDB, answered locally.
+        """
+        return unique([g for reg in self.regulation_frames_of_gene(gene)
+                          for g in sorted(self._genes_of_regulator.get(self._regulator[reg], []))])
+
+    def _source_rows(self, item):
+        """
+        The rows of the closure for item, a gene or a regulator (any of its forms).
+        """
+        item = frameid_key(item)
+        genes = set([item]) if item in self._gene_code else set()
+        for regulator in self._regulators_of_form.get(item, []):
+            genes |= self._genes_of_regulator.get(regulator, set())
+        return [self._source_row[self._gene_code[g]] for g in genes
+                if g in self._gene_code and self._gene_code[g] in self._source_row]
+
+    def all_genes_regulated_by(self, item, sign=None):
+        """
+        Return all genes directly or indirectly regulated by a gene or a
+        regulator (any form of a protein), using the precomputed transitive closure.
+
+        Parms
+           item, a gene or a protein, a frame id or PFrame.
+           sign, None for all paths, '+' for genes reachable by a path of positive
+                 sign (an even number of inhibitions), '-' for genes reachable by
+                 a path of negative sign.
+        Return
+           a list of genes.
+        """
+        rows = self._source_rows(item)
+        if not rows:
+            return []
+        bits = np.bitwise_or.reduce(self._closure[rows], axis=0)
+        return [self._genes[i] for i in np.nonzero(bits & _sign_bits(sign))[0]]
+
+    def regulates_p(self, item, gene, sign=None):
+        """
+        A predicate that is True if item (a gene or a regulator) directly or
+        indirectly regulates the given gene, by a path of the given sign
+        (see method all_genes_regulated_by).
+        """
+        gene = frameid_key(gene)
+        if not (gene in self._gene_code):
+            return False
+        column = self._gene_code[gene]
+        return any(self._closure[row, column] & _sign_bits(sign) for row in self._source_rows(item))
+
+def _propagate(bits, sign):
+    """ The sign bits of a path extended by an edge of the given sign. """
+    if sign == 1:
+        return bits
+    elif sign == -1:
+        return ((bits & POSITIVE) << 1) | ((bits & NEGATIVE) >> 1)
+    else:
+        return POSITIVE | NEGATIVE
+
+def _sign_bits(sign):
+    if sign == '+':
+        return POSITIVE
+    elif sign == '-':
+        return NEGATIVE
+    else:
+        return POSITIVE | NEGATIVE
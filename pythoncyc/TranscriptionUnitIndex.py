@@ -0,0 +1,237 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class TranscriptionUnitIndex, a local index of the
+transcription units (TUs) of a PGDB, of their genes, promoters,
+terminators and binding sites, and of the operons they form.
+
+Use method transcription_unit_index of class PGDB to create a
+TranscriptionUnitIndex. For example,
+
+    >>> tui = ecoli.transcription_unit_index()
+    >>> tui.operon_of_gene('EG11024')
+    >>> tui.operon_ids(['EG11024', 'EG11025', 'EG11026'])
+
+The genes of the TUs are kept as compressed sparse row (CSR) arrays in
+both directions, TU to genes and gene to TUs. An operon is a maximal set
+of TUs sharing genes, as in method all_operons of class PGDB.
+"""
+
+from PToolsIndex import np, require_numpy, frameid_key, as_list, unique, csr_from_pairs
+
+# The kinds of components of the TUs, as (class, kind name). Genes are kept in CSR arrays.
+COMPONENT_CLASSES = [('|Promoters|', 'promoter'),
+                     ('|Terminators|', 'terminator'),
+                     ('|DNA-Binding-Sites|', 'binding-site')]
+
+class TranscriptionUnitIndex():
+    """
+    A local index of the transcription units of a PGDB, built with one
+    request for the components of all TUs and one request per class of
+    components.
+    """
+
+    def __init__(self, pgdb):
+        require_numpy('the transcription unit index')
+        self._orgid = pgdb._orgid
+        geneSet = set(frameid_key(g) for g in pgdb.get_class_all_instances('|Genes|'))
+        kindOf = {}
+        for className, kind in COMPONENT_CLASSES:
+            for frameid in pgdb.get_class_all_instances(className):
+                kindOf[frameid_key(frameid)] = kind
+        tuIds = [frameid_key(tu) for tu in pgdb.get_class_all_instances('|Transcription-Units|')]
+        components = pgdb.get_frames_slot_values(tuIds, ['COMPONENTS'])
+
+        self._tus = np.array(sorted(tuIds), dtype=object)
+        self._tu_code = dict((tu, i) for i, tu in enumerate(self._tus))
+        genesOfTUs = [(tu, [frameid_key(c) for c in as_list(components.get(tu, {}).get('components'))])
+                      for tu in self._tus]
+        self._genes = np.array(sorted(set(c for tu, cs in genesOfTUs for c in cs if c in geneSet)), dtype=object)
+        self._gene_code = dict((g, i) for i, g in enumerate(self._genes))
+        self._all_genes = geneSet
+
+        # Other components by kind, and the TUs containing each component.
+        self._components = {}
+        self._tus_of_component = {}
+        rows, columns = [], []
+        for tu, cs in genesOfTUs:
+            byKind = {}
+            for c in cs:
+                if c in self._gene_code:
+                    rows.append(self._tu_code[tu])
+                    columns.append(self._gene_code[c])
+                else:
+                    byKind.setdefault(kindOf.get(c, 'other'), []).append(c)
+                    self._tus_of_component.setdefault(c, []).append(tu)
+            self._components[tu] = byKind
+        (self._tu_indptr, self._tu_genes) = csr_from_pairs(len(self._tus), rows, columns)
+        (self._gene_indptr, self._gene_tus) = csr_from_pairs(len(self._genes), columns, rows)
+
+        # Operons: connected components of the TUs sharing genes.
+        parent = range(len(self._tus))
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        for g in range(len(self._genes)):
+            tus = self._gene_tus[self._gene_indptr[g]:self._gene_indptr[g+1]]
+            for tu in tus[1:]:
+                parent[find(tu)] = find(tus[0])
+        roots = np.array([find(i) for i in range(len(self._tus))], dtype=np.int64)
+        self._operon_of_tu = np.unique(roots, return_inverse=True)[1] if len(roots) else roots
+        self._gene_operon = np.array([self._operon_of_tu[self._gene_tus[self._gene_indptr[g]]]
+                                      for g in range(len(self._genes))], dtype=np.int64)
+
+    def __repr__(self):
+        return '<TranscriptionUnitIndex '+self._orgid+', '+str(len(self._tus))+' TUs, '+str(len(self._genes))+' genes>'
+
+    def transcription_unit_p(self, item):
+        """ A predicate that is True if item is a TU of the index. """
+        return frameid_key(item) in self._tu_code
+
+    def gene_in_tu_p(self, item):
+        """ A predicate that is True if item is a gene of some TU of the index. """
+        return frameid_key(item) in self._gene_code
+
+    def gene_p(self, item):
+        """ A predicate that is True if item is a gene of the PGDB, in a TU or not. """
+        return frameid_key(item) in self._all_genes
+
+    def _tu_codes_of_gene(self, gene):
+        g = self._gene_code.get(frameid_key(gene))
+        if g is None:
+            return self._gene_tus[0:0]
+        return self._gene_tus[self._gene_indptr[g]:self._gene_indptr[g+1]]
+
+    def _gene_codes_of_tu(self, tu):
+        t = self._tu_code.get(frameid_key(tu))
+        if t is None:
+            return self._tu_genes[0:0]
+        return self._tu_genes[self._tu_indptr[t]:self._tu_indptr[t+1]]
+
+    def transcription_unit_genes(self, tu):
+        """
+        Same as method transcription_unit_genes of class PGDB, answered locally.
+        """
+        return list(self._genes[self._gene_codes_of_tu(tu)])
+
+    def gene_transcription_units(self, gene):
+        """
+        Same as method gene_transcription_units of class PGDB, answered locally.
+        """
+        return list(self._tus[self._tu_codes_of_gene(gene)])
+
+    def cotranscribed_genes(self, gene):
+        """
+        Same as method cotranscribed_genes of class PGDB, answered locally.
+        The given gene is not part of the result.
+        """
+        gene = frameid_key(gene)
+        codes = [self._tu_genes[self._tu_indptr[t]:self._tu_indptr[t+1]] for t in self._tu_codes_of_gene(gene)]
+        if not codes:
+            return []
+        return [g for g in self._genes[np.unique(np.concatenate(codes))] if g != gene]
+
+    def operon_of_gene(self, gene):
+        """
+        Same as method operon_of_gene of class PGDB, answered locally.
+        """
+        g = self._gene_code.get(frameid_key(gene))
+        if g is None:
+            return []
+        return list(self._tus[self._operon_of_tu == self._gene_operon[g]])
+
+    def genes_in_same_operon(self, gene):
+        """
+        Same as method genes_in_same_operon of class PGDB, answered locally.
+        The given gene is not part of the result.
+        """
+        gene = frameid_key(gene)
+        g = self._gene_code.get(gene)
+        if g is None:
+            return []
+        return [x for x in self._genes[self._gene_operon == self._gene_operon[g]] if x != gene]
+
+    def operon_ids(self, genes):
+        """
+        Return the operon ids of a list of genes as a NumPy array, -1 for genes
+        that are in no TU. Genes of the same operon have the same operon id.
+        """
+        codes = np.array([self._gene_code.get(frameid_key(g), -1) for g in genes], dtype=np.int64)
+        return np.where(codes >= 0, self._gene_operon[np.maximum(codes, 0)], -1) if len(codes) else codes
+
+    def all_operons(self):
+        """
+        Same as method all_operons of class PGDB, answered locally.
+        """
+        order = np.argsort(self._operon_of_tu, kind='mergesort')
+        bounds = np.nonzero(np.diff(self._operon_of_tu[order]))[0] + 1
+        return [list(self._tus[group]) for group in np.split(order, bounds)] if len(order) else []
+
+    def _components_of_tu(self, tu, kind):
+        return list(self._components.get(frameid_key(tu), {}).get(kind, []))
+
+    def transcription_unit_promoter(self, tu):
+        """
+        Same as method transcription_unit_promoter of class PGDB, answered locally.
+        """
+        promoters = self._components_of_tu(tu, 'promoter')
+        return promoters[0] if promoters else None
+
+    def transcription_unit_terminators(self, tu):
+        """
+        Same as method transcription_unit_terminators of class PGDB, answered locally.
+        """
+        return self._components_of_tu(tu, 'terminator')
+
+    def transcription_unit_binding_sites(self, tu):
+        """
+        Same as method transcription_unit_binding_sites of class PGDB, answered locally.
+        """
+        return self._components_of_tu(tu, 'binding-site')
+
+    def transcription_units_of_promoter(self, promoter):
+        """
+        Same as method transcription_units_of_promoter of class PGDB, answered locally.
+        """
+        return list(self._tus_of_component.get(frameid_key(promoter), []))
+
+    def containing_tus(self, site):
+        """
+        Same as method containing_tus of class PGDB, answered locally.
+        """
+        site = frameid_key(site)
+        if site in self._tu_code:
+            return [site]
+        elif site in self._gene_code:
+            return self.gene_transcription_units(site)
+        else:
+            return list(self._tus_of_component.get(site, []))
+
+    def binding_sites_affecting_gene(self, gene):
+        """
+        Same as method binding_sites_affecting_gene of class PGDB, answered locally.
+        """
+        return unique([s for tu in self.gene_transcription_units(gene)
+                         for s in self._components_of_tu(tu, 'binding-site')])
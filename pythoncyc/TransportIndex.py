@@ -0,0 +1,217 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+This module defines class TransportIndex, a local index of the
+compartments of the reactions of a PGDB and of its transport reactions:
+
+   reaction -> compartments
+   reaction -> (compound, from compartment, to compartment)
+   (from compartment, to compartment) -> transport reactions -> transporters
+
+A transport reaction has a compound on one side in one compartment and on
+the other side in another compartment. The compartments come from the
+reaction network of the PGDB (see ReactionNetwork.py), so the substrates
+without a COMPARTMENT annotation are in the cytosol. The direction of a
+transport follows the direction of its reaction; it is left to right for
+the reversible reactions.
+
+Use method transport_index of class PGDB to create a TransportIndex. For example,
+
+    >>> ti = ecoli.transport_index()
+    >>> ti.transported_chemicals('TRANS-RXN-62', primary_only=True)
+    >>> ti.transporters_between('|CCO-PERI-BAC|', '|CCO-CYTOSOL|')
+    >>> ti.all_transported_chemicals(to_compartment='|CCO-CYTOSOL|')
+"""
+
+from PToolsIndex import np, require_scipy, frameid_key, as_list, first_value, unique
+
+# The compounds exchanged along with the primary transported compounds, the
+# same as the common exchangers of Pathway Tools for option primary_only of
+# transported-chemicals, documented as (PROTON NA CPD-1) in method
+# transported_chemicals of class PGDB. They are frame ids of MetaCyc, kept
+# as is so that both answer the same way on the PGDBs derived from MetaCyc.
+COMMON_EXCHANGERS = ['|PROTON|', '|NA+|', '|CPD-1|']
+
+# The compartments treated as the same one by the option loose.
+CYTOPLASM_COMPARTMENTS = ['|CCO-CYTOPLASM|', '|CCO-CYTOSOL|']
+
+class TransportIndex():
+    """
+    A local index of the compartments of the reactions and of the transport
+    reactions of a PGDB, built from its reaction network and two bulk requests
+    for the transporters: the enzymatic reactions of the transport reactions
+    and the enzymes of these.
+    """
+
+    def __init__(self, pgdb):
+        require_scipy('the transport index')
+        self._orgid = pgdb._orgid
+        network = pgdb.reaction_network()
+        reactions = network.reactions()
+        metabolites = network.metabolites()
+        directions = network.directions()
+        S = network.stoichiometric_matrix().tocsc()
+        self._rxn_code = dict((r, j) for j, r in enumerate(reactions))
+
+        # The compartments of the sides of the reactions, and the compounds
+        # found on the two sides in different compartments.
+        self._compartments_of_rxn = {}
+        rows = []
+        for j, rxn in enumerate(reactions):
+            column = S.getcol(j).tocoo()
+            left = [metabolites[i] for (i, c) in zip(column.row, column.data) if c < 0]
+            right = [metabolites[i] for (i, c) in zip(column.row, column.data) if c > 0]
+            self._compartments_of_rxn[rxn] = (sorted(set(c for (m, c) in left)), sorted(set(c for (m, c) in right)))
+            if len(set(c for (m, c) in left + right)) < 2:
+                continue
+            if directions[j] < 0:
+                (left, right) = (right, left)
+            for (cpd, fromCompartment) in left:
+                for (cpd2, toCompartment) in right:
+                    if cpd2 == cpd and toCompartment != fromCompartment:
+                        rows.append((rxn, cpd, fromCompartment, toCompartment))
+        self._columns = {}
+        for k, name in enumerate(['reaction', 'compound', 'from', 'to']):
+            self._columns[name] = np.array([row[k] for row in rows], dtype=object)
+        self._transport_rxns = unique([row[0] for row in rows])
+        self._exchanger = np.array([row[1] in COMMON_EXCHANGERS for row in rows], dtype=bool)
+
+        # The transporters: the enzymes of the transport reactions.
+        rxnData = pgdb.get_frames_slot_values(self._transport_rxns, ['ENZYMATIC-REACTION'])
+        enzrxnsOf = dict((r, [frameid_key(er) for er in as_list(rxnData.get(r, {}).get('enzymatic_reaction'))])
+                         for r in self._transport_rxns)
+        erData = pgdb.get_frames_slot_values(unique([er for ers in enzrxnsOf.values() for er in ers]), ['ENZYME'])
+        enzymeOf = dict((er, frameid_key(first_value(data.get('enzyme')))) for er, data in erData.iteritems())
+        self._transporters_of_rxn = dict((r, unique([enzymeOf[er] for er in enzrxnsOf[r] if enzymeOf.get(er)]))
+                                         for r in self._transport_rxns)
+        self._rxns_of_pair = {}
+        for (rxn, cpd, fromCompartment, toCompartment) in rows:
+            rxns = self._rxns_of_pair.setdefault((fromCompartment, toCompartment), [])
+            if not (rxn in rxns):
+                rxns.append(rxn)
+
+    def __repr__(self):
+        return '<TransportIndex '+self._orgid+', '+str(len(self._transport_rxns))+' transport reactions>'
+
+    def columns(self):
+        """
+        Return the transports as a dictionary of four NumPy arrays of the same length,
+        keyed by 'reaction', 'compound', 'from' and 'to'. Row i is one compound
+        transported by a reaction from a compartment to another one.
+        """
+        return dict((name, column.copy()) for name, column in self._columns.iteritems())
+
+    def transport_reactions(self):
+        """ Return the reactions with a compound on both sides in different compartments. """
+        return list(self._transport_rxns)
+
+    def compartments_of_reaction(self, rxn, sides=None):
+        """
+        Same as method compartments_of_reaction of class PGDB, without option
+        default_compartment, answered locally.
+        """
+        (left, right) = self._compartments_of_rxn.get(frameid_key(rxn), ([], []))
+        sides = [s.strip('|').upper() for s in as_list(sides)] if sides else ['LEFT', 'RIGHT']
+        return sorted(set((left if 'LEFT' in sides else []) + (right if 'RIGHT' in sides else [])))
+
+    def rxn_in_compartment_p(self, rxn, compartments, loose=None):
+        """
+        Same as method rxn_in_compartment_p of class PGDB, without options default_ok
+        and pwy, answered locally from the compartments of the substrates of rxn.
+        """
+        def normalize(c):
+            c = frameid_key(c)
+            return CYTOPLASM_COMPARTMENTS[0] if loose and c in CYTOPLASM_COMPARTMENTS else c
+        compartments = set(normalize(c) for c in as_list(compartments))
+        return any(normalize(c) in compartments for c in self.compartments_of_reaction(rxn))
+
+    def _select(self, rxn=None, primary_only=None, from_compartment=None, to_compartment=None):
+        """ The boolean mask of the rows of the columns matching the given filters. """
+        selected = np.ones(len(self._columns['reaction']), dtype=bool)
+        if rxn is not None:
+            selected &= self._columns['reaction'] == frameid_key(rxn)
+        if from_compartment is not None:
+            selected &= self._columns['from'] == frameid_key(from_compartment)
+        if to_compartment is not None:
+            selected &= self._columns['to'] == frameid_key(to_compartment)
+        # The common exchangers are removed only if other compounds are transported.
+        if primary_only and (selected & ~self._exchanger).any():
+            selected &= ~self._exchanger
+        return selected
+
+    def transported_chemicals(self, rxn, primary_only=None, from_compartment=None, to_compartment=None):
+        """
+        Same as method transported_chemicals of class PGDB, without options side
+        and show_compartment, answered locally.
+        """
+        return unique(list(self._columns['compound'][self._select(rxn, primary_only, from_compartment, to_compartment)]))
+
+    def transports_of_reaction(self, rxn):
+        """ Return the transports of a reaction as a list of triples (compound, from compartment, to compartment). """
+        selected = self._select(rxn)
+        return zip(self._columns['compound'][selected], self._columns['from'][selected], self._columns['to'][selected])
+
+    def all_transported_chemicals(self, from_compartment=None, to_compartment=None, primary_only=False):
+        """
+        Same as method all_transported_chemicals of class PGDB, answered locally.
+        """
+        selected = self._select(None, None, from_compartment, to_compartment)
+        if primary_only:
+            # The common exchangers are removed from the reactions that transport other compounds.
+            withPrimary = set(self._columns['reaction'][selected & ~self._exchanger])
+            selected &= ~(self._exchanger & np.array([r in withPrimary for r in self._columns['reaction']], dtype=bool))
+        return sorted(set(self._columns['compound'][selected]))
+
+    def compartment_pairs(self):
+        """ Return the pairs (from compartment, to compartment) of the transports. """
+        return sorted(self._rxns_of_pair)
+
+    def transport_reactions_between(self, compartment1, compartment2, directed=False):
+        """
+        Return the reactions transporting a compound from compartment1 to compartment2,
+        or in either direction if directed is False.
+        """
+        (c1, c2) = (frameid_key(compartment1), frameid_key(compartment2))
+        rxns = self._rxns_of_pair.get((c1, c2), [])
+        if not directed:
+            rxns = rxns + self._rxns_of_pair.get((c2, c1), [])
+        return sorted(set(rxns))
+
+    def transporters_of_reaction(self, rxn):
+        """ Return the enzymes of a transport reaction. """
+        return list(self._transporters_of_rxn.get(frameid_key(rxn), []))
+
+    def transporters_between(self, compartment1, compartment2, directed=False):
+        """
+        Return the transporters of the reactions transporting a compound from
+        compartment1 to compartment2, or in either direction if directed is False.
+        """
+        return sorted(set(e for r in self.transport_reactions_between(compartment1, compartment2, directed)
+                          for e in self._transporters_of_rxn[r]))
+
+    def all_transporters(self):
+        """
+        Same as method all_transporters_across of class PGDB with method
+        'reaction-compartments' for all membranes, answered locally.
+        """
+        return sorted(set(e for es in self._transporters_of_rxn.values() for e in es))
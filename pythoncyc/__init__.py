@@ -42,7 +42,10 @@ about how to use PythonCyc.
 """
 
 from PGDB import PGDB
-from PTools import sendQueryToPTools
+from PTools import sendQueryToPTools, host_pool_metrics, deadline, PToolsTimeout
+from FBA import FBAResult, run_fba_cached, clear_fba_cache
+from ECIndex import ec_lookup
+from Parallel import PresenceMatrix, map_orgids, presence_matrix
 
 def select_organism(orgid):
     """
@@ -83,7 +86,7 @@ def bv(query):
     """
     return biovelo(query)
 
-def run_fba(fileName):
+def run_fba(fileName, useCache=True):
     """
     The function run_fba does not need to have an organism selected before
     being used because the FBA input file provided as input can specify
@@ -92,5 +95,6 @@ def run_fba(fileName):
     For the documentation of this function, see method run_fba
     in file PGDB.py.
     """
-    return sendQueryToPTools('(python-run-fba "'+fileName+'")')
+    return run_fba_cached(fileName, lambda: sendQueryToPTools('(python-run-fba "'+fileName+'")'),
+                          useCache=useCache)
 
@@ -25,11 +25,27 @@ This module can be used to set various parameters for PythonCyc,
 in particular to set debug on or off, the host name and port number
 of the running Pathway Tools' Python server. By default, the Pathway Tools
 Python server is running locally on port 5008.
+
+Several running Pathway Tools serving the same PGDBs (on different
+machines or ports) can be set with function set_hosts. The queries are
+then routed to the host with the fewest outstanding queries, weighted by
+its measured latency (see class HostPool of PTools.py), except for the
+queries modifying a PGDB, which are all sent to the first host. With function
+set_hedging, a query that reads a PGDB and is slower than usual is sent
+again to another host, and the first answer is used.
+
+Some local indexes of PythonCyc (see PToolsIndex.py) can be saved in a
+local cache directory to avoid rebuilding them in every session. By
+default, there is no cache directory and nothing is saved.
 """
 
 _debug = False
 _hostname = "localhost"
 _hostport = 5008
+_hosts = []
+_hedging = False
+_hedge_percentile = 95
+_cache_dir = None
 
 def set_debug_on():
     """
@@ -59,3 +75,49 @@ def set_host_port(hostport):
     global _hostport
     _hostport = hostport
     print 'PythonCyc will communicate with Pathway Tools running on host port ',_hostport
+
+def set_hosts(hosts):
+    """
+     Set the pool of running Pathway Tools serving the same PGDBs, as a list of
+     pairs (host name, port) or of strings 'hostname:port'. An empty list uses
+     only the host name and port set by set_host_name and set_host_port.
+     The first host is the primary one: the queries that modify a PGDB (such as
+     put-slot-values and save-kb) or read a file of the server (python-run-fba)
+     are always sent to it, so the PGDBs of the other hosts must be updated
+     from it, e.g., by copying its saved PGDBs.
+    """
+    global _hosts
+    pairs = []
+    for host in hosts:
+        if isinstance(host, basestring):
+            (hostname, sep, port) = host.rpartition(':')
+            host = (hostname, int(port)) if sep else (port, _hostport)
+        pairs.append((host[0], int(host[1])))
+    _hosts = pairs
+    print 'PythonCyc will communicate with the Pathway Tools running on ',_hosts or [(_hostname, _hostport)]
+
+def set_hedging(on, percentile=95):
+    """
+     Turn on or off the hedging of the queries among the hosts set by set_hosts.
+     When on, a query that modifies no PGDB and has not answered after the given
+     percentile of the last latencies of its host is sent to another host too.
+    """
+    global _hedging, _hedge_percentile
+    _hedging = bool(on)
+    _hedge_percentile = percentile
+    if _hedging:
+        print 'PythonCyc will hedge the queries slower than percentile ',_hedge_percentile,' of their host.'
+    else:
+        print 'Hedging off.'
+
+def set_cache_dir(directory):
+    """
+     Set the directory where the local indexes that can be saved are kept
+     between sessions, or None to not save them.
+    """
+    global _cache_dir
+    _cache_dir = directory
+    if directory is None:
+        print 'PythonCyc will not save its local indexes.'
+    else:
+        print 'PythonCyc will save its local indexes in directory ',_cache_dir
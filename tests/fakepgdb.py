@@ -0,0 +1,87 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+A PGDB answering from Python dictionaries instead of a running Pathway Tools,
+to test the local indexes of PythonCyc.
+"""
+
+from pythoncyc.PGDB import PGDB
+
+def bars(frameid):
+    """ A frame id surrounded by vertical bars. """
+    return frameid if (frameid.startswith('|') and frameid.endswith('|')) else '|'+frameid+'|'
+
+class FakePGDB(PGDB):
+    """
+    A PGDB whose frames and classes are given as dictionaries.
+
+    Parms
+       frames, a dictionary of frame ids to dictionaries of slot names (e.g.,
+               'LEFT-END-POSITION') to values. A value of a slot read with its
+               annotations can be a list [value, annotation 1, annotation 2, ...].
+       classes, a dictionary of class names, surrounded by bars, to their instances.
+       hierarchy, a pair of dictionaries as returned by method get_class_hierarchy.
+       fns, a dictionary of Lisp function names to the Python functions called
+            with their arguments instead, or of 'query' to a function called
+            with each query sent by method sendPgdbQuery.
+    """
+
+    def __init__(self, frames, classes={}, hierarchy=({}, {}), fns={}, orgid='FAKE', host=None):
+        PGDB.__init__(self, orgid, validate=False, host=host)
+        self._db = dict((bars(frameid), slots) for (frameid, slots) in frames.iteritems())
+        self._classes = classes
+        self._hierarchy = hierarchy
+        self._fns = fns
+        # The names of the functions called, in order.
+        self._calls = []
+
+    def sendPgdbFnCall(self, fn, *args, **kwargs):
+        self._calls.append(fn)
+        if fn == 'gcai':
+            return list(self._classes.get(args[0]._name, []))
+        if fn == 'get-frame-objects':
+            return dict((s._name.strip('|'), self._db.get(bars(s._name), {})) for s in args[0])
+        if fn in self._fns:
+            return self._fns[fn](*args, **kwargs)
+        raise AssertionError('Unexpected call of '+fn)
+
+    def sendPgdbQuery(self, query, timeout=None):
+        self._calls.append('query')
+        if 'query' in self._fns:
+            return self._fns['query'](query)
+        raise AssertionError('Unexpected query '+query)
+
+    def get_frames_slot_value_annots(self, frameids, slotNames, labels, chunkSize=500):
+        def annotated(value):
+            return value if isinstance(value, list) else [value] + [None] * len(labels)
+        result = {}
+        for frameid in frameids:
+            slots = self._db.get(bars(frameid), {})
+            result[bars(frameid)] = dict((slot.lower().replace('-', '_'),
+                                          [annotated(v) for v in (slots.get(slot) or [])])
+                                         for slot in slotNames)
+        return result
+
+    def get_class_hierarchy(self, className):
+        return self._hierarchy
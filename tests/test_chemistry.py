@@ -0,0 +1,189 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of Chemistry.py on a small fake PGDB.
+"""
+
+import math
+import unittest
+
+from pythoncyc.Chemistry import parse_formula, hill_formula, net_charge
+from fakepgdb import FakePGDB
+
+# R1 is balanced, R2 misses two hydrogens, R3 misses a charge and
+# E of R4 has no formula.
+FRAMES = {
+    'R1': {'LEFT': [['F', 2, None], 'W'], 'RIGHT': ['A'], 'REACTION-DIRECTION': 'LEFT-TO-RIGHT'},
+    'R2': {'LEFT': ['A'], 'RIGHT': ['C'], 'REACTION-DIRECTION': 'LEFT-TO-RIGHT'},
+    'R3': {'LEFT': ['A'], 'RIGHT': ['D'], 'REACTION-DIRECTION': 'LEFT-TO-RIGHT'},
+    'R4': {'LEFT': ['A'], 'RIGHT': ['E'], 'REACTION-DIRECTION': 'LEFT-TO-RIGHT'},
+    'A':  {'CHEMICAL-FORMULA': {'|C|': [2], '|H|': [6], '|O|': [1]}},
+    'C':  {'CHEMICAL-FORMULA': [['C', 2], ['H', 4], ['O', 1]]},
+    'D':  {'CHEMICAL-FORMULA': {'|C|': [2], '|H|': [6], '|O|': [1]}, 'ATOM-CHARGES': [[3, -1]]},
+    'E':  {},
+    'F':  {'CHEMICAL-FORMULA': [['C', 1], ['H', 3]]},
+    'W':  {'CHEMICAL-FORMULA': {'|O|': [1]}},
+    }
+
+CLASSES = {'|Reactions|': ['R1', 'R2', 'R3', 'R4'],
+           '|Compounds|': ['A', 'C', 'D', 'E', 'F', 'W']}
+
+class FormulaTest(unittest.TestCase):
+
+    def test_parse_formula(self):
+        self.assertEqual(parse_formula({'|C|': [11], '|H|': [12]}), {'C': 11, 'H': 12})
+        self.assertEqual(parse_formula([['CL', 1], ['N', 2]]), {'Cl': 1, 'N': 2})
+        self.assertEqual(parse_formula('C11H12N2O2'), {'C': 11, 'H': 12, 'N': 2, 'O': 2})
+        self.assertEqual(parse_formula(None), {})
+
+    def test_hill_formula(self):
+        self.assertEqual(hill_formula({'O': 2, 'N': 2, 'H': 12, 'C': 11}), 'C11H12N2O2')
+        self.assertEqual(hill_formula({'O': 1, 'H': 2}), 'H2O')
+
+    def test_net_charge(self):
+        self.assertEqual(net_charge([[1, -1], [4, 1], [7, -1]]), -1)
+        self.assertEqual(net_charge({'2': [1]}), 1)
+        self.assertEqual(net_charge(None), 0)
+
+class ReactionBalancesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pgdb = FakePGDB(FRAMES, CLASSES)
+        self.balances = self.pgdb.reaction_balances()
+
+    def test_formula_index(self):
+        formulas = self.pgdb.formula_index()
+        self.assertEqual(formulas.elements(), ['C', 'H', 'O'])
+        self.assertEqual(formulas.formula('C'), {'C': 2, 'H': 4, 'O': 1})
+        self.assertEqual(formulas.formula('E'), None)
+        self.assertEqual((formulas.charge('D'), formulas.charge('A'), formulas.charge('X')), (-1, 0, None))
+
+    def test_unbalanced(self):
+        self.assertEqual(self.balances.reactions(), ['|R1|', '|R2|', '|R3|', '|R4|'])
+        self.assertEqual(list(self.balances._unbalanced(include_charge=True)), [False, True, True, False])
+        self.assertEqual(list(self.balances._unbalanced(include_charge=False)), [False, True, False, False])
+        self.assertEqual(self.balances.unbalanced_reactions(), ['|R2|', '|R3|'])
+        self.assertEqual(self.balances.unbalanced_reactions(include_charge=False), ['|R2|'])
+        self.assertEqual(self.balances.unknown_balance_reactions(), ['|R4|'])
+
+    def test_balanced_p(self):
+        self.assertEqual([self.balances.balanced_p(r) for r in ['R1', 'R2', 'R3', 'R4', 'R9']],
+                         [True, False, False, None, None])
+        self.assertTrue(self.balances.balanced_p('R3', include_charge=False))
+
+    def test_imbalance(self):
+        self.assertEqual(self.balances.imbalance('R1'), {})
+        self.assertEqual(self.balances.imbalance('R2'), {'H': -2.0})
+        self.assertEqual(self.balances.imbalance('R3'), {'charge': -1.0})
+        (matrix, known) = self.balances.imbalance_matrix()
+        self.assertEqual(self.balances.columns(), ['C', 'H', 'O', 'charge'])
+        self.assertEqual(matrix.shape, (4, 4))
+        self.assertEqual(list(known), [True, True, True, False])
+
+# The Gibbs free energies of formation of the compounds, but E, and R5 with a variable coefficient.
+GIBBS = {'A': -10, 'C': [2.5], 'D': 1.0, 'F': -3, 'W': 0.5}
+
+class ReactionGibbsTableTest(unittest.TestCase):
+
+    def setUp(self):
+        frames = dict((f, dict(slots, **({'GIBBS-0': GIBBS[f]} if f in GIBBS else {})))
+                      for (f, slots) in FRAMES.iteritems())
+        frames['R5'] = {'LEFT': ['A'], 'RIGHT': [['C', 'n', None]], 'REACTION-DIRECTION': 'LEFT-TO-RIGHT'}
+        classes = dict(CLASSES, **{'|Reactions|': CLASSES['|Reactions|'] + ['R5']})
+        self.gibbs = FakePGDB(frames, classes).reaction_gibbs_table()
+
+    def test_delta_g(self):
+        self.assertEqual(self.gibbs.delta_g('R1'), -10 - 2 * -3 - 0.5)
+        self.assertEqual(self.gibbs.delta_g('R2'), 2.5 - -10)
+        self.assertEqual(self.gibbs.delta_g('R3'), 1.0 - -10)
+        self.assertEqual((self.gibbs.delta_g('R4'), self.gibbs.delta_g('R5'), self.gibbs.delta_g('R9')), (None, None, None))
+
+    def test_table(self):
+        (reactions, deltaG, known) = self.gibbs.table()
+        self.assertEqual(list(reactions), ['|R1|', '|R2|', '|R3|', '|R4|', '|R5|'])
+        self.assertEqual(list(deltaG[:3]), [-4.5, 12.5, 11.0])
+        self.assertTrue(math.isnan(deltaG[3]) and math.isnan(deltaG[4]))
+        self.assertEqual(list(known), [True, True, True, False, False])
+
+    def test_missing_compounds(self):
+        self.assertEqual(self.gibbs.missing_compounds('R4'), ['|E|'])
+        self.assertEqual(self.gibbs.missing_compounds('R1'), [])
+        self.assertEqual(self.gibbs.substrate_gibbs('R4'), {'|A|': -10.0, '|E|': None})
+
+# RGRP has an element without mass.
+COMPOUNDS = {
+    'TRP':   {'CHEMICAL-FORMULA': 'C11H12N2O2'},
+    'D-TRP': {'CHEMICAL-FORMULA': [['C', 11], ['H', 12], ['N', 2], ['O', 2]]},
+    'GLC':   {'CHEMICAL-FORMULA': {'|C|': [6], '|H|': [12], '|O|': [6]}},
+    'FRU':   {'CHEMICAL-FORMULA': 'C6H12O6'},
+    'RGRP':  {'CHEMICAL-FORMULA': 'C2H5R'},
+    'WATER': {'CHEMICAL-FORMULA': 'H2O'},
+    }
+
+class MassIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pgdb = FakePGDB(COMPOUNDS, {'|Compounds|': sorted(COMPOUNDS)})
+        self.masses = self.pgdb.mass_index()
+
+    def test_mass(self):
+        self.assertAlmostEqual(self.masses.mass('TRP'), 204.08988, places=5)
+        self.assertAlmostEqual(self.masses.mass('|GLC|'), 180.06339, places=5)
+        self.assertAlmostEqual(self.masses.mass('WATER'), 18.0106, places=4)
+        self.assertEqual(self.masses.mass('RGRP'), None)
+
+    def test_search(self):
+        # 204.0908 is 4.5 ppm above TRP, 180.0650 is 8.9 ppm above GLC.
+        matches = self.masses.search([204.0908, 180.0650, 100.0], ppm=5)
+        self.assertEqual([c for (c, m, error) in matches[0]], ['|D-TRP|', '|TRP|'])
+        self.assertTrue(all(-5 < error < 0 for (c, m, error) in matches[0]))
+        self.assertEqual(matches[1:], [[], []])
+        matches = self.masses.search([180.0650], ppm=10)
+        self.assertEqual(sorted(c for (c, m, error) in matches[0]), ['|FRU|', '|GLC|'])
+        (starts, ends) = self.masses.search_ranges([18.0106, 204.0898, 500.0], ppm=5)
+        self.assertEqual(list(ends - starts), [1, 2, 0])
+
+    def test_search_in_daltons(self):
+        # A tolerance of 0.01 Da at 180.07 is about 55.5 ppm.
+        matches = self.masses.search([180.07], ppm=0.01 / 180.07 * 1e6)
+        self.assertEqual(sorted(c for (c, m, error) in matches[0]), ['|FRU|', '|GLC|'])
+        self.assertEqual(self.masses.search([180.08], ppm=0.01 / 180.08 * 1e6), [[]])
+
+    def test_compounds_of_formula(self):
+        self.assertEqual(sorted(self.masses.compounds_of_formula('C6H12O6')), ['|FRU|', '|GLC|'])
+        self.assertEqual(sorted(self.masses.compounds_of_formula({'O': 2, 'N': 2, 'C': 11, 'H': 12})),
+                         ['|D-TRP|', '|TRP|'])
+        self.assertEqual(self.masses.compounds_of_formula('C2H5R'), ['|RGRP|'])
+        self.assertEqual(self.masses.compounds_of_formula('CH4'), [])
+
+    def test_refresh(self):
+        self.pgdb._db['|WATER|'] = {'CHEMICAL-FORMULA': 'H2O2'}
+        self.assertAlmostEqual(self.pgdb.mass_index().mass('WATER'), 18.0106, places=4)
+        refreshed = self.pgdb.mass_index(refresh=True)
+        self.assertAlmostEqual(refreshed.mass('WATER'), 34.0055, places=4)
+        self.assertEqual(refreshed.compounds_of_formula('H2O2'), ['|WATER|'])
+        self.assertEqual(self.pgdb.formula_index().formula('WATER'), {'H': 2, 'O': 2})
+
+if __name__ == '__main__':
+    unittest.main()
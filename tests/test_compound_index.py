@@ -0,0 +1,145 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of CompoundIndex.py: the fingerprints, the Tanimoto similarity and the
+cache of the fingerprints.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pythoncyc import config
+from pythoncyc import CompoundIndex
+from fakepgdb import FakePGDB
+
+# Ethanol C-C-O, acetaldehyde C-C=O, methanol C-O, propanol C-C-C-O and benzene.
+COMPOUNDS = {
+    'ETOH':     {'STRUCTURE-ATOMS': ['C', 'C', 'O'], 'STRUCTURE-BONDS': [[1, 2, 1], [2, 3, 1]]},
+    'ACETALD':  {'STRUCTURE-ATOMS': ['|C|', '|C|', '|O|'], 'STRUCTURE-BONDS': [[1, 2, 1], [2, 3, 2]]},
+    'MEOH':     {'STRUCTURE-ATOMS': ['C', 'O'], 'STRUCTURE-BONDS': [[1, 2, 1]]},
+    'PROH':     {'STRUCTURE-ATOMS': ['C', 'C', 'C', 'O'], 'STRUCTURE-BONDS': [[1, 2, 1], [2, 3, 1], [3, 4, 1]]},
+    'BENZ':     {'STRUCTURE-ATOMS': ['C'] * 6, 'STRUCTURE-BONDS': [[i, i % 6 + 1, 1 + i % 2] for i in range(1, 7)]},
+    'NOSTRUCT': {},
+    }
+
+HOST = ('localhost', 5008)
+
+class CompoundIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.frames = dict((c, dict(slots)) for (c, slots) in COMPOUNDS.iteritems())
+        self.computed = []
+        self.fingerprint = CompoundIndex.fingerprint
+        def counting(atoms, bonds):
+            self.computed.append(atoms)
+            return self.fingerprint(atoms, bonds)
+        CompoundIndex.fingerprint = counting
+        config.set_cache_dir(None)
+
+    def tearDown(self):
+        CompoundIndex.fingerprint = self.fingerprint
+        config.set_cache_dir(None)
+        shutil.rmtree(self.dir)
+
+    def index(self, host=HOST, refresh=False):
+        """ Build the compound index, returning it and the number of fingerprints computed. """
+        del self.computed[:]
+        pgdb = FakePGDB(self.frames, {'|Compounds|': sorted(self.frames)}, host=host)
+        return (pgdb.compound_index(refresh=refresh), len(self.computed))
+
+    def test_structure_paths(self):
+        self.assertEqual(sorted(CompoundIndex.structure_paths(['C', 'C', 'O'], [[1, 2, 1], [2, 3, 2]])),
+                         ['C', 'C1C', 'C1C2O', 'C2O', 'O'])
+        self.assertEqual(sorted(CompoundIndex.structure_paths(['C', 'C', 'C'], [[1, 2, 1], [2, 3, 1]], maxBonds=1)),
+                         ['C', 'C1C'])
+
+    def test_fingerprint(self):
+        fp = self.fingerprint(['C', 'C', 'O'], [[1, 2, 1], [2, 3, 1]])
+        self.assertEqual((fp.dtype.name, len(fp)), ('uint8', CompoundIndex.NB_BITS // 8))
+        self.assertEqual(CompoundIndex.popcount_table()[fp].sum(), 5)
+        self.assertTrue((fp == self.fingerprint(['|C|', '|C|', '|O|'], [[3, 2, 1], [2, 1, 1]])).all())
+        (index, computed) = self.index()
+        self.assertTrue((index.fingerprint('ETOH') == fp).all())
+        self.assertEqual(index.fingerprint('NOSTRUCT'), None)
+        self.assertEqual(index.compounds(), ['|ACETALD|', '|BENZ|', '|ETOH|', '|MEOH|', '|PROH|'])
+
+    def test_tanimoto(self):
+        (index, computed) = self.index()
+        similarities = dict(zip(index.compounds(), index.tanimoto('ETOH')))
+        # ETOH has the paths C, O, C1C, C1O, C1C1O, of which MEOH has C, O, C1O.
+        self.assertEqual(similarities['|ETOH|'], 1.0)
+        self.assertAlmostEqual(similarities['|MEOH|'], 3 / 5.0)
+        self.assertAlmostEqual(similarities['|ACETALD|'], 3 / 7.0)
+        self.assertEqual(list(index.tanimoto('NOSTRUCT')), [0.0] * 5)
+        similar = index.similar_compounds('ETOH', k=3)
+        self.assertEqual([c for (c, s) in similar], ['|ETOH|', '|PROH|', '|MEOH|'])
+        self.assertAlmostEqual(similar[1][1], 5 / 7.0)
+        self.assertEqual(index.similar_compounds(index.fingerprint('BENZ'), k=10, threshold=0.5),
+                         [('|BENZ|', 1.0)])
+
+    def test_cache(self):
+        config.set_cache_dir(os.path.join(self.dir, 'cache'))
+        (index, computed) = self.index()
+        self.assertEqual(computed, 5)
+        self.assertEqual(os.listdir(os.path.join(self.dir, 'cache')), ['FAKE-compound-fingerprints.npz'])
+        (cached, computed) = self.index()
+        self.assertEqual(computed, 0)
+        self.assertEqual(cached.compounds(), index.compounds())
+        self.assertEqual(cached.similar_compounds('ETOH', k=3), index.similar_compounds('ETOH', k=3))
+        (index, computed) = self.index(refresh=True)
+        self.assertEqual(computed, 5)
+
+    def test_cache_changed_structure(self):
+        config.set_cache_dir(self.dir)
+        self.index()
+        self.frames['ETOH']['STRUCTURE-ATOMS'] = ['C', 'C', 'N']
+        (index, computed) = self.index()
+        self.assertEqual(computed, 5)
+        self.assertTrue(index.similar_compounds('ETOH', k=2)[1][1] < 0.5)
+        (index, computed) = self.index()
+        self.assertEqual(computed, 0)
+
+    def test_cache_other_host(self):
+        config.set_cache_dir(self.dir)
+        self.index()
+        (index, computed) = self.index(host=('otherhost', 5008))
+        self.assertEqual(computed, 5)
+        (index, computed) = self.index(host=('otherhost', 5008))
+        self.assertEqual(computed, 0)
+
+    def test_unwritable_cache(self):
+        # A cache directory below a file cannot be created.
+        fileName = os.path.join(self.dir, 'file')
+        open(fileName, 'w').close()
+        config.set_cache_dir(os.path.join(fileName, 'cache'))
+        (index, computed) = self.index()
+        self.assertEqual(len(index.compounds()), 5)
+        self.assertEqual(index.similar_compounds('ETOH', k=1), [('|ETOH|', 1.0)])
+        self.assertEqual(os.listdir(self.dir), ['file'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of ECIndex.py on a small fake PGDB.
+"""
+
+import unittest
+
+from pythoncyc.ECIndex import ec_components, ec_lookup
+from fakepgdb import FakePGDB
+
+# R2 has two EC numbers and two enzymes: the complex CPLX of P2 and P3, and P1.
+FRAMES = {
+    'R1':   {'EC-NUMBER': 'EC-1.1.1.1', 'ENZYMATIC-REACTION': 'ER1'},
+    'R2':   {'EC-NUMBER': ['EC-1.1.1.2', '|EC-2.7.1.-|'], 'ENZYMATIC-REACTION': ['ER2', 'ER3']},
+    'R3':   {'EC-NUMBER': 'EC-1.2.3.4'},
+    'R4':   {},
+    'ER1':  {'ENZYME': 'P1'},
+    'ER2':  {'ENZYME': 'CPLX'},
+    'ER3':  {'ENZYME': 'P1'},
+    'CPLX': {'COMPONENTS': ['P2', 'P3']},
+    'P1':   {'GENE': 'g1'},
+    'P2':   {'GENE': 'g2'},
+    'P3':   {'GENE': 'g3'},
+    }
+
+CLASSES = {'|Reactions|': ['R1', 'R2', 'R3', 'R4']}
+
+class ECIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FakePGDB(FRAMES, CLASSES).ec_index()
+
+    def test_ec_components(self):
+        self.assertEqual(ec_components('EC-1.1.1.-'), ['1', '1', '1'])
+        self.assertEqual(ec_components('|EC-2.7.1.5|'), ['2', '7', '1', '5'])
+        self.assertEqual(ec_components('EC 1.2'), ['1', '2'])
+        self.assertEqual(ec_components('-'), [])
+
+    def test_partial_lookups(self):
+        self.assertEqual(self.index.reactions_of_ec('1.1.1.-'), ['|R1|', '|R2|'])
+        self.assertEqual(self.index.reactions_of_ec('EC-1.1'), ['|R1|', '|R2|'])
+        self.assertEqual(self.index.reactions_of_ec('1.1.1'), ['|R1|', '|R2|'])
+        self.assertEqual(self.index.reactions_of_ec('EC-1'), ['|R1|', '|R2|', '|R3|'])
+        self.assertEqual(self.index.reactions_of_ec('1.1.1.1'), ['|R1|'])
+        self.assertEqual(self.index.reactions_of_ec('2.7.1.5'), [])
+        self.assertEqual(self.index.reactions_of_ec('9'), [])
+
+    def test_ec_numbers(self):
+        self.assertEqual(self.index.ec_numbers(), ['EC-1.1.1.1', 'EC-1.1.1.2', 'EC-1.2.3.4', 'EC-2.7.1'])
+        self.assertEqual(self.index.ec_numbers('1.1'), ['EC-1.1.1.1', 'EC-1.1.1.2'])
+        self.assertEqual(self.index.ec_numbers_of_reaction('R2'), ['EC-1.1.1.2', 'EC-2.7.1'])
+        self.assertEqual(self.index.ec_numbers_of_reaction('R4'), [])
+
+    def test_enzymes_and_genes(self):
+        self.assertEqual(self.index.enzymes_of_reaction('R2'), ['|CPLX|', '|P1|'])
+        self.assertEqual(self.index.enzymes_of_reaction('R3'), [])
+        self.assertEqual(self.index.genes_of_reaction('R2'), ['|g1|', '|g2|', '|g3|'])
+        self.assertEqual(self.index.enzymes_of_ec('1.1'), ['|P1|', '|CPLX|'])
+        self.assertEqual(self.index.genes_of_ec('1.1.1.1'), ['|g1|'])
+        self.assertEqual(self.index.genes_of_ec('2.7'), ['|g1|', '|g2|', '|g3|'])
+
+    def test_ec_lookup(self):
+        other = FakePGDB(FRAMES, {'|Reactions|': ['R3']}, orgid='OTHER').ec_index()
+        self.assertEqual(ec_lookup([self.index, other], '1.2'), {'FAKE': ['|R3|'], 'OTHER': ['|R3|']})
+        self.assertEqual(ec_lookup([self.index, other], '1.1', 'genes'),
+                         {'FAKE': ['|g1|', '|g2|', '|g3|'], 'OTHER': []})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of Enrichment.py, against SciPy and on a small fake PGDB.
+"""
+
+import unittest
+
+import numpy as np
+from scipy.stats import hypergeom
+
+from pythoncyc.Enrichment import hypergeometric_sf, benjamini_hochberg
+from fakepgdb import FakePGDB
+from test_pathway_index import INCIDENCE_FRAMES, all_pathways
+
+class HypergeometricTest(unittest.TestCase):
+
+    def test_against_scipy(self):
+        rng = np.random.RandomState(0)
+        (nbTotal, nbDrawn) = (600, 40)
+        sizes = rng.randint(0, 100, 200)
+        hits = np.array([rng.randint(0, min(size, nbDrawn) + 1) for size in sizes])
+        # The survival function of SciPy is P(X > k), hence hits - 1.
+        expected = hypergeom.sf(hits - 1, nbTotal, sizes, nbDrawn)
+        pvalues = hypergeometric_sf(hits, sizes, nbDrawn, nbTotal)
+        self.assertTrue(np.allclose(pvalues, expected, rtol=1e-8, atol=1e-300))
+
+    def test_bounds(self):
+        # No hit is certain, and more hits than the pathway size is impossible.
+        self.assertTrue(np.allclose(hypergeometric_sf([0, 3, 2], [2, 2, 2], 2, 10), [1, 0, 1.0 / 45]))
+        self.assertEqual(len(hypergeometric_sf([], [], 2, 10)), 0)
+
+class BenjaminiHochbergTest(unittest.TestCase):
+
+    def test_qvalues(self):
+        qvalues = benjamini_hochberg([0.01, 0.04, 0.03, 0.5])
+        self.assertTrue(np.allclose(qvalues, [0.04, 0.16 / 3, 0.16 / 3, 0.5]))
+        self.assertEqual(list(benjamini_hochberg([0.6, 0.9])), [0.9, 0.9])
+        self.assertEqual(len(benjamini_hochberg([])), 0)
+
+class PathwayEnrichmentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pgdb = FakePGDB(INCIDENCE_FRAMES, fns=all_pathways(['PWY1', 'PWY2', 'SUP', 'SUP2']))
+
+    def test_enrichment(self):
+        # zz is not in the background of the three genes of the pathways.
+        result = self.pgdb.pathway_enrichment(['g1', 'g2', 'zz'])
+        self.assertEqual((len(result), result.nb_genes, result.nb_background), (4, 2, 3))
+        self.assertEqual(list(result.hits), [2, 0, 2, 0])
+        self.assertEqual(list(result.sizes), [2, 1, 2, 0])
+        self.assertTrue(np.allclose(result.pvalues, [1.0 / 3, 1, 1.0 / 3, 1]))
+        self.assertTrue(np.allclose(result.qvalues, [2.0 / 3, 1, 2.0 / 3, 1]))
+        self.assertTrue(np.allclose(result.fold_enrichments, [1.5, 0, 1.5, 0]))
+        self.assertEqual([x[0] for x in result.significant(1.0)], ['|PWY1|', '|SUP|'])
+        self.assertEqual(result.significant(0.5), [])
+        self.assertEqual([x[0] for x in result.significant(0.5, use_qvalues=False)], ['|PWY1|', '|SUP|'])
+
+    def test_super_pathways_and_background(self):
+        result = self.pgdb.pathway_enrichment(['g3'], background=['g1', 'g3', 'g4'], include_super_pwys=True)
+        self.assertEqual((result.nb_genes, result.nb_background), (1, 3))
+        self.assertEqual(list(result.hits), [0, 1, 0, 1])
+        self.assertEqual(list(result.sizes), [1, 1, 1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of FBA.py: the parsing of the results of MetaFlux and their cache.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pythoncyc import FBA
+from fakepgdb import FakePGDB
+
+# A raw result of python-run-fba: R3 is an exchange reaction not in the model.
+RAW = [True, [], ['Parsed'], ':optimal', 1.5, 2, ['R1', 'R2'], [['R1', 2.0], [-1.0, 'R3']]]
+
+class FBATest(unittest.TestCase):
+
+    def setUp(self):
+        FBA.clear_fba_cache()
+        self.dir = tempfile.mkdtemp()
+        self.runs = []
+        self.pgdb = self.fba_pgdb(lambda fileName: RAW)
+
+    def tearDown(self):
+        FBA.clear_fba_cache()
+        shutil.rmtree(self.dir)
+
+    def fba_pgdb(self, runFn, orgid='ECOLI', host=('localhost', 5008)):
+        """ A PGDB counting its runs of python-run-fba in self.runs. """
+        def run(fileName):
+            self.runs.append(fileName)
+            return runFn(fileName)
+        return FakePGDB({}, fns={'python-run-fba': run}, orgid=orgid, host=host)
+
+    def fba_file(self, name, contents):
+        fileName = os.path.join(self.dir, name)
+        f = open(fileName, 'w')
+        f.write(contents)
+        f.close()
+        return fileName
+
+    def test_result_parsing(self):
+        result = self.pgdb.run_fba(self.fba_file('a.fba', 'a'))
+        self.assertTrue(isinstance(result, FBA.FBAResult))
+        self.assertEqual(list(result), RAW)
+        self.assertEqual((result.success, result.solver_status, result.biomass_flux, result.nb_cases),
+                         (True, ':optimal', 1.5, 2))
+        self.assertEqual(result.active_reactions, [('R1', 2.0), ('R3', -1.0)])
+        self.assertEqual(list(result.reactions), ['R1', 'R2', 'R3'])
+        self.assertEqual(list(result.fluxes), [2.0, 0.0, -1.0])
+        self.assertEqual(result.flux('R3'), -1.0)
+        self.assertEqual(result.flux('R9'), 0.0)
+        self.assertEqual(list(result.flux(['R9', 'R1'])), [0.0, 2.0])
+        (rxns, fluxes) = result.active_fluxes()
+        self.assertEqual((list(rxns), list(fluxes)), (['R1', 'R3'], [2.0, -1.0]))
+
+    def test_short_failed_result(self):
+        result = FBA.FBAResult([False, ['Syntax error']])
+        self.assertFalse(result.success)
+        self.assertEqual((result.errors, result.biomass_flux, result.active_reactions), (['Syntax error'], 0.0, []))
+        self.assertEqual(len(result.fluxes), 0)
+
+    def test_raw_result_not_a_list(self):
+        pgdb = self.fba_pgdb(lambda fileName: None)
+        fileName = self.fba_file('a.fba', 'a')
+        self.assertEqual(pgdb.run_fba(fileName), None)
+        self.assertEqual(pgdb.run_fba(fileName), None)
+        # Not cached.
+        self.assertEqual(len(self.runs), 2)
+
+    def test_failed_run_not_cached(self):
+        pgdb = self.fba_pgdb(lambda fileName: [False, ['Infeasible'], [], ':infeasible', 0.0, 0, [], []])
+        fileName = self.fba_file('a.fba', 'a')
+        self.assertFalse(pgdb.run_fba(fileName).success)
+        pgdb.run_fba(fileName)
+        self.assertEqual(len(self.runs), 2)
+
+    def test_cache_hit(self):
+        fileName = self.fba_file('a.fba', 'a')
+        first = self.pgdb.run_fba(fileName)
+        first.errors.append('modified')
+        first[1].append('modified')
+        second = self.pgdb.run_fba(fileName)
+        self.assertEqual(len(self.runs), 1)
+        self.assertFalse(first is second)
+        self.assertEqual((second.errors, second[1]), ([], []))
+        # The same contents under another file name.
+        self.pgdb.run_fba(self.fba_file('b.fba', 'a'))
+        self.assertEqual(len(self.runs), 1)
+        self.pgdb.run_fba(fileName, useCache=False)
+        self.assertEqual(len(self.runs), 2)
+
+    def test_cache_key(self):
+        fileName = self.fba_file('a.fba', 'a')
+        self.pgdb.run_fba(fileName)
+        # Another orgid, another host, other contents.
+        self.fba_pgdb(lambda fileName: RAW, orgid='META').run_fba(fileName)
+        self.fba_pgdb(lambda fileName: RAW, host=('other', 5008)).run_fba(fileName)
+        self.pgdb.run_fba(self.fba_file('a.fba', 'b'))
+        self.assertEqual(len(self.runs), 4)
+        self.assertEqual(FBA.fba_input_key(fileName, 'ECOLI', ('localhost', 5008))[:2], (('localhost', 5008), 'ECOLI'))
+        self.assertEqual(FBA.fba_input_key(os.path.join(self.dir, 'none.fba')), None)
+
+    def test_cache_eviction(self):
+        size = FBA.FBA_CACHE_SIZE
+        files = [self.fba_file('%d.fba' % i, str(i)) for i in range(size + 1)]
+        for fileName in files:
+            self.pgdb.run_fba(fileName)
+        self.assertEqual(len(FBA._fba_results), size)
+        # The least recently used result, the first one, was evicted.
+        self.pgdb.run_fba(files[size])
+        self.pgdb.run_fba(files[1])
+        self.assertEqual(len(self.runs), size + 1)
+        self.pgdb.run_fba(files[0])
+        self.assertEqual(len(self.runs), size + 2)
+        # files[1] was used recently, so files[2] was evicted by files[0].
+        self.pgdb.run_fba(files[1])
+        self.assertEqual(len(self.runs), size + 2)
+        self.pgdb.run_fba(files[2])
+        self.assertEqual(len(self.runs), size + 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of GenericReactionIndex.py on a small fake PGDB.
+"""
+
+import unittest
+
+from pythoncyc.PGDB import PGDB
+from fakepgdb import FakePGDB
+
+# Primary-Alcohols is a subclass of Alcohols, with ETOH and MEOH. GLYCEROL
+# is an instance of Alcohols.
+SUPERCLASSES = {'|Alcohols|': ['|Compounds|'],
+                '|Primary-Alcohols|': ['|Alcohols|'],
+                '|Aldehydes|': ['|Compounds|']}
+TYPES = {'|ETOH|': ['|Primary-Alcohols|'],
+         '|MEOH|': ['|Primary-Alcohols|'],
+         '|GLYCEROL|': ['|Alcohols|'],
+         '|NAD|': ['|Compounds|'],
+         '|NADH|': ['|Compounds|'],
+         '|ACETALD|': ['|Aldehydes|'],
+         '|FORMALDEHYDE|': ['|Aldehydes|']}
+
+# GEN and GEN2 are generic reactions. R1 is a specific form of both, R2 too
+# but written in reverse, R3 misses NAD, and R4 has the extra substrate ATP.
+FRAMES = {
+    'GEN':  {'LEFT': ['Alcohols', 'NAD'], 'RIGHT': ['Aldehydes', 'NADH']},
+    'GEN2': {'LEFT': ['Primary-Alcohols', 'NAD'], 'RIGHT': ['Aldehydes', 'NADH']},
+    'R1':   {'LEFT': ['ETOH', 'NAD'], 'RIGHT': ['ACETALD', 'NADH']},
+    'R2':   {'LEFT': ['FORMALDEHYDE', 'NADH'], 'RIGHT': ['MEOH', 'NAD']},
+    'R3':   {'LEFT': ['ETOH'], 'RIGHT': ['ACETALD']},
+    'R4':   {'LEFT': ['GLYCEROL', 'NAD', 'ATP'], 'RIGHT': ['ACETALD', 'NADH']},
+    }
+
+CLASSES = {'|Reactions|': ['GEN', 'GEN2', 'R1', 'R2', 'R3', 'R4']}
+
+class GenericReactionIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FakePGDB(FRAMES, CLASSES, hierarchy=(SUPERCLASSES, TYPES)).generic_reaction_index()
+
+    def test_classes(self):
+        self.assertEqual(self.index.compound_classes(), ['|Alcohols|', '|Aldehydes|', '|Compounds|', '|Primary-Alcohols|'])
+        self.assertEqual(self.index.members_of_class('Alcohols'), ['|ETOH|', '|GLYCEROL|', '|MEOH|'])
+        self.assertEqual(self.index.members_of_class('Alcohols', include_subclasses=True),
+                         ['|ETOH|', '|GLYCEROL|', '|MEOH|', '|Primary-Alcohols|'])
+        self.assertEqual(self.index.classes_of_compound('ETOH'), ['|Alcohols|', '|Compounds|', '|Primary-Alcohols|'])
+
+    def test_specific_forms(self):
+        self.assertEqual(self.index.generic_reactions(), ['|GEN2|', '|GEN|'])
+        # GEN2 is also a specific form of GEN, since Primary-Alcohols are Alcohols.
+        self.assertEqual(self.index.specific_forms_of_rxn('GEN'), ['|GEN2|', '|R1|', '|R2|'])
+        self.assertEqual(self.index.specific_forms_of_rxn('GEN2'), ['|R1|', '|R2|'])
+        self.assertEqual(self.index.nonspecific_forms_of_rxn('R1'), ['|GEN2|', '|GEN|'])
+        self.assertEqual(self.index.nonspecific_forms_of_rxn('R4'), [])
+        self.assertTrue(self.index.rxn_specific_form_of_rxn_p('R2', 'GEN'))
+        self.assertFalse(self.index.rxn_specific_form_of_rxn_p('R3', 'GEN'))
+
+    def test_substrates(self):
+        self.assertTrue(self.index.substrate_of_generic_rxn('ETOH', 'GEN'))
+        self.assertTrue(self.index.substrate_of_generic_rxn('GLYCEROL', 'GEN'))
+        self.assertFalse(self.index.substrate_of_generic_rxn('GLYCEROL', 'GEN2'))
+        self.assertFalse(self.index.substrate_of_generic_rxn('NAD', 'GEN'))
+
+    def test_expand_reactions(self):
+        self.assertEqual(self.index.expand_reactions(['GEN2', 'R3']), ['|GEN2|', '|R3|', '|R1|', '|R2|'])
+
+    def test_class_hierarchy_query(self):
+        queries = []
+        def query(q):
+            queries.append(q)
+            return [['A', ['B']], ['|C|', None]] if 'get-class-all-subs' in q else [['x', ['A']]]
+        # The query and parsing of the real method, which FakePGDB replaces.
+        self.assertEqual(PGDB.get_class_hierarchy(FakePGDB({}, fns={'query': query}), '|Compounds|'),
+                         ({'|A|': ['|B|'], '|C|': []}, {'|x|': ['|A|']}))
+        self.assertEqual(len(queries), 2)
+
+if __name__ == '__main__':
+    unittest.main()
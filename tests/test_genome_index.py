@@ -0,0 +1,177 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of GenomeIndex.py on a small fake PGDB.
+"""
+
+import unittest
+
+from pythoncyc.PToolsIndex import np
+from pythoncyc.GenomeIndex import _Intervals, cluster_ranks, gene_clusters_of_organisms
+from fakepgdb import FakePGDB
+
+# CHR is circular, of 7000 base pairs, PL is linear. TU1 has G1, G2, its
+# promoter PM1, its binding site BS1 and its terminator T1.
+FRAMES = {
+    'CHR': {'CIRCULAR?': True},
+    'PL':  {'CIRCULAR?': [False]},
+    'G1':  {'LEFT-END-POSITION': 100, 'RIGHT-END-POSITION': 200, 'TRANSCRIPTION-DIRECTION': '+',
+            'COMPONENT-OF': ['CHR', 'TU1']},
+    'G2':  {'LEFT-END-POSITION': [250], 'RIGHT-END-POSITION': 400, 'TRANSCRIPTION-DIRECTION': '+',
+            'COMPONENT-OF': ['CHR', 'TU1']},
+    'G3':  {'LEFT-END-POSITION': 1000, 'RIGHT-END-POSITION': 5000, 'COMPONENT-OF': ['CHR']},
+    'G4':  {'LEFT-END-POSITION': 6000, 'RIGHT-END-POSITION': 6900, 'COMPONENT-OF': ['CHR']},
+    'P1':  {'LEFT-END-POSITION': 10, 'RIGHT-END-POSITION': 20, 'COMPONENT-OF': ['PL']},
+    'P2':  {'LEFT-END-POSITION': 30, 'RIGHT-END-POSITION': 40, 'COMPONENT-OF': ['PL']},
+    'PM1': {'ABSOLUTE-PLUS-1-POS': 90, 'COMPONENT-OF': ['TU1']},
+    'BS1': {'ABS-CENTER-POS': 80, 'SITE-LENGTH': 10, 'COMPONENT-OF': ['TU1']},
+    'T1':  {'LEFT-END-POSITION': 401, 'RIGHT-END-POSITION': 420, 'COMPONENT-OF': ['TU1']},
+    }
+
+CLASSES = {'|Genetic-Elements|': ['CHR', 'PL'],
+           '|Transcription-Units|': ['TU1'],
+           '|Genes|': ['G1', 'G2', 'G3', 'G4', 'P1', 'P2'],
+           '|Promoters|': ['PM1'],
+           '|Terminators|': ['T1'],
+           '|DNA-Binding-Sites|': ['BS1']}
+
+CHR_LENGTH = 7000
+
+class IntervalsTest(unittest.TestCase):
+
+    def setUp(self):
+        # The long interval b starts well before the short ones overlapping 500.
+        self.intervals = _Intervals(['a', 'b', 'c', 'd', 'e'], [600, 10, 450, 490, 700],
+                                    [650, 1000, 480, 500, 700], ['x'] * 5)
+
+    def ids(self, a, b):
+        return list(self.intervals.ids[self.intervals.overlapping(a, b)])
+
+    def test_sorted(self):
+        self.assertEqual(list(self.intervals.ids), ['b', 'c', 'd', 'a', 'e'])
+        self.assertEqual(self.intervals.maxLength, 990)
+
+    def test_overlapping(self):
+        self.assertEqual(self.ids(500, 500), ['b', 'd'])
+        self.assertEqual(self.ids(481, 489), ['b'])
+        # The ends are included.
+        self.assertEqual(self.ids(650, 700), ['b', 'a', 'e'])
+        self.assertEqual(self.ids(1001, 2000), [])
+        self.assertEqual(self.ids(0, 9), [])
+        self.assertEqual(self.ids(0, 10000), ['b', 'c', 'd', 'a', 'e'])
+
+    def test_empty(self):
+        intervals = _Intervals([], [], [], [])
+        self.assertEqual((intervals.maxLength, len(intervals.overlapping(0, 100))), (0, 0))
+
+class GenomeIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FakePGDB(FRAMES, CLASSES).genome_index()
+
+    def test_locations(self):
+        self.assertEqual(self.index.replicons(), ['|CHR|', '|PL|'])
+        self.assertEqual(self.index.genes_of_replicon('CHR'), ['|G1|', '|G2|', '|G3|', '|G4|'])
+        self.assertEqual(self.index.location('G2'), ['|CHR|', 250, 400, '+'])
+        self.assertEqual(self.index.location('BS1'), ['|CHR|', 75, 85, None])
+        self.assertEqual(self.index.replicon_of('T1'), '|CHR|')
+
+    def test_neighbors(self):
+        self.assertEqual(self.index.next_gene_on_replicon('G4'), ['|G1|', None])
+        self.assertEqual(self.index.previous_gene_on_replicon('G1'), ['|G4|', None])
+        self.assertEqual(self.index.next_gene_on_replicon('P2'), [None, 'last'])
+        self.assertEqual(self.index.previous_gene_on_replicon('P1'), [None, 'first'])
+        self.assertTrue(self.index.adjacent_genes_p('G1', 'G4'))
+        self.assertFalse(self.index.neighboring_genes_p('G1', 'G3', 1))
+        self.assertEqual(self.index.gene_distance('G1', 'P1'), None)
+
+    def test_window(self):
+        self.assertEqual(self.index.features_in_window('CHR', 0, 260), ['|BS1|', '|PM1|', '|G1|', '|G2|'])
+        self.assertEqual(self.index.genes_in_window('CHR', 4000, 4000), ['|G3|'])
+        self.assertEqual(self.index.features_in_window('CHR', 0, 260, kinds=['promoter']), ['|PM1|'])
+        self.assertEqual(self.index.overlapping_features('G3'), [])
+        self.assertEqual(self.index.features_near('G2', 10), ['|T1|'])
+        self.assertEqual(self.index.features_near('G2', 50), ['|G1|', '|T1|'])
+
+    def test_window_across_origin(self):
+        # left > right on a circular replicon.
+        self.assertEqual(self.index.genes_in_window('CHR', 6500, 150), ['|G1|', '|G4|'])
+        self.assertEqual(self.index.genes_in_window('CHR', 6950, 50), [])
+        # A window past the end or before the start of the replicon, given its length.
+        self.assertEqual(self.index.genes_in_window('CHR', 6500, 7150, length=CHR_LENGTH), ['|G1|', '|G4|'])
+        self.assertEqual(self.index.genes_in_window('CHR', -500, 150, length=CHR_LENGTH), ['|G1|', '|G4|'])
+        self.assertEqual(self.index.genes_in_window('CHR', 6000, 14000, length=CHR_LENGTH),
+                         ['|G1|', '|G2|', '|G3|', '|G4|'])
+        self.assertEqual(self.index.features_near('G4', 200, length=CHR_LENGTH), ['|BS1|', '|PM1|', '|G1|'])
+        self.assertEqual(self.index.features_near('G4', 200), [])
+        # A linear replicon is not split.
+        self.assertEqual(self.index.genes_in_window('PL', 35, 15, length=50), [])
+
+    def test_transcription_units(self):
+        self.assertEqual(self.index.containing_tus('BS1'), ['|TU1|'])
+        self.assertEqual(self.index.containing_tus('TU1'), ['|TU1|'])
+        self.assertEqual(self.index.binding_sites_affecting_gene('G2'), ['|BS1|'])
+
+class GeneClustersTest(unittest.TestCase):
+
+    def test_cluster_ranks(self):
+        # Replicon 0 is circular with 100 genes, replicon 1 is linear with 10 genes.
+        clusters = cluster_ranks(np.array([0, 0, 0, 1, 1, -1, 0, 1]), np.array([0, 5, 99, 3, 4, 0, 97, 9]),
+                                 np.array([100, 10]), np.array([True, False]), 3)
+        # The genes of ranks 97, 99 and 0 are close across the origin of replicon 0.
+        self.assertEqual(clusters[0], clusters[2])
+        self.assertEqual(clusters[0], clusters[6])
+        self.assertEqual(clusters[3], clusters[4])
+        self.assertEqual(clusters[5], -1)
+        self.assertEqual(len(set(clusters[[0, 1, 3, 7]])), 4)
+        self.assertEqual(sorted(set(clusters)), [-1, 0, 1, 2, 3])
+
+    def test_cluster_ranks_not_wrapped(self):
+        # The first and last genes of a linear replicon, or too far apart, stay apart.
+        clusters = cluster_ranks(np.array([0, 0, 1, 1]), np.array([0, 9, 0, 9]), np.array([10, 20]),
+                                 np.array([False, True]), 3)
+        self.assertEqual(len(set(clusters)), 4)
+
+    def test_gene_clusters(self):
+        index = FakePGDB(FRAMES, CLASSES).genome_index()
+        (genes, clusters) = index.gene_clusters(['G1', 'G2', 'G4', 'P1', 'X'], max_gap=1)
+        self.assertEqual(list(genes), ['|G1|', '|G2|', '|G4|', '|P1|', '|X|'])
+        # G4 and G1 are the last and first genes of the circular CHR.
+        self.assertEqual(clusters[0], clusters[1])
+        self.assertEqual(clusters[0], clusters[2])
+        self.assertNotEqual(clusters[3], clusters[0])
+        self.assertEqual(clusters[4], -1)
+
+    def test_gene_clusters_of_organisms(self):
+        indexes = [FakePGDB(FRAMES, CLASSES, orgid=orgid).genome_index() for orgid in ['ORG1', 'ORG2']]
+        (orgids, genes, clusters) = gene_clusters_of_organisms(indexes, [['G1', 'G4'], ['G1', 'G4', 'P1']], max_gap=1)
+        self.assertEqual(list(orgids), ['ORG1'] * 2 + ['ORG2'] * 3)
+        self.assertEqual(list(genes), ['|G1|', '|G4|', '|G1|', '|G4|', '|P1|'])
+        self.assertEqual(clusters[0], clusters[1])
+        self.assertEqual(clusters[2], clusters[3])
+        # The clusters are unique across organisms.
+        self.assertEqual(len(set(clusters[[0, 2, 4]])), 3)
+
+if __name__ == '__main__':
+    unittest.main()
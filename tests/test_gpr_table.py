@@ -0,0 +1,99 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of GPRTable.py on a small fake PGDB.
+"""
+
+import math
+import unittest
+
+from fakepgdb import FakePGDB
+
+# R1 is catalyzed by the complex C1 of subunits A and B (AND), or by its
+# isozyme D (OR). R2 is catalyzed by C1 only, R3 by E3 without known gene,
+# R5 by Am, a modified form of A, and R4 has no enzyme.
+FRAMES = {
+    'R1':  {'ENZYMATIC-REACTION': ['ER1', 'ER2']},
+    'R2':  {'ENZYMATIC-REACTION': ['ER3']},
+    'R3':  {'ENZYMATIC-REACTION': ['ER4']},
+    'R4':  {},
+    'R5':  {'ENZYMATIC-REACTION': ['ER5']},
+    'ER1': {'ENZYME': ['C1']},
+    'ER2': {'ENZYME': ['D']},
+    'ER3': {'ENZYME': ['C1']},
+    'ER4': {'ENZYME': ['E3']},
+    'ER5': {'ENZYME': ['Am']},
+    'C1':  {'COMPONENTS': [['A', 2], ['B', 1]]},
+    'Am':  {'UNMODIFIED-FORM': ['A']},
+    'A':   {'GENE': ['gA']},
+    'B':   {'GENE': ['gB']},
+    'D':   {'GENE': ['gD']},
+    'E3':  {},
+    }
+
+CLASSES = {'|Reactions|': ['R1', 'R2', 'R3', 'R4', 'R5'],
+           '|Proteins|': ['C1', 'A', 'B', 'D', 'E3', 'Am'],
+           '|Polypeptides|': ['A', 'B', 'D', 'E3', 'Am']}
+
+class GPRTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table = FakePGDB(FRAMES, CLASSES).gpr_table()
+
+    def test_rules(self):
+        self.assertEqual(self.table.rule('R1'), [['|gA|', '|gB|'], ['|gD|']])
+        self.assertEqual(self.table.rule_string('R1'), '(|gA| and |gB|) or |gD|')
+        self.assertEqual(self.table.rule('R3'), [[]])
+        self.assertEqual(self.table.rule('R4'), [])
+        self.assertEqual(self.table.rule('R5'), [['|gA|']])
+        self.assertEqual(self.table.genes_of_reaction('R1'), ['|gA|', '|gB|', '|gD|'])
+        self.assertEqual(self.table.reactions_of_gene('gA'), ['|R1|', '|R2|', '|R5|'])
+        self.assertEqual(self.table.reactions_of_enzyme('C1'), ['|R1|', '|R2|'])
+
+    def test_knockout(self):
+        # A subunit of C1 blocks R2 but not R1, which still has its isozyme D.
+        self.assertEqual(self.table.knockout(['gA']), ['|R2|', '|R5|'])
+        self.assertEqual(self.table.knockout(['gB']), ['|R2|'])
+        self.assertEqual(self.table.knockout(['gD']), [])
+        self.assertEqual(self.table.knockout(['gB', 'gD']), ['|R1|', '|R2|'])
+        # R3, whose enzyme has no known gene, and R4, without enzyme, are never blocked.
+        self.assertEqual(self.table.knockout(['gA', 'gB', 'gD']), ['|R1|', '|R2|', '|R5|'])
+        self.assertEqual(list(self.table.reaction_activity([])), [True] * 5)
+
+    def test_single_knockouts(self):
+        self.assertEqual(self.table.genes(), ['|gA|', '|gB|', '|gD|'])
+        self.assertEqual(self.table.reactions(), ['|R1|', '|R2|', '|R3|', '|R4|', '|R5|'])
+        self.assertEqual(self.table.single_knockouts().toarray().tolist(),
+                         [[False, True, False, False, True],
+                          [False, True, False, False, False],
+                          [False, False, False, False, False]])
+
+    def test_reaction_expression(self):
+        expression = self.table.reaction_expression({'gA': 2.0, 'gB': 1.0, 'gD': 0.5})
+        # R1 is max(min(2, 1), 0.5).
+        self.assertEqual(list(expression[[0, 1, 4]]), [1.0, 1.0, 2.0])
+        self.assertTrue(math.isnan(expression[2]) and math.isnan(expression[3]))
+
+if __name__ == '__main__':
+    unittest.main()
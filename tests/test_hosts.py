@@ -0,0 +1,189 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+Tests of the routing of the queries among several running Pathway Tools
+(class HostPool of PTools.py): failover, hedging and deadlines. Each host
+is a small local server answering like the Python server of Pathway Tools,
+with the port of the host, after a delay depending on the query.
+
+Run with: python -m unittest discover tests
+"""
+
+import json
+import socket
+import threading
+import time
+import unittest
+import SocketServer
+
+from pythoncyc import config, PTools
+
+class FakePToolsServer(SocketServer.ThreadingTCPServer):
+    """
+    A local server answering each query with answer(query), by default
+    {'port': its port}, after delay(query) seconds.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay, answer=None):
+        SocketServer.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0), FakePToolsHandler)
+        self.delay = delay
+        self.answer = answer or (lambda query: {'port': self.host[1]})
+        self.queries = []
+        self.host = ('127.0.0.1', self.server_address[1])
+        thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05})
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class FakePToolsHandler(SocketServer.BaseRequestHandler):
+    def handle(self):
+        query = self.request.recv(65536)
+        self.server.queries.append(query)
+        time.sleep(self.server.delay(query))
+        body = json.dumps(self.server.answer(query))
+        try:
+            self.request.sendall('L' + ('%10d' % len(body)) + body)
+        except socket.error:
+            # The client gave up, e.g., at its deadline.
+            pass
+
+def dead_host():
+    """ A host where no server is listening. """
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    host = ('127.0.0.1', s.getsockname()[1])
+    s.close()
+    return host
+
+def slow_on(word, seconds):
+    """ A delay of seconds for the queries containing word, none for the others. """
+    return lambda query: seconds if word in query else 0.0
+
+class HostPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        config.set_hedging(False)
+        config.set_hosts([])
+        for server in self.servers:
+            server.stop()
+
+    def server(self, delay=lambda query: 0.0):
+        server = FakePToolsServer(delay)
+        self.servers.append(server)
+        return server
+
+    def prime(self, host, latency):
+        """ Give to host enough measured latencies to hedge its queries. """
+        pool = PTools.host_pool()
+        for k in range(PTools.HEDGE_MIN_SAMPLES):
+            pool.acquire(host=host)
+            pool.release(host, latency)
+
+    def test_failover_to_live_host(self):
+        dead = dead_host()
+        live = self.server()
+        config.set_hosts([dead, live.host])
+        for k in range(3):
+            self.assertEqual(PTools.sendQueryToPTools('(get-slot-value x y)')['port'], live.host[1])
+        metrics = PTools.host_pool_metrics()
+        self.assertEqual(metrics[dead]['failures'], 1)
+        self.assertEqual(metrics[live.host]['failures'], 0)
+        self.assertEqual(metrics[dead]['outstanding'] + metrics[live.host]['outstanding'], 0)
+
+    def test_all_hosts_dead(self):
+        config.set_hosts([dead_host(), dead_host()])
+        self.assertRaises(PTools.PToolsConnectionError, PTools.sendQueryToPTools, '(get-slot-value x y)')
+
+    def test_hedge_wins(self):
+        slow = self.server(slow_on('slow-fn', 2.0))
+        fast = self.server()
+        config.set_hosts([slow.host, fast.host])
+        config.set_hedging(True, 95)
+        # The slow host looks the fastest, so the query is sent to it first.
+        self.prime(slow.host, 0.01)
+        self.prime(fast.host, 0.02)
+        begin = time.time()
+        result = PTools.sendQueryToPTools('(slow-fn)')
+        self.assertEqual(result['port'], fast.host[1])
+        self.assertTrue(time.time() - begin < 1.0)
+        metrics = PTools.host_pool_metrics()
+        self.assertEqual(metrics[fast.host]['hedges'], 1)
+        self.assertEqual(metrics[fast.host]['hedge_wins'], 1)
+        self.assertEqual(metrics[slow.host]['hedges'], 0)
+        self.assertEqual(len(slow.queries), 1)
+
+    def test_no_hedge_before_enough_samples(self):
+        slow = self.server(slow_on('slow-fn', 0.3))
+        fast = self.server()
+        config.set_hosts([slow.host, fast.host])
+        config.set_hedging(True, 95)
+        self.assertEqual(PTools.sendQueryToPTools('(slow-fn)')['port'], slow.host[1])
+        self.assertEqual(len(fast.queries), 0)
+
+    def test_write_queries_not_hedged(self):
+        primary = self.server(slow_on('put-slot-value', 0.3))
+        other = self.server()
+        config.set_hosts([primary.host, other.host])
+        config.set_hedging(True, 50)
+        # The other host looks the fastest, but the writes go to the primary host.
+        self.prime(primary.host, 0.02)
+        self.prime(other.host, 0.01)
+        query = "(with-organism (:org-id 'ECOLI) (put-slot-value 'X 'Y 1))"
+        self.assertTrue(PTools.write_query_p(query))
+        self.assertEqual(PTools.sendQueryToPTools(query)['port'], primary.host[1])
+        self.assertEqual(len(other.queries), 0)
+        metrics = PTools.host_pool_metrics()
+        self.assertEqual(metrics[primary.host]['hedges'] + metrics[other.host]['hedges'], 0)
+        # A read goes to the fastest host.
+        self.assertEqual(PTools.sendQueryToPTools('(get-slot-value x y)')['port'], other.host[1])
+
+    def test_deadline_aborts_slow_query(self):
+        slow = self.server(slow_on('slow-fn', 2.0))
+        config.set_hosts([slow.host])
+        begin = time.time()
+        with PTools.deadline(0.2):
+            self.assertRaises(PTools.PToolsTimeout, PTools.sendQueryToPTools, '(slow-fn)')
+        self.assertTrue(time.time() - begin < 1.0)
+        self.assertEqual(PTools.current_deadline(), None)
+        metrics = PTools.host_pool_metrics()[slow.host]
+        self.assertEqual(metrics['outstanding'], 0)
+        self.assertEqual(metrics['failures'], 0)
+        # The same host answers the next query, without deadline.
+        self.assertEqual(PTools.sendQueryToPTools('(fast-fn)')['port'], slow.host[1])
+
+    def test_per_call_timeout(self):
+        slow = self.server(slow_on('slow-fn', 2.0))
+        config.set_hosts([slow.host])
+        self.assertRaises(PTools.PToolsTimeout, PTools.sendQueryToPTools, '(slow-fn)', timeout=0.2)
+        self.assertEqual(PTools.host_pool_metrics()[slow.host]['outstanding'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of ModulatorIndex.py on a small fake PGDB.
+"""
+
+import unittest
+
+from fakepgdb import FakePGDB
+
+# TRP inhibits ER1 allosterically and ER2, ATP activates ER1 and TRP
+# activates TRPR. The complex TRPR-TRP of TRPR and two TRP represses PM1.
+FRAMES = {
+    'REG1': {'REGULATOR': 'TRP', 'REGULATED-ENTITY': 'ER1', 'MODE': '-', 'MECHANISM': ['ALLOSTERIC'],
+             'PHYSIOLOGICALLY-RELEVANT?': True},
+    'REG2': {'REGULATOR': 'ATP', 'REGULATED-ENTITY': 'ER1', 'MODE': '+', 'MECHANISM': ':COMPETITIVE'},
+    'REG3': {'REGULATOR': 'TRP', 'REGULATED-ENTITY': 'ER2', 'MODE': '-'},
+    'REG4': {'REGULATOR': 'TRPR-TRP', 'REGULATED-ENTITY': 'PM1', 'MODE': '-'},
+    'REG5': {'REGULATOR': 'TRP', 'REGULATED-ENTITY': 'TRPR', 'MODE': '+'},
+    'TRPR-TRP': {'COMPONENTS': [['TRPR', 1], ['TRP', 2]]},
+    'TRPR': {'COMPONENTS': [['TRPR-MONO', 2]]},
+    }
+
+CLASSES = {'|Regulation|': ['REG1', 'REG2', 'REG3', 'REG4', 'REG5'],
+           '|Regulation-of-Enzyme-Activity|': ['REG1', 'REG2', 'REG3'],
+           '|Regulation-of-Transcription|': ['REG4'],
+           '|Proteins|': ['TRPR-TRP', 'TRPR', 'TRPR-MONO'],
+           '|Polypeptides|': ['TRPR-MONO']}
+
+class ModulatorIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FakePGDB(FRAMES, CLASSES).modulator_index()
+
+    def test_columns(self):
+        columns = self.index.columns()
+        self.assertEqual(list(columns['kind']), ['enzyme', 'enzyme', 'enzyme', 'transcription', 'other'])
+        self.assertEqual(list(columns['sign']), [-1, 1, -1, -1, 1])
+        self.assertEqual(list(columns['mechanisms'][:3]), [('ALLOSTERIC',), ('COMPETITIVE',), ()])
+        self.assertEqual(list(columns['phys_relevant']), [True, False, False, False, False])
+
+    def test_regulated_by(self):
+        self.assertEqual(self.index.regulated_by('TRP'), ['|ER1|', '|ER2|', '|TRPR|'])
+        self.assertEqual(self.index.regulated_by('TRP', kind='other'), ['|TRPR|'])
+        self.assertEqual(self.index.regulated_by_compound('TRP'), ['|ER1|', '|ER2|'])
+        self.assertEqual(self.index.regulated_by_compound('TRP', mode='-', mechanisms=['allosteric']), ['|ER1|'])
+        self.assertEqual(self.index.regulated_by_compound(['TRP', 'ATP'], phys_relevant=True), ['|ER1|'])
+        self.assertEqual(self.index.deactivated_or_inhibited_by_compound('ATP', mode='+', mechanisms='COMPETITIVE'),
+                         ['|ER1|'])
+
+    def test_modulators_of(self):
+        self.assertEqual(self.index.modulators_of('ER1'), ['|ATP|', '|TRP|'])
+        self.assertEqual(self.index.enzrxn_activators('ER1'), ['|ATP|'])
+        self.assertEqual(self.index.enzrxn_inhibitors('ER1'), ['|TRP|'])
+        self.assertEqual(self.index.enzrxn_inhibitors('ER2', phys_relevant_only=True), [])
+        self.assertEqual(self.index.modulators_of('PM1', mode='-'), ['|TRPR-TRP|'])
+        self.assertEqual(self.index.modulators_of('NOPE'), [])
+        self.assertEqual(self.index.all_modulators(), ['|ATP|', '|TRPR-TRP|', '|TRP|'])
+
+    def test_tfs_bound_to_compound(self):
+        self.assertEqual(self.index.tfs_bound_to_compound('TRP'), ['|TRPR-TRP|'])
+        self.assertEqual(self.index.tfs_bound_to_compound('ATP'), [])
+
+if __name__ == '__main__':
+    unittest.main()
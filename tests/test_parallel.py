@@ -0,0 +1,86 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+"""
+Tests of map_orgids and presence_matrix of Parallel.py, against a local
+server answering like the Python server of Pathway Tools.
+"""
+
+import re
+import time
+import unittest
+
+from pythoncyc import config, PTools, Parallel
+from test_hosts import FakePToolsServer
+
+# The pathways of each organism of the fake server.
+PATHWAYS = {'ECOLI': ['|PWY-1|', '|PWY-2|'], 'BSUB': ['|PWY-2|', '|PWY-3|'], 'META': []}
+
+def answer(query):
+    """ The answers of the fake server: the orgids, and the pathways of an organism. """
+    if query == '(all-orgids)':
+        return ['|' + o + '|' for o in sorted(PATHWAYS)]
+    orgid = re.search(r":org-id '\|?([^|)]+)\|?\)", query).group(1).upper()
+    if 'slow-fn' in query:
+        time.sleep(1.0)
+    return PATHWAYS[orgid]
+
+class ParallelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakePToolsServer(lambda query: 0.0, answer)
+        config.set_hosts([self.server.host])
+
+    def tearDown(self):
+        config.set_hosts([])
+        self.server.stop()
+
+    def test_orgids_with_and_without_bars(self):
+        results = dict(Parallel.map_orgids(lambda pgdb: pgdb.sendPgdbQuery('(all-pathways)'),
+                                           ['ECOLI', 'bsub', '|META|']))
+        self.assertEqual(results, {'ECOLI': PATHWAYS['ECOLI'], 'bsub': PATHWAYS['BSUB'], '|META|': []})
+
+    def test_unknown_orgid_raised_at_call(self):
+        # The error is raised by map_orgids itself, before the iterator is used.
+        self.assertRaises(PTools.PythonCycError, Parallel.map_orgids, 'all_pathways', ['ECOLI', 'NOPE'])
+        self.assertEqual(len(self.server.queries), 1)
+
+    def test_deadline_taken_at_call(self):
+        with PTools.deadline(0.2):
+            results = Parallel.map_orgids(lambda pgdb: pgdb.sendPgdbQuery('(slow-fn)'), ['ECOLI'])
+        begin = time.time()
+        self.assertRaises(PTools.PToolsTimeout, list, results)
+        self.assertTrue(time.time() - begin < 0.9)
+
+    def test_presence_matrix(self):
+        pm = Parallel.presence_matrix(['ECOLI', 'BSUB', 'META'], kind='pathways', workers=3)
+        self.assertEqual(pm.features, ['|PWY-1|', '|PWY-2|', '|PWY-3|'])
+        self.assertEqual(pm.matrix.toarray().astype(int).tolist(), [[1, 1, 0], [0, 1, 1], [0, 0, 0]])
+        self.assertEqual(pm.features_of('BSUB'), ['|PWY-2|', '|PWY-3|'])
+        self.assertEqual(pm.orgids_with('PWY-2'), ['ECOLI', 'BSUB'])
+        self.assertEqual(pm.orgids_with('PWY-9'), [])
+
+    def test_presence_matrix_unknown_kind(self):
+        self.assertRaises(PTools.PythonCycError, Parallel.presence_matrix, ['ECOLI'], kind='operons')
+
+if __name__ == '__main__':
+    unittest.main()
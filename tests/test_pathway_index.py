@@ -0,0 +1,153 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of PathwayIndex.py on a small fake PGDB.
+"""
+
+import unittest
+
+from fakepgdb import FakePGDB
+
+# PWY1: R1 -> R2 -> R3, and R4 alone. PWY2 has R3 -> R1 -> R5 and the cycle R5 <-> R6.
+# SUP is the super-pathway of PWY1 with R7 after it.
+TOPOLOGY_FRAMES = {
+    'PWY1': {'REACTION-LIST': ['R1', 'R2', 'R3', 'R4'], 'PREDECESSORS': [['R2', 'R1'], ['R3', 'R2'], 'R4']},
+    'PWY2': {'REACTION-LIST': ['R1', 'R3', 'R5', 'R6'],
+             'PREDECESSORS': [['R1', 'R3'], ['R5', 'R6'], ['R6', 'R5'], ['R5', 'R1']]},
+    'SUP':  {'REACTION-LIST': ['PWY1', 'R7'], 'PREDECESSORS': [['R7', 'PWY1']]},
+    'R1': {}, 'R2': {}, 'R3': {}, 'R4': {}, 'R5': {}, 'R6': {}, 'R7': {},
+    }
+
+# PWY1 (R1, R2) is a sub-pathway of SUP (R4), and SUP and PWY2 (R3) are the sub-pathways
+# of SUP2. The enzyme of ER1 is a complex of the products of g1 and g2.
+INCIDENCE_FRAMES = {
+    'PWY1': {'REACTION-LIST': ['R1', 'R2'], 'SUPER-PATHWAYS': 'SUP'},
+    'PWY2': {'REACTION-LIST': ['R3']},
+    'SUP':  {'REACTION-LIST': ['PWY1', 'R4'], 'SUPER-PATHWAYS': ['SUP2']},
+    'SUP2': {'SUB-PATHWAYS': ['SUP', 'PWY2']},
+    'R1': {'LEFT': ['A', 'an acceptor'], 'RIGHT': 'B', 'ENZYMATIC-REACTION': 'ER1'},
+    'R2': {'LEFT': 'B', 'RIGHT': ['C']},
+    'R3': {'LEFT': 'C', 'RIGHT': 'D', 'ENZYMATIC-REACTION': ['ER3']},
+    'R4': {'LEFT': 'D', 'RIGHT': 'E', 'ENZYMATIC-REACTION': 'ER1'},
+    'ER1': {'ENZYME': 'CPLX'},
+    'ER3': {'ENZYME': 'P3'},
+    'CPLX': {'COMPONENTS': ['P1', 'P2']},
+    'P1': {'GENE': 'g1'},
+    'P2': {'GENE': 'g2'},
+    'P3': {'GENE': 'g3'},
+    }
+
+def all_pathways(pathways):
+    return {'all-pathways': lambda *args, **kwargs: pathways}
+
+class PathwayTopologyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FakePGDB(TOPOLOGY_FRAMES, fns=all_pathways(['PWY1', 'PWY2', 'SUP'])).pathway_index()
+
+    def test_topological_order(self):
+        self.assertEqual(self.index.topological_order('PWY1'), ['|R1|', '|R4|', '|R2|', '|R3|'])
+        # The reactions on the cycle come last.
+        self.assertEqual(self.index.topological_order('PWY2'), ['|R3|', '|R1|', '|R5|', '|R6|'])
+        # A sub-pathway is not a reaction of its super-pathway.
+        self.assertEqual(self.index.topological_order('SUP'), ['|R7|'])
+        self.assertEqual(self.index.topological_order('NOPE'), [])
+
+    def test_start_and_end_reactions(self):
+        # R1 starts PWY1 and R3 ends it, but R3 starts PWY2.
+        self.assertEqual(self.index.get_predecessors('R1', 'PWY1'), [])
+        self.assertEqual(self.index.get_successors('R3', 'PWY1'), [])
+        self.assertEqual(self.index.get_predecessors('R3', 'PWY1'), ['|R2|'])
+        self.assertEqual(self.index.get_successors('R1', 'PWY1'), ['|R2|'])
+        self.assertEqual(self.index.get_predecessors('R3', 'PWY2'), [])
+        self.assertEqual(self.index.get_successors('R3', 'PWY2'), ['|R1|'])
+        self.assertEqual(self.index.get_predecessors('R5', 'PWY2'), ['|R1|', '|R6|'])
+        self.assertEqual(self.index.get_predecessors('R7', 'SUP'), [])
+        self.assertEqual(self.index.get_successors('R2', 'NOPE'), [])
+
+    def test_adjacency(self):
+        self.assertTrue(self.index.rxns_adjacent_in_pwy_p('R2', 'R1', 'PWY1'))
+        self.assertFalse(self.index.rxns_adjacent_in_pwy_p('R1', 'R3', 'PWY1'))
+        self.assertTrue(self.index.rxns_adjacent_in_pwy_p('R1', 'R3', 'PWY2'))
+        self.assertFalse(self.index.rxns_adjacent_in_pwy_p('R1', 'R7', 'PWY1'))
+
+    def test_components(self):
+        self.assertEqual(self.index.pathway_components('PWY1'), [[['|R1|', '|R2|', '|R3|'], ['|R4|']], 2, 4])
+        self.assertEqual(self.index.pathway_components('PWY2'), [[['|R3|', '|R1|', '|R5|', '|R6|']], 1, 4])
+        self.assertEqual(self.index.pathway_components('SUP'), [[['|R7|']], 1, 1])
+        self.assertEqual(self.index.pathway_components('NOPE'), [[], 0, 0])
+
+    def test_noncontiguous_pathways(self):
+        self.assertTrue(self.index.noncontiguous_pathway_p('PWY1'))
+        self.assertFalse(self.index.noncontiguous_pathway_p('PWY2'))
+        self.assertFalse(self.index.noncontiguous_pathway_p('NOPE'))
+        self.assertEqual(self.index.noncontiguous_pathways(), ['|PWY1|'])
+        self.assertEqual(FakePGDB({}, fns=all_pathways([])).pathway_index().noncontiguous_pathways(), [])
+
+class PathwayIncidenceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pgdb = FakePGDB(INCIDENCE_FRAMES, fns=all_pathways(['PWY1', 'PWY2', 'SUP', 'SUP2']))
+        self.index = self.pgdb.pathway_index()
+
+    def test_bulk_requests(self):
+        self.assertEqual(self.pgdb._calls, ['all-pathways'] + ['get-frame-objects'] * 5)
+
+    def test_rows_and_columns(self):
+        self.assertEqual(self.index.pathways(), ['|PWY1|', '|PWY2|', '|SUP|', '|SUP2|'])
+        self.assertEqual(self.index.items('reaction'), ['|R1|', '|R2|', '|R3|', '|R4|'])
+        self.assertEqual(self.index.items('enzrxn'), ['|ER1|', '|ER3|'])
+        self.assertEqual(self.index.items('gene'), ['|g1|', '|g2|', '|g3|'])
+        # 'an acceptor' is not a frame.
+        self.assertEqual(self.index.items('compound'), ['|A|', '|B|', '|C|', '|D|', '|E|'])
+
+    def test_incidence(self):
+        self.assertEqual(self.index.incidence('reaction').toarray().astype(int).tolist(),
+                         [[1, 0, 0, 0], [1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0]])
+        self.assertEqual(self.index.incidence('gene').toarray().astype(int).tolist(),
+                         [[1, 0, 1, 0], [1, 0, 1, 0], [0, 1, 0, 0]])
+        self.assertEqual(self.index.incidence('gene', True).toarray().astype(int).tolist(),
+                         [[1, 0, 1, 1], [1, 0, 1, 1], [0, 1, 0, 1]])
+        self.assertEqual(self.index.incidence('compound', True).toarray().astype(int).tolist(),
+                         [[1, 0, 1, 1], [1, 0, 1, 1], [1, 1, 1, 1], [0, 1, 1, 1], [0, 0, 1, 1]])
+
+    def test_pathways_of_items(self):
+        self.assertEqual(self.index.pathways_of_gene('g1'), ['|PWY1|', '|SUP|'])
+        self.assertEqual(self.index.pathways_of_gene('g1', True), ['|PWY1|', '|SUP|', '|SUP2|'])
+        self.assertEqual(self.index.pathways_of_gene('zz'), [])
+        self.assertEqual(self.index.pathways_of_compound('|C|'), ['|PWY1|', '|PWY2|'])
+        self.assertEqual(self.index.pathways_of_compound('C', True), ['|PWY1|', '|PWY2|', '|SUP|', '|SUP2|'])
+        self.assertEqual(self.index.pathways_of_enzrxn('ER3', True), ['|PWY2|', '|SUP2|'])
+        self.assertEqual(self.index.pathways_of_reaction('R4'), ['|SUP|'])
+
+    def test_items_of_pathways(self):
+        self.assertEqual(self.index.reactions_of_pathway('SUP'), ['|R4|'])
+        self.assertEqual(self.index.reactions_of_pathway('SUP2', True), ['|R1|', '|R2|', '|R3|', '|R4|'])
+        self.assertEqual(self.index.reactions_of_pathway('NOPE'), [])
+        self.assertEqual(self.index.genes_of_pathway('PWY1'), ['|g1|', '|g2|'])
+        self.assertEqual(self.index.genes_of_pathway('SUP2'), ['|g1|', '|g2|', '|g3|'])
+        self.assertEqual(self.index.compounds_of_pathway('SUP'), ['|A|', '|B|', '|C|', '|D|', '|E|'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of ProteinIndex.py on a small fake PGDB.
+"""
+
+import unittest
+
+from pythoncyc.PToolsIndex import np
+from pythoncyc.ProteinIndex import _follow
+from fakepgdb import FakePGDB
+
+# C2 = 2 C1 + RNA1 + ATP, C1 = 3 A + B, H = 4 A and C3 = 2 H.
+FRAMES = {
+    'C2': {'COMPONENTS': [['C1', 2], 'RNA1', ['ATP', []]]},
+    'C1': {'COMPONENTS': [['A', 3], ['B', 1]]},
+    'H':  {'COMPONENTS': [['A', 4]]},
+    'C3': {'COMPONENTS': [['H', 2]]},
+    'A':  {},
+    'B':  {},
+    }
+
+CLASSES = {'|Proteins|': ['C1', 'C2', 'H', 'C3', 'A', 'B'],
+           '|Polypeptides|': ['A', 'B'],
+           '|RNAs|': ['RNA1']}
+
+class ComplexCompositionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FakePGDB(FRAMES, CLASSES).protein_index()
+
+    def test_components(self):
+        self.assertEqual(self.index.components_of_protein('C2'), [('|C1|', 2), ('|RNA1|', 1), ('|ATP|', 1)])
+        self.assertEqual(self.index.components_of_protein('A'), [])
+
+    def test_base_components(self):
+        # The coefficients multiply through C1.
+        self.assertEqual(self.index.base_components_of_protein('C2'), [['|A|', '|B|', '|RNA1|'], [6, 2, 1]])
+        self.assertEqual(self.index.base_components_of_protein('C2', exclude_small_molecules=False),
+                         [['|A|', '|B|', '|RNA1|', '|ATP|'], [6, 2, 1, 1]])
+        self.assertEqual(self.index.base_components_of_protein('A'), [['|A|'], [1]])
+
+    def test_monomers(self):
+        self.assertEqual(self.index.monomers_of_protein('C2'), [['|A|', '|B|'], [6, 2]])
+        self.assertEqual(self.index.monomers_of_protein('C3'), [['|A|'], [8]])
+        self.assertEqual(self.index.monomers_of_protein('C3', coefficients=False), ['|A|'])
+
+    def test_containers(self):
+        self.assertEqual(self.index.containers_of('A'), ['|A|', '|C1|', '|C2|', '|C3|', '|H|'])
+        self.assertEqual(self.index.containers_of('A', exclude_self=True), ['|C1|', '|C2|', '|C3|', '|H|'])
+        self.assertEqual(self.index.top_containers('A'), ['|C2|', '|C3|'])
+        self.assertEqual(self.index.homomultimeric_containers_of('A', exclude_self=True), ['|C3|', '|H|'])
+        self.assertEqual(self.index.containers_of('Z'), [])
+
+# Am and Am2 are modified forms of A, AMg is A bound to MG. Xa and Xb are,
+# by mistake, the unmodified forms of each other, and Xc a modified form of Xb.
+FORMS = dict(FRAMES, **{
+    'Am':  {'UNMODIFIED-FORM': ['A']},
+    'Am2': {'UNMODIFIED-FORM': ['Am']},
+    'AMg': {'COMPONENTS': [['A', 1], ['MG', 1]]},
+    'Xa':  {'UNMODIFIED-FORM': ['Xb']},
+    'Xb':  {'UNMODIFIED-FORM': ['Xa']},
+    'Xc':  {'UNMODIFIED-FORM': ['Xb']},
+    })
+
+class ProteinFormsTest(unittest.TestCase):
+
+    def setUp(self):
+        classes = dict(CLASSES, **{'|Proteins|': CLASSES['|Proteins|'] + ['Am', 'Am2', 'AMg', 'Xa', 'Xb', 'Xc']})
+        self.index = FakePGDB(FORMS, classes).protein_index()
+
+    def test_follow(self):
+        # 1 -> 2 -> 3 -> 1 is a cycle, 4 ends its chain, 6 -> 5 -> 4.
+        self.assertEqual(list(_follow(np.array([1, 2, 3, 1, 4, 4, 5]))), [1, 1, 1, 1, 4, 4, 4])
+        self.assertEqual(list(_follow(np.array([0, 0, 1]))), [0, 0, 0])
+
+    def test_unmodified_forms(self):
+        self.assertEqual(self.index.unmodified_form('Am2'), '|A|')
+        self.assertEqual(self.index.unmodified_form('AMg'), '|AMg|')
+        self.assertEqual(self.index.unmodified_or_unbound_form('AMg'), '|A|')
+        self.assertEqual(self.index.modified_forms('A', exclude_self=True), ['|Am2|', '|Am|'])
+        self.assertEqual(self.index.modified_forms('Am'), ['|Am2|', '|Am|'])
+        self.assertEqual(list(self.index.reduce_modified_proteins(['Am2', 'AMg', 'B', 'Z'])), ['|A|', '|AMg|', '|B|', '|Z|'])
+        self.assertEqual(list(self.index.reduce_modified_proteins(['Am2', 'AMg', 'B'], debind=True)), ['|A|', '|B|'])
+
+    def test_cycle_of_unmodified_forms(self):
+        # The cycle and the chain leading to it end at the smallest code of the cycle, Xa.
+        self.assertEqual([self.index.unmodified_form(p) for p in ['Xa', 'Xb', 'Xc']], ['|Xa|'] * 3)
+        self.assertEqual(self.index.modified_and_unmodified_forms('Xc'), ['|Xa|', '|Xb|', '|Xc|'])
+        self.assertEqual(list(self.index.canonical_forms(['Xc', 'Xb'])), ['|Xa|', '|Xa|'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of ReactionNetwork.py on a small fake PGDB.
+"""
+
+import unittest
+
+from fakepgdb import FakePGDB
+
+CYT = '|CCO-CYTOSOL|'
+OUT = '|CCO-OUT|'
+
+# A is imported and B exported by EX1 and EX2. The cycle A -> B <-> C -> A is
+# not blocked. D is produced from A by R4 and consumed by R5, which produces E,
+# a dead end, so R5 and then R4 are blocked.
+FRAMES = {
+    'EX1': {'LEFT': [['A', None, 'CCO-OUT']], 'RIGHT': ['A'], 'REACTION-DIRECTION': 'LEFT-TO-RIGHT'},
+    'EX2': {'LEFT': ['B'], 'RIGHT': [['B', None, 'CCO-OUT']], 'REACTION-DIRECTION': 'LEFT-TO-RIGHT'},
+    'R1':  {'LEFT': ['A'], 'RIGHT': [['B', 2, None]], 'REACTION-DIRECTION': 'LEFT-TO-RIGHT',
+            'ENZYMATIC-REACTION': 'ER1', 'IN-PATHWAY': 'PWY1'},
+    'R2':  {'LEFT': ['B'], 'RIGHT': ['C'], 'REACTION-DIRECTION': 'REVERSIBLE', 'SPONTANEOUS?': True,
+            'IN-PATHWAY': ['PWY1']},
+    'R3':  {'LEFT': ['A'], 'RIGHT': ['C'], 'REACTION-DIRECTION': 'PHYSIOL-RIGHT-TO-LEFT', 'IN-PATHWAY': ['PWY1']},
+    'R4':  {'LEFT': ['A', 'an electron acceptor'], 'RIGHT': ['D'], 'REACTION-DIRECTION': 'LEFT-TO-RIGHT',
+            'ENZYMATIC-REACTION': ['ER4']},
+    'R5':  {'LEFT': ['D'], 'RIGHT': [['E', 'n', None]], 'REACTION-DIRECTION': 'LEFT-TO-RIGHT'},
+    'ER1': {'ENZYME': 'P1'},
+    'ER4': {'ENZYME': 'P4'},
+    'P1':  {'GENE': 'g1'},
+    'P4':  {'GENE': 'g4'},
+    'g1':  {'LEFT-END-POSITION': 10},
+    'g4':  {},
+    }
+
+CLASSES = {'|Reactions|': ['EX1', 'EX2', 'R1', 'R2', 'R3', 'R4', 'R5']}
+
+class ReactionNetworkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.network = FakePGDB(FRAMES, CLASSES).reaction_network()
+
+    def coefficient(self, cpd, compartment, rxn):
+        i = self.network.metabolites().index(('|'+cpd+'|', compartment))
+        j = self.network.reactions().index('|'+rxn+'|')
+        return self.network.stoichiometric_matrix()[i, j]
+
+    def test_stoichiometry(self):
+        self.assertEqual(self.network.reactions(), ['|EX1|', '|EX2|', '|R1|', '|R2|', '|R3|', '|R4|', '|R5|'])
+        self.assertEqual(len(self.network.metabolites()), 7)
+        self.assertEqual((self.coefficient('A', OUT, 'EX1'), self.coefficient('A', CYT, 'EX1')), (-1, 1))
+        self.assertEqual((self.coefficient('A', CYT, 'R1'), self.coefficient('B', CYT, 'R1')), (-1, 2))
+        self.assertEqual(self.coefficient('B', CYT, 'R3'), 0)
+        self.assertEqual(self.network.substrates_of_reaction('R1'),
+                         [[(('|A|', CYT), 1.0)], [(('|B|', CYT), 2.0)]])
+        self.assertEqual(self.network.substrates_of_reaction('R9'), [[], []])
+        self.assertEqual(self.network.substrate_matrix().sum(), 14)
+
+    def test_compartments(self):
+        self.assertEqual(self.network.compartments(), [CYT, OUT])
+        self.assertTrue(('|B|', OUT) in self.network.metabolites())
+
+    def test_directions(self):
+        self.assertEqual(list(self.network.directions()), [1, 1, 1, 0, -1, 1, 1])
+
+    def test_incomplete_and_variable(self):
+        self.assertTrue(self.network.incomplete_substrates_p('R4'))
+        self.assertFalse(self.network.incomplete_substrates_p('R1'))
+        self.assertTrue(self.network.variable_stoichiometry_p('|R5|'))
+        self.assertFalse(self.network.variable_stoichiometry_p('R1'))
+
+    def test_dead_ends(self):
+        self.assertEqual(self.network.dead_end_metabolites(), [('|E|', CYT)])
+        self.assertEqual(self.network.dead_end_metabolites(OUT), [])
+        self.assertEqual(sorted(self.network.dead_end_metabolites(boundary=[])),
+                         [('|A|', OUT), ('|B|', OUT), ('|E|', CYT)])
+
+    def test_blocked_reactions(self):
+        self.assertEqual(self.network.blocked_reactions(), ['|R4|', '|R5|'])
+        # Without exchanges, only the cycle A -> B <-> C -> A is left.
+        self.assertEqual(self.network.blocked_reactions(boundary=[]), ['|EX1|', '|EX2|', '|R4|', '|R5|'])
+
+    def test_orphans_and_holes(self):
+        self.assertEqual(self.network.orphan_reactions(), ['|EX1|', '|EX2|', '|R3|', '|R4|', '|R5|'])
+        self.assertFalse(self.network.orphan_p('R2'))
+        self.assertEqual(self.network.pathway_holes(), ['|R3|'])
+        gaps = self.network.gap_analysis()
+        self.assertEqual((gaps['dead_end_metabolites'], gaps['blocked_reactions']), ([('|E|', CYT)], ['|R4|', '|R5|']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of RegulationIndex.py and TranscriptionUnitIndex.py on a small fake PGDB.
+"""
+
+import unittest
+
+from fakepgdb import FakePGDB
+
+# The complex cA of pA, encoded by gA, activates TU1 (gB, gC) through its
+# promoter PM1. pB, encoded by gB, represses TU2 (gD). gZ is in no
+# transcription unit and is repressed by pA directly.
+FRAMES = {
+    'TU1': {'COMPONENTS': ['gB', 'gC', 'PM1']},
+    'TU2': {'COMPONENTS': ['gD', 'PM2']},
+    'TU3': {'COMPONENTS': ['gA']},
+    'R1':  {'REGULATOR': 'cA', 'REGULATED-ENTITY': 'PM1', 'MODE': '+'},
+    'R2':  {'REGULATOR': 'pB', 'REGULATED-ENTITY': ['TU2'], 'MODE': ['-']},
+    'R3':  {'REGULATOR': 'pA', 'REGULATED-ENTITY': 'gZ', 'MODE': '-'},
+    'cA':  {'COMPONENTS': ['pA', 'CPD']},
+    'pA':  {'GENE': 'gA'},
+    'pB':  {'GENE': 'gB'},
+    }
+
+CLASSES = {'|Genes|': ['gA', 'gB', 'gC', 'gD', 'gZ'],
+           '|Transcription-Units|': ['TU1', 'TU2', 'TU3'],
+           '|Promoters|': ['PM1', 'PM2'],
+           '|Regulation-of-Transcription|': ['R1', 'R2', 'R3']}
+
+class RegulationIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FakePGDB(FRAMES, CLASSES).regulation_index()
+
+    def test_direct_regulation(self):
+        self.assertEqual(self.index.genes_regulated_by_gene('gA'), ['|gB|', '|gC|', '|gZ|'])
+        self.assertEqual(self.index.genes_regulating_gene('gD'), ['|gB|'])
+        self.assertEqual(self.index.genes_regulated_by_protein('cA'), ['|gB|', '|gC|'])
+        self.assertEqual(self.index.regulon_of_protein('cA'), ['|TU1|'])
+        self.assertEqual(self.index.regulators_of_gene_transcription('gC', by_function=True), [['|cA|'], []])
+        self.assertTrue(self.index.activation_p('R1'))
+        self.assertTrue(self.index.inhibition_p('R2'))
+
+    def test_gene_in_no_transcription_unit(self):
+        self.assertEqual(self.index.genes_regulating_gene('gZ'), ['|gA|'])
+        self.assertEqual(self.index.regulation_frames_of_gene('gZ'), ['|R3|'])
+        # The regulon of pA, through its complex cA, only has transcription units.
+        self.assertEqual(self.index.regulon_of_protein('pA'), ['|TU1|'])
+
+    def test_signed_closure(self):
+        # gA activates gB which represses gD, and gA represses gZ.
+        self.assertEqual(self.index.all_genes_regulated_by('gA'), ['|gB|', '|gC|', '|gD|', '|gZ|'])
+        self.assertEqual(self.index.all_genes_regulated_by('gA', '+'), ['|gB|', '|gC|'])
+        self.assertEqual(self.index.all_genes_regulated_by('gA', '-'), ['|gD|', '|gZ|'])
+        self.assertEqual(self.index.all_genes_regulated_by('pB', '-'), ['|gD|'])
+        self.assertTrue(self.index.regulates_p('gA', 'gD', '-'))
+        self.assertFalse(self.index.regulates_p('gA', 'gD', '+'))
+        self.assertFalse(self.index.regulates_p('gD', 'gA'))
+
+    def test_unknown_sign(self):
+        # A regulation of gA of unknown sign by pD, encoded by gD, closes a cycle
+        # acting both ways.
+        frames = dict(FRAMES, R4={'REGULATOR': 'pD', 'REGULATED-ENTITY': 'TU3'}, pD={'GENE': 'gD'})
+        classes = dict(CLASSES, **{'|Regulation-of-Transcription|': ['R1', 'R2', 'R3', 'R4']})
+        index = FakePGDB(frames, classes).regulation_index()
+        self.assertEqual(index.all_genes_regulated_by('gA', '+'), ['|gA|', '|gB|', '|gC|', '|gD|', '|gZ|'])
+        self.assertTrue(index.regulates_p('gD', 'gZ', '+') and index.regulates_p('gD', 'gZ', '-'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of TranscriptionUnitIndex.py on a small fake PGDB.
+"""
+
+import unittest
+
+from fakepgdb import FakePGDB
+
+# TU1, TU4 and TU5 form one operon since TU1 and TU4 share gC, and TU4
+# and TU5 share gE. gG is in no transcription unit.
+FRAMES = {
+    'TU1': {'COMPONENTS': ['gB', 'gC', 'PM1']},
+    'TU2': {'COMPONENTS': ['gD', 'PM2']},
+    'TU3': {'COMPONENTS': ['gA']},
+    'TU4': {'COMPONENTS': ['gC', 'gE', 'T1', 'BS1']},
+    'TU5': {'COMPONENTS': ['gE', 'gF', 'PM2']},
+    }
+
+CLASSES = {'|Genes|': ['gA', 'gB', 'gC', 'gD', 'gE', 'gF', 'gG'],
+           '|Transcription-Units|': ['TU1', 'TU2', 'TU3', 'TU4', 'TU5'],
+           '|Promoters|': ['PM1', 'PM2'],
+           '|Terminators|': ['T1'],
+           '|DNA-Binding-Sites|': ['BS1']}
+
+class TranscriptionUnitIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FakePGDB(FRAMES, CLASSES).transcription_unit_index()
+
+    def test_genes(self):
+        self.assertEqual(self.index.transcription_unit_genes('TU4'), ['|gC|', '|gE|'])
+        self.assertEqual(self.index.gene_transcription_units('gC'), ['|TU1|', '|TU4|'])
+        self.assertEqual(self.index.cotranscribed_genes('gC'), ['|gB|', '|gE|'])
+        self.assertEqual(self.index.gene_transcription_units('gG'), [])
+        self.assertTrue(self.index.gene_p('gG'))
+        self.assertFalse(self.index.gene_in_tu_p('gG'))
+        self.assertTrue(self.index.transcription_unit_p('TU5'))
+
+    def test_operons(self):
+        self.assertEqual(self.index.operon_of_gene('gB'), ['|TU1|', '|TU4|', '|TU5|'])
+        self.assertEqual(self.index.genes_in_same_operon('gF'), ['|gB|', '|gC|', '|gE|'])
+        self.assertEqual(self.index.operon_of_gene('gG'), [])
+        self.assertEqual(sorted(self.index.all_operons()), [['|TU1|', '|TU4|', '|TU5|'], ['|TU2|'], ['|TU3|']])
+        ids = self.index.operon_ids(['gB', 'gF', 'gD', 'gG', 'gZ'])
+        self.assertEqual(ids[0], ids[1])
+        self.assertNotEqual(ids[0], ids[2])
+        self.assertEqual(list(ids[3:]), [-1, -1])
+
+    def test_components(self):
+        self.assertEqual(self.index.transcription_unit_promoter('TU1'), '|PM1|')
+        self.assertEqual(self.index.transcription_unit_promoter('TU3'), None)
+        self.assertEqual(self.index.transcription_unit_terminators('TU4'), ['|T1|'])
+        self.assertEqual(self.index.transcription_unit_binding_sites('TU4'), ['|BS1|'])
+        self.assertEqual(self.index.transcription_units_of_promoter('PM2'), ['|TU2|', '|TU5|'])
+        self.assertEqual(self.index.containing_tus('PM1'), ['|TU1|'])
+        self.assertEqual(self.index.containing_tus('gE'), ['|TU4|', '|TU5|'])
+        self.assertEqual(self.index.binding_sites_affecting_gene('gC'), ['|BS1|'])
+        self.assertEqual(self.index.binding_sites_affecting_gene('gB'), [])
+
+if __name__ == '__main__':
+    unittest.main()
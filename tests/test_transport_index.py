@@ -0,0 +1,91 @@
+# Copyright (c) 2014, SRI International
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ----------------------------------------------------------------------
+
+
+"""
+Tests of TransportIndex.py on a small fake PGDB.
+"""
+
+import unittest
+
+from fakepgdb import FakePGDB
+
+CYT = '|CCO-CYTOSOL|'
+OUT = '|CCO-OUT|'
+PERI = '|CCO-PERI-BAC|'
+
+# R0 imports A with a proton, R5 only imports a proton, R6 imports G from the
+# periplasm although written from the cytosol, and R1 is not a transport.
+FRAMES = {
+    'R0':  {'LEFT': [['A', None, 'CCO-OUT'], ['PROTON', None, 'CCO-OUT']], 'RIGHT': ['A', 'PROTON'],
+            'REACTION-DIRECTION': 'LEFT-TO-RIGHT', 'ENZYMATIC-REACTION': 'ER0'},
+    'R1':  {'LEFT': ['A'], 'RIGHT': [['B', 2, None]]},
+    'R5':  {'LEFT': [['PROTON', None, 'CCO-OUT']], 'RIGHT': ['PROTON']},
+    'R6':  {'LEFT': ['G'], 'RIGHT': [['G', None, 'CCO-PERI-BAC']], 'REACTION-DIRECTION': 'RIGHT-TO-LEFT',
+            'ENZYMATIC-REACTION': ['ER6', 'ER7']},
+    'ER0': {'ENZYME': 'P0'},
+    'ER6': {'ENZYME': 'P6'},
+    'ER7': {'ENZYME': 'P7'},
+    }
+
+CLASSES = {'|Reactions|': ['R0', 'R1', 'R5', 'R6']}
+
+class TransportIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = FakePGDB(FRAMES, CLASSES).transport_index()
+
+    def test_transports(self):
+        self.assertEqual(self.index.transport_reactions(), ['|R0|', '|R5|', '|R6|'])
+        self.assertEqual(sorted(self.index.transports_of_reaction('R0')), [('|A|', OUT, CYT), ('|PROTON|', OUT, CYT)])
+        # The direction of R6 is followed.
+        self.assertEqual(self.index.transports_of_reaction('R6'), [('|G|', PERI, CYT)])
+        self.assertEqual(self.index.transports_of_reaction('R1'), [])
+
+    def test_compartments(self):
+        self.assertEqual(self.index.compartments_of_reaction('R0'), [CYT, OUT])
+        self.assertEqual(self.index.compartments_of_reaction('R0', sides=['LEFT']), [OUT])
+        self.assertEqual(self.index.compartments_of_reaction('R1'), [CYT])
+        self.assertFalse(self.index.rxn_in_compartment_p('R1', ['CCO-CYTOPLASM']))
+        self.assertTrue(self.index.rxn_in_compartment_p('R1', ['CCO-CYTOPLASM'], loose=True))
+        self.assertEqual(self.index.compartment_pairs(), [(OUT, CYT), (PERI, CYT)])
+        self.assertEqual(self.index.transport_reactions_between('CCO-CYTOSOL', 'CCO-OUT'), ['|R0|', '|R5|'])
+        self.assertEqual(self.index.transport_reactions_between('CCO-CYTOSOL', 'CCO-OUT', directed=True), [])
+
+    def test_common_exchangers(self):
+        self.assertEqual(self.index.transported_chemicals('R0'), ['|A|', '|PROTON|'])
+        self.assertEqual(self.index.transported_chemicals('R0', primary_only=True), ['|A|'])
+        # A proton transported alone is kept.
+        self.assertEqual(self.index.transported_chemicals('R5', primary_only=True), ['|PROTON|'])
+        self.assertEqual(self.index.all_transported_chemicals(primary_only=True), ['|A|', '|G|', '|PROTON|'])
+        self.assertEqual(self.index.all_transported_chemicals(from_compartment=OUT, primary_only=True),
+                         ['|A|', '|PROTON|'])
+        pgdb = FakePGDB(dict((r, FRAMES[r]) for r in ['R0', 'ER0']), {'|Reactions|': ['R0']})
+        self.assertEqual(pgdb.transport_index().all_transported_chemicals(primary_only=True), ['|A|'])
+
+    def test_transporters(self):
+        self.assertEqual(self.index.transporters_of_reaction('R6'), ['|P6|', '|P7|'])
+        self.assertEqual(self.index.transporters_between('CCO-PERI-BAC', 'CCO-CYTOSOL'), ['|P6|', '|P7|'])
+        self.assertEqual(self.index.all_transporters(), ['|P0|', '|P6|', '|P7|'])
+
+if __name__ == '__main__':
+    unittest.main()